@@ -1,25 +1,136 @@
+import logging
 import os
-import shutil
-import tempfile
-from typing import Any, Dict, List
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode
 
 from dotenv import load_dotenv
 
 # Load environment variables at startup
 load_dotenv()
 
-import requests
-from fastapi import Depends, FastAPI, File, Form, HTTPException, UploadFile
+import httpx
+from fastapi import (Depends, FastAPI, File, Form, Header, HTTPException,
+                     Query, Request, UploadFile)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, HttpUrl
 from sqlalchemy.orm import Session
 
-from backend.db import get_db
-from backend.sqlite_dal import QuizQuestion, QuizTopic
-from backend.utils import generate_quiz, generate_quiz_from_pdf
+from backend.cache import content_cache, generation_cache
+from backend.db import SessionLocal, get_db, run_write_async
+from backend.jobs import (create_job, delete_job, fail_interrupted_jobs,
+                          get_job, job_to_dict, run_pdf_job, run_url_job,
+                          submit_job)
+from backend.llm import close_llm_client
+from backend.metrics import (HTTP_REQUEST_DURATION, Gauge, RequestMetrics,
+                             current_request, render_metrics)
+from backend.parsing import QuizParseError, parser_metrics
+from backend.persistence import (store_generated_quiz, store_generated_quizzes,
+                                 store_quiz_variants)
+from backend.pipelines import warm_up
+from backend.queries import (categories_cache, iter_topics, list_topics,
+                             load_quiz, quiz_payload_cache)
+from backend.responses import FastJSONResponse, dumps
+from backend.search import search_questions
+from backend.streaming import stream_quiz_events
+from backend.utils import (DEFAULT_GENERATION_MODE, GENERATION_MODES,
+                           GenerationResult, fetch_documents,
+                           generate_quiz_batch, generate_quiz_from_pdf_result,
+                           generate_quiz_result, generate_quiz_variants,
+                           generate_quiz_variants_from_pdf)
+from backend.warm_pool import WARM_POOL_REQUESTS, claim_quiz, warm_pool
+from backend.workers import PoolSaturatedError, generation_pool
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logging.getLogger("backend").setLevel(os.getenv("QUIZ_LOG_LEVEL", "INFO").upper())
+request_logger = logging.getLogger("backend.requests")
+
+PRELOAD_PIPELINES = os.getenv("QUIZ_PRELOAD_PIPELINES", "true").lower() == "true"
+
+# Uploads are read into memory in chunks of this size, up to MAX_UPLOAD_BYTES
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+# Room for the multipart boundaries and the other form fields next to the file
+REQUEST_OVERHEAD_BYTES = 64 * 1024
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = SessionLocal()
+    try:
+        # Jobs that were in progress when the previous process stopped can never finish
+        fail_interrupted_jobs(db)
+    finally:
+        db.close()
+    if PRELOAD_PIPELINES:
+        # Build the pipelines off the event loop, so /health answers right away
+        # and the first generation request doesn't pay for the Haystack import
+        threading.Thread(target=warm_up, name="pipeline-warm-up", daemon=True).start()
+    warm_pool.start()
+    yield
+    warm_pool.stop()
+    generation_pool.shutdown(wait=False)
+    close_llm_client()
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Rejects request bodies over ``max_bytes`` with 413 while they arrive,
+    before any form parsing: right away when Content-Length is too large,
+    otherwise as soon as the streamed body passes the limit. So an oversized
+    upload is never received or spooled to disk in full.
+
+    ``overhead_bytes`` more are let through for the form around the file;
+    the error reports ``max_bytes``, the limit users are told about.
+    """
+
+    def __init__(self, app, max_bytes: int, overhead_bytes: int = 0):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.limit = max_bytes + overhead_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body exceeds the {self.max_bytes} byte limit"
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.limit:
+            response = FastJSONResponse(status_code=413, content={"detail": detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    # Raised inside the body parser, FastAPI turns it into the response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+app = FastAPI(
+    title="Quiz Maker API",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
 
-app = FastAPI(title="Quiz Maker API")
+# Added first so it runs inside CORSMiddleware and a 413 still carries CORS headers
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES,
+    overhead_bytes=REQUEST_OVERHEAD_BYTES,
+)
 
 # Configure CORS
 app.add_middleware(
@@ -31,12 +142,74 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Time every request and log one structured line with its stage timings
+    and LLM token usage once the response body has been sent.
+    """
+    request_metrics = RequestMetrics()
+    token = current_request.set(request_metrics)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        current_request.reset(token)
+
+    body = response.body_iterator
+
+    async def body_then_log():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            seconds = time.perf_counter() - started
+            route = request.scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            HTTP_REQUEST_DURATION.observe(
+                seconds, method=request.method, route=route_path, status=response.status_code
+            )
+            request_logger.info(
+                "%s",
+                dumps(
+                    {
+                        "event": "request",
+                        "method": request.method,
+                        "path": request.url.path,
+                        "route": route_path,
+                        "status": response.status_code,
+                        "duration_ms": round(seconds * 1000, 1),
+                        **request_metrics.fields(),
+                    }
+                ).decode("utf-8"),
+            )
+
+    response.body_iterator = body_then_log()
+    return response
+
+
 class URLRequest(BaseModel):
     url: HttpUrl
     num_questions: int = 5  # Default to 5 questions
     difficulty: str = (
         "medium"  # Default to medium difficulty, options: easy, medium, hard
     )
+    mode: str = DEFAULT_GENERATION_MODE  # "single" or "chunked" for long documents
+
+
+class DifficultyVariant(BaseModel):
+    difficulty: str
+    num_questions: Optional[int] = None  # Defaults to the request's num_questions
+
+
+class QuizRequest(URLRequest):
+    # Several difficulties of the same source, generated from one fetch and
+    # stored as one topic each; the response lists the variants
+    variants: Optional[List[DifficultyVariant]] = None
+
+
+class BatchQuizRequest(BaseModel):
+    items: List[URLRequest]
 
 
 class QuizResponse(BaseModel):
@@ -53,48 +226,196 @@ class TopicResponse(BaseModel):
     subcategory: str
 
 
+def validate_generation_options(difficulty: str, mode: str) -> None:
+    if difficulty not in ["easy", "medium", "hard"]:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid difficulty level. Choose from: easy, medium, hard",
+        )
+    if mode not in GENERATION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid generation mode. Choose from: {', '.join(GENERATION_MODES)}",
+        )
+
+
+def validate_variants(
+    variants: List[DifficultyVariant], num_questions: int
+) -> List[Dict[str, Any]]:
+    """Validate requested difficulty variants and fill in their question counts."""
+    if not variants:
+        raise HTTPException(status_code=400, detail="At least one variant is required")
+    difficulties = [variant.difficulty for variant in variants]
+    if len(set(difficulties)) != len(difficulties):
+        raise HTTPException(status_code=400, detail="Each difficulty may be requested once")
+    for variant in variants:
+        validate_generation_options(variant.difficulty, GENERATION_MODES[0])
+    return [
+        {
+            "difficulty": variant.difficulty,
+            "num_questions": variant.num_questions or num_questions,
+        }
+        for variant in variants
+    ]
+
+
+def parse_variants_form(value: str) -> List[DifficultyVariant]:
+    """Parse the PDF form's variants field, e.g. "easy:3,medium,hard:5"."""
+    variants = []
+    for part in value.split(","):
+        difficulty, _, count = part.strip().partition(":")
+        if count and not count.strip().isdigit():
+            raise HTTPException(
+                status_code=400, detail=f"Invalid question count in variant: {part.strip()}"
+            )
+        variants.append(
+            DifficultyVariant(
+                difficulty=difficulty.strip(), num_questions=int(count) if count else None
+            )
+        )
+    return variants
+
+
+def variants_response(
+    source_id: Optional[int], topic_ids: List[int], results: List[GenerationResult]
+) -> FastJSONResponse:
+    return FastJSONResponse(
+        content={
+            "source_id": source_id,
+            "variants": [
+                {
+                    "difficulty": result.difficulty,
+                    "topic_id": topic_id,
+                    "cached": result.cached,
+                    "quiz": result.quiz,
+                }
+                for topic_id, result in zip(topic_ids, results)
+            ],
+        },
+        headers={"Content-Type": "application/json; charset=utf-8"}
+    )
+
+
+def invalid_quiz_error(error: Exception) -> HTTPException:
+    # The upstream model, not the client, produced the bad output
+    return HTTPException(
+        status_code=502, detail=f"The model returned an invalid quiz: {error}"
+    )
+
+
+def pool_saturated_error() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Quiz generation is at capacity, please retry shortly",
+        headers={"Retry-After": os.getenv("QUIZ_RETRY_AFTER_SECONDS", "5")},
+    )
+
+
+TOPICS_MAX_PAGE_SIZE = 1000
+
+BATCH_MAX_ITEMS = int(os.getenv("QUIZ_BATCH_MAX_ITEMS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("QUIZ_BATCH_CONCURRENCY", "4"))
+
+async def read_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Read an uploaded file into memory, rejecting it if it exceeds max_bytes.
+
+    By then the form parser has received the whole request body (spooling
+    files over 1 MB to disk); RequestSizeLimitMiddleware bounds that body.
+    """
+    buffer = bytearray()
+    while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Uploaded file exceeds the {max_bytes} byte limit",
+            )
+    return bytes(buffer)
+
+
 @app.post("/generate-quiz")
 async def create_quiz(
-    request: URLRequest, db: Session = Depends(get_db)
-) -> JSONResponse:
+    request: QuizRequest, db: Session = Depends(get_db)
+) -> FastJSONResponse:
     try:
         # Remove trailing slash if present
         url = str(request.url).rstrip("/")
 
-        # Validate difficulty level
-        if request.difficulty not in ["easy", "medium", "hard"]:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid difficulty level. Choose from: easy, medium, hard",
-            )
+        validate_generation_options(request.difficulty, request.mode)
 
-        quiz = generate_quiz(url, request.num_questions, request.difficulty)
-
-        # Store quiz in database
-        quiz_topic = QuizTopic(
-            topic=quiz["topic"],
-            category=quiz["category"],
-            subcategory=quiz["subcategory"],
-        )
-        db.add(quiz_topic)
-        db.flush()  # Get the ID of the newly created topic
-
-        # Add questions
-        for q in quiz["questions"]:
-            quiz_question = QuizQuestion(
-                question=q["question"],
-                options=q["options"],
-                right_option=q["right_option"],
-                topic_id=quiz_topic.id,
+        if request.variants is not None:
+            variants = validate_variants(request.variants, request.num_questions)
+            results = await generation_pool.run(
+                generate_quiz_variants, url, variants, request.mode
             )
-            db.add(quiz_question)
+            source_id, topic_ids = await run_write_async(store_quiz_variants, results)
+            return variants_response(source_id, topic_ids, results)
+
+        result = await generation_pool.run(
+            generate_quiz_result,
+            url,
+            request.num_questions,
+            request.difficulty,
+            request.mode,
+        )
 
-        db.commit()
-        return JSONResponse(
-            content=quiz,
+        # Store quiz in database
+        await run_write_async(store_generated_quiz, result)
+        return FastJSONResponse(
+            content=result.quiz,
             headers={"Content-Type": "application/json; charset=utf-8"}
         )
-    except requests.exceptions.HTTPError as e:
+    except HTTPException:
+        raise
+    except PoolSaturatedError:
+        raise pool_saturated_error()
+    except QuizParseError as e:
+        raise invalid_quiz_error(e)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            raise HTTPException(
+                status_code=404, detail=f"Content not found at URL: {request.url}"
+            )
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"An unexpected error occurred: {str(e)}"
+        )
+
+
+class PoolSlotStreamingResponse(StreamingResponse):
+    """StreamingResponse giving its generation pool place back once sent or abandoned."""
+
+    def __init__(self, content: Any, release_slot: Callable[[], None], **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self.release_slot = release_slot
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release_slot()
+
+
+@app.post("/generate-quiz/stream")
+async def stream_quiz(request: URLRequest) -> StreamingResponse:
+    """
+    Generate a quiz from a URL and stream it as Server-Sent Events.
+
+    Questions are sent as soon as the model finishes writing each one; the
+    quiz is stored when the stream completes (see stream_quiz_events).
+    """
+    url = str(request.url).rstrip("/")
+    validate_generation_options(request.difficulty, request.mode)
+    if request.mode != "single":
+        raise HTTPException(status_code=400, detail="Streaming supports mode 'single' only")
+
+    try:
+        documents = await generation_pool.run(fetch_documents, url)
+    except PoolSaturatedError:
+        raise pool_saturated_error()
+    except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             raise HTTPException(
                 status_code=404, detail=f"Content not found at URL: {request.url}"
@@ -105,22 +426,102 @@ async def create_quiz(
             status_code=500, detail=f"An unexpected error occurred: {str(e)}"
         )
 
+    # The completion streams on the event loop, but counts against the pool's cap
+    try:
+        release_slot = generation_pool.reserve()
+    except PoolSaturatedError:
+        raise pool_saturated_error()
+
+    return PoolSlotStreamingResponse(
+        stream_quiz_events(documents, request.num_questions, request.difficulty),
+        release_slot,
+        media_type="text/event-stream",
+        # Stop proxies from buffering the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/generate-quiz/batch")
+async def create_quiz_batch(
+    request: BatchQuizRequest, db: Session = Depends(get_db)
+) -> FastJSONResponse:
+    """Generate quizzes for several URLs and store them in one transaction"""
+    if not request.items:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch may contain at most {BATCH_MAX_ITEMS} items",
+        )
+    for item in request.items:
+        validate_generation_options(item.difficulty, item.mode)
+
+    items = [
+        {
+            "url": str(item.url).rstrip("/"),
+            "num_questions": item.num_questions,
+            "difficulty": item.difficulty,
+            "mode": item.mode,
+        }
+        for item in request.items
+    ]
+    try:
+        # The whole batch takes one pool slot and bounds its own parallelism
+        outcomes = await generation_pool.run(
+            generate_quiz_batch, items, BATCH_CONCURRENCY
+        )
+    except PoolSaturatedError:
+        raise pool_saturated_error()
+
+    succeeded = [outcome for outcome in outcomes if isinstance(outcome, GenerationResult)]
+    topic_ids = iter(await run_write_async(store_generated_quizzes, succeeded))
+
+    results = []
+    for index, (item, outcome) in enumerate(zip(items, outcomes)):
+        if isinstance(outcome, GenerationResult):
+            results.append(
+                {
+                    "index": index,
+                    "url": item["url"],
+                    "status": "succeeded",
+                    "topic_id": next(topic_ids),
+                    "quiz": outcome.quiz,
+                }
+            )
+        else:
+            results.append(
+                {
+                    "index": index,
+                    "url": item["url"],
+                    "status": "failed",
+                    "error": str(outcome) or outcome.__class__.__name__,
+                }
+            )
+
+    return FastJSONResponse(
+        content={
+            "succeeded": len(succeeded),
+            "failed": len(items) - len(succeeded),
+            "results": results,
+        },
+        headers={"Content-Type": "application/json; charset=utf-8"}
+    )
+
 
 @app.post("/generate-quiz-from-pdf")
 async def create_quiz_from_pdf(
     pdf_file: UploadFile = File(...),
     num_questions: int = Form(5),
     difficulty: str = Form("medium"),
+    mode: str = Form(DEFAULT_GENERATION_MODE),
+    variants: Optional[str] = Form(None),  # e.g. "easy:3,medium,hard:5"
     db: Session = Depends(get_db)
-) -> JSONResponse:
+) -> FastJSONResponse:
     try:
-        # Validate difficulty level
-        if difficulty not in ["easy", "medium", "hard"]:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid difficulty level. Choose from: easy, medium, hard",
-            )
-            
+        validate_generation_options(difficulty, mode)
+        if variants is not None:
+            variant_params = validate_variants(parse_variants_form(variants), num_questions)
+
         # Validate file type
         if not pdf_file.filename.lower().endswith('.pdf'):
             raise HTTPException(
@@ -128,114 +529,331 @@ async def create_quiz_from_pdf(
                 detail="Only PDF files are accepted"
             )
             
-        # Create a temporary file to store the uploaded PDF
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            # Copy the uploaded file to the temporary file
-            shutil.copyfileobj(pdf_file.file, temp_file)
-            temp_file_path = temp_file.name
-            
-        try:
-            # Generate quiz from the PDF
-            quiz = generate_quiz_from_pdf(temp_file_path, num_questions, difficulty)
-            
-            # Store quiz in database
-            quiz_topic = QuizTopic(
-                topic=quiz["topic"],
-                category=quiz["category"],
-                subcategory=quiz["subcategory"],
-            )
-            db.add(quiz_topic)
-            db.flush()  # Get the ID of the newly created topic
-
-            # Add questions
-            for q in quiz["questions"]:
-                quiz_question = QuizQuestion(
-                    question=q["question"],
-                    options=q["options"],
-                    right_option=q["right_option"],
-                    topic_id=quiz_topic.id,
-                )
-                db.add(quiz_question)
-
-            db.commit()
-            return JSONResponse(
-                content=quiz,
-                headers={"Content-Type": "application/json; charset=utf-8"}
+        pdf_data = await read_upload(pdf_file)
+
+        if variants is not None:
+            results = await generation_pool.run(
+                generate_quiz_variants_from_pdf,
+                pdf_data,
+                pdf_file.filename,
+                variant_params,
+                mode,
             )
-        finally:
-            # Clean up the temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-                
+            source_id, topic_ids = await run_write_async(store_quiz_variants, results)
+            return variants_response(source_id, topic_ids, results)
+
+        # Generate quiz from the PDF
+        result = await generation_pool.run(
+            generate_quiz_from_pdf_result,
+            pdf_data,
+            pdf_file.filename,
+            num_questions,
+            difficulty,
+            mode,
+        )
+
+        # Store quiz in database
+        await run_write_async(store_generated_quiz, result)
+        return FastJSONResponse(
+            content=result.quiz,
+            headers={"Content-Type": "application/json; charset=utf-8"}
+        )
+    except HTTPException:
+        raise
+    except PoolSaturatedError:
+        raise pool_saturated_error()
+    except QuizParseError as e:
+        raise invalid_quiz_error(e)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"An unexpected error occurred: {str(e)}"
         )
 
 
-@app.get("/topics")
-async def get_topics(db: Session = Depends(get_db)) -> JSONResponse:
-    """Get all quiz topics"""
-    topics = db.query(QuizTopic).all()
-    return JSONResponse(
-        content=[
-            {
-                "id": topic.id,
-                "topic": topic.topic,
-                "category": topic.category,
-                "subcategory": topic.subcategory,
-            }
-            for topic in topics
-        ],
-        headers={"Content-Type": "application/json; charset=utf-8"}
+@app.post("/jobs/generate-quiz", status_code=202)
+async def submit_quiz_job(request: URLRequest) -> FastJSONResponse:
+    """Queue quiz generation from a URL and return a job id to poll"""
+    url = str(request.url).rstrip("/")
+    validate_generation_options(request.difficulty, request.mode)
+
+    job = await run_write_async(
+        create_job,
+        "url",
+        {
+            "url": url,
+            "num_questions": request.num_questions,
+            "difficulty": request.difficulty,
+            "mode": request.mode,
+        },
     )
+    try:
+        submit_job(
+            job["id"],
+            run_url_job,
+            url,
+            request.num_questions,
+            request.difficulty,
+            request.mode,
+        )
+    except PoolSaturatedError:
+        await run_write_async(delete_job, job["id"])
+        raise pool_saturated_error()
 
+    return FastJSONResponse(status_code=202, content=job)
 
-@app.get("/quiz/{topic_id}")
-async def get_quiz(topic_id: int, db: Session = Depends(get_db)) -> JSONResponse:
-    """Get a specific quiz by topic ID"""
-    topic = db.query(QuizTopic).filter(QuizTopic.id == topic_id).first()
-    if not topic:
-        raise HTTPException(status_code=404, detail="Quiz topic not found")
 
-    questions = db.query(QuizQuestion).filter(QuizQuestion.topic_id == topic_id).all()
-    return JSONResponse(
-        content={
-            "topic": topic.topic,
-            "category": topic.category,
-            "subcategory": topic.subcategory,
-            "questions": [
-                {
-                    "question": q.question,
-                    "options": q.options,
-                    "right_option": q.right_option,
-                }
-                for q in questions
-            ],
+@app.post("/jobs/generate-quiz-from-pdf", status_code=202)
+async def submit_pdf_quiz_job(
+    pdf_file: UploadFile = File(...),
+    num_questions: int = Form(5),
+    difficulty: str = Form("medium"),
+    mode: str = Form(DEFAULT_GENERATION_MODE),
+) -> FastJSONResponse:
+    """Queue quiz generation from an uploaded PDF and return a job id to poll"""
+    validate_generation_options(difficulty, mode)
+    if not pdf_file.filename.lower().endswith('.pdf'):
+        raise HTTPException(
+            status_code=400,
+            detail="Only PDF files are accepted"
+        )
+
+    pdf_data = await read_upload(pdf_file)
+
+    job = await run_write_async(
+        create_job,
+        "pdf",
+        {
+            "filename": pdf_file.filename,
+            "num_questions": num_questions,
+            "difficulty": difficulty,
+            "mode": mode,
         },
+    )
+    try:
+        submit_job(
+            job["id"],
+            run_pdf_job,
+            pdf_data,
+            pdf_file.filename,
+            num_questions,
+            difficulty,
+            mode,
+        )
+    except PoolSaturatedError:
+        await run_write_async(delete_job, job["id"])
+        raise pool_saturated_error()
+
+    return FastJSONResponse(status_code=202, content=job)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str, db: Session = Depends(get_db)) -> FastJSONResponse:
+    """Get the status, timings and resulting topic id of a generation job"""
+    job = get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(
+        content=job_to_dict(job),
         headers={"Content-Type": "application/json; charset=utf-8"}
     )
 
 
+@app.get("/topics")
+async def get_topics(
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=TOPICS_MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="Last topic id of the previous page"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db),
+):
+    """
+    Get quiz topics in id order, optionally filtered by category/subcategory.
+
+    With ``limit`` the response is one page and the ``X-Next-Cursor`` header
+    holds the cursor for the next page. ``format=ndjson`` streams one topic per
+    line for exports.
+    """
+    filters = {
+        "category": category,
+        "subcategory": subcategory,
+        "after_id": cursor,
+    }
+
+    if format == "ndjson":
+        def stream_topics():
+            # The request's session may be closed before streaming ends, so use our own
+            stream_db = SessionLocal()
+            try:
+                for topic in iter_topics(stream_db, limit=limit, **filters):
+                    yield dumps(topic) + b"\n"
+            finally:
+                stream_db.close()
+
+        return StreamingResponse(stream_topics(), media_type="application/x-ndjson")
+
+    headers = {"Content-Type": "application/json; charset=utf-8"}
+    if limit is None:
+        return FastJSONResponse(content=list_topics(db, **filters), headers=headers)
+
+    # Fetch one extra row to know whether there is a next page
+    topics = list_topics(db, limit=limit + 1, **filters)
+    if len(topics) > limit:
+        topics = topics[:limit]
+        next_cursor = str(topics[-1]["id"])
+        headers["X-Next-Cursor"] = next_cursor
+        next_params = {
+            key: value
+            for key, value in (("category", category), ("subcategory", subcategory))
+            if value is not None
+        }
+        next_params.update(limit=limit, cursor=next_cursor)
+        headers["Link"] = f'</topics?{urlencode(next_params)}>; rel="next"'
+    return FastJSONResponse(content=topics, headers=headers)
+
+
+@app.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    category: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    db: Session = Depends(get_db),
+) -> FastJSONResponse:
+    """
+    Full-text search over stored questions and their options, best match
+    first. Every word of ``q`` must match; words are stemmed, so "planets"
+    also finds "planet".
+    """
+    return FastJSONResponse(
+        content=search_questions(db, q, limit=limit, offset=offset, category=category),
+        headers={"Content-Type": "application/json; charset=utf-8"},
+    )
+
+
+@app.get("/quiz/random")
+async def get_random_quiz(
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    db: Session = Depends(get_db),
+) -> FastJSONResponse:
+    """
+    Serve a pre-generated quiz from the warm pool, optionally filtered by
+    category, subcategory and difficulty. Each pooled quiz is served once;
+    the pool is refilled in the background.
+    """
+    topic_id = await run_write_async(claim_quiz, category, subcategory, difficulty)
+    if topic_id is None:
+        WARM_POOL_REQUESTS.inc(result="empty")
+        if not warm_pool.covers(category, subcategory, difficulty):
+            raise HTTPException(
+                status_code=404, detail="No warm pool source matches this selection"
+            )
+        warm_pool.wake()
+        raise HTTPException(
+            status_code=503, detail="No pre-generated quiz is ready yet, try again shortly"
+        )
+
+    WARM_POOL_REQUESTS.inc(result="served")
+    warm_pool.wake()
+    quiz = load_quiz(db, topic_id)
+    return FastJSONResponse(
+        content={"id": topic_id, **quiz},
+        headers={"Content-Type": "application/json; charset=utf-8"},
+    )
+
+
+@app.get("/quiz/{topic_id}")
+async def get_quiz(topic_id: int, db: Session = Depends(get_db)) -> Response:
+    """Get a specific quiz by topic ID"""
+    # Serialized once per topic, later reads skip the database and the encoder
+    payload = quiz_payload_cache.get(topic_id)
+    if payload is None:
+        quiz = load_quiz(db, topic_id)
+        if quiz is None:
+            raise HTTPException(status_code=404, detail="Quiz topic not found")
+        payload = dumps(quiz)
+        quiz_payload_cache.set(topic_id, payload)
+
+    return Response(content=payload, media_type="application/json; charset=utf-8")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if if_none_match is None:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
 @app.get("/categories")
-async def get_categories(db: Session = Depends(get_db)) -> JSONResponse:
+async def get_categories(
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+) -> Response:
     """Get all unique categories with their subcategories"""
-    categories = {}
-    topics = db.query(QuizTopic).all()
+    body, etag = categories_cache.get(db)
+    # Clients must revalidate, which is a cheap 304 while nothing changed
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=body,
+        media_type="application/json; charset=utf-8",
+        headers=headers,
+    )
 
-    for topic in topics:
-        if topic.category not in categories:
-            categories[topic.category] = []
 
-        if topic.subcategory not in categories[topic.category]:
-            categories[topic.category].append(topic.subcategory)
+Gauge(
+    "quiz_generation_pool_tasks",
+    "Generations running or waiting for a worker",
+    ("state",),
+    lambda: {
+        (state,): generation_pool.stats()[state] for state in ("running", "queued")
+    },
+)
+Gauge(
+    "quiz_generation_cache_lookups_total",
+    "Generation cache lookups by result",
+    ("result",),
+    lambda: {
+        (result,): generation_cache.stats()[result]
+        for result in ("memory_hits", "persistent_hits", "misses")
+    },
+    type="counter",
+)
+Gauge(
+    "quiz_warm_pool_stock",
+    "Unserved pre-generated quizzes per slot, as of the last warm pool refill",
+    ("category", "subcategory", "difficulty"),
+    warm_pool.stock_snapshot,
+)
+Gauge(
+    "quiz_content_cache_lookups_total",
+    "Fetched URL content cache lookups by result",
+    ("result",),
+    lambda: {
+        (result,): content_cache.stats()[result]
+        for result in ("fresh_hits", "revalidated_hits", "unchanged_bodies", "misses")
+    },
+    type="counter",
+)
+
 
-    return JSONResponse(
-        content=categories,
-        headers={"Content-Type": "application/json; charset=utf-8"}
-    )
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Prometheus text exposition of the API's counters and histograms."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "generation_pool": generation_pool.stats(),
+        "generation_cache": generation_cache.stats(),
+        "content_cache": content_cache.stats(),
+        "warm_pool": warm_pool.stats(),
+        "quiz_parser": parser_metrics.stats(),
+    }
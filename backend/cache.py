@@ -0,0 +1,324 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from backend.db import SessionLocal, run_write
+from backend.sqlite_dal import GenerationCacheEntry, utcnow
+
+
+@dataclass
+class CacheEntry:
+    quiz: Dict[str, Any]
+    topic_id: Optional[int]  # Topic that already stores this quiz, if any
+    expires_at: float  # Unix timestamp
+
+
+def make_cache_key(source: bytes, template: str, **params: Any) -> str:
+    """
+    Build a content-addressed cache key.
+
+    Args:
+        source: The fetched document text or uploaded PDF bytes
+        template: The prompt template the quiz is generated with
+        params: Prompt parameters such as num_questions and difficulty
+
+    Returns:
+        str: A hex sha256 digest identifying the generation request
+    """
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(source).digest())
+    digest.update(hashlib.sha256(template.encode("utf-8")).digest())
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class GenerationCache:
+    """
+    Two-tier cache of generated quizzes.
+
+    A bounded in-memory LRU sits in front of the ``generation_cache`` SQLite
+    table, which survives restarts and is shared by all worker processes.
+    Entries in both tiers expire after ``ttl_seconds``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_persistent_entries: int = 10000,
+        ttl_seconds: float = 7 * 24 * 3600,
+        persistent: bool = True,
+    ):
+        self.max_entries = max_entries
+        self.max_persistent_entries = max_persistent_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+        }
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return self._copy(entry)
+                del self._entries[key]
+
+        entry = self._get_persistent(key) if self.persistent else None
+        with self._lock:
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["persistent_hits"] += 1
+            self._put(key, entry)
+        return self._copy(entry)
+
+    def set(self, key: str, quiz: Dict[str, Any], topic_id: Optional[int] = None) -> None:
+        entry = CacheEntry(
+            quiz=copy.deepcopy(quiz),
+            topic_id=topic_id,
+            expires_at=time.time() + self.ttl_seconds,
+        )
+        with self._lock:
+            self._counters["sets"] += 1
+            self._put(key, entry)
+        if self.persistent:
+            self._set_persistent(key, entry)
+
+    def link_topic(self, key: str, topic_id: int) -> None:
+        """Remember which stored topic holds the quiz cached under ``key``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.topic_id = topic_id
+        if self.persistent:
+            run_write(self._link_persistent, key, topic_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.persistent:
+            run_write(self._clear_persistent)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["persistent_hits"] + stats["misses"]
+        stats["hit_ratio"] = (
+            round((stats["memory_hits"] + stats["persistent_hits"]) / lookups, 4)
+            if lookups
+            else None
+        )
+        return stats
+
+    def _put(self, key: str, entry: CacheEntry) -> None:
+        # Callers hold self._lock
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    @staticmethod
+    def _copy(entry: CacheEntry) -> CacheEntry:
+        # Callers may mutate the quiz they get back, so never hand out the cached dict
+        return CacheEntry(copy.deepcopy(entry.quiz), entry.topic_id, entry.expires_at)
+
+    def _get_persistent(self, key: str) -> Optional[CacheEntry]:
+        db = SessionLocal()
+        try:
+            row = db.get(GenerationCacheEntry, key)
+            now = utcnow()
+            # Expired rows are purged by the next write
+            if row is None or row.expires_at <= now:
+                return None
+            entry = CacheEntry(
+                quiz=row.quiz,
+                topic_id=row.topic_id,
+                expires_at=time.time() + (row.expires_at - now).total_seconds(),
+            )
+        finally:
+            db.close()
+        run_write(self._touch_persistent, key)
+        return entry
+
+    def _set_persistent(self, key: str, entry: CacheEntry) -> None:
+        run_write(self._write_persistent, key, entry)
+
+    def _write_persistent(self, db: Session, key: str, entry: CacheEntry) -> None:
+        now = utcnow()
+        values = {
+            "quiz": entry.quiz,
+            "topic_id": entry.topic_id,
+            "created_at": now,
+            "last_used_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl_seconds),
+        }
+        # An upsert rather than merge(): concurrent generations of the same key
+        # would both see no row and the second INSERT would fail
+        db.execute(
+            insert(GenerationCacheEntry)
+            .values(key=key, **values)
+            .on_conflict_do_update(index_elements=[GenerationCacheEntry.key], set_=values)
+        )
+        db.query(GenerationCacheEntry).filter(
+            GenerationCacheEntry.expires_at <= now
+        ).delete()
+        db.flush()
+
+        # Evict the least recently used rows beyond the size limit
+        overflow = db.query(GenerationCacheEntry).count() - self.max_persistent_entries
+        if overflow > 0:
+            stale_keys = [
+                row.key
+                for row in db.query(GenerationCacheEntry.key)
+                .order_by(GenerationCacheEntry.last_used_at)
+                .limit(overflow)
+            ]
+            db.query(GenerationCacheEntry).filter(
+                GenerationCacheEntry.key.in_(stale_keys)
+            ).delete()
+            with self._lock:
+                self._counters["evictions"] += len(stale_keys)
+        db.commit()
+
+    @staticmethod
+    def _touch_persistent(db: Session, key: str) -> None:
+        db.query(GenerationCacheEntry).filter(GenerationCacheEntry.key == key).update(
+            {GenerationCacheEntry.last_used_at: utcnow()}
+        )
+        db.commit()
+
+    @staticmethod
+    def _link_persistent(db: Session, key: str, topic_id: int) -> None:
+        row = db.get(GenerationCacheEntry, key)
+        if row is not None:
+            row.topic_id = topic_id
+            db.commit()
+
+    @staticmethod
+    def _clear_persistent(db: Session) -> None:
+        db.query(GenerationCacheEntry).delete()
+        db.commit()
+
+
+generation_cache = GenerationCache(
+    max_entries=int(os.getenv("QUIZ_CACHE_MAX_ENTRIES", "256")),
+    max_persistent_entries=int(os.getenv("QUIZ_CACHE_MAX_PERSISTENT_ENTRIES", "10000")),
+    ttl_seconds=float(os.getenv("QUIZ_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    persistent=os.getenv("QUIZ_CACHE_PERSISTENT", "true").lower() == "true",
+)
+
+
+@dataclass
+class ContentEntry:
+    documents: List[Tuple[Optional[str], Dict[str, Any]]]  # (content, meta) per document
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_digest: str  # sha256 of the fetched body, to skip conversion of unchanged pages
+    size: int  # Bytes charged against the cache budget
+    validated_at: float  # Unix timestamp of the last fetch or revalidation
+
+
+class ContentCache:
+    """
+    In-memory LRU of converted URL content, bounded by total size.
+
+    Entries keep the validators the server sent (ETag, Last-Modified) so a
+    stale entry can be revalidated with a conditional GET instead of being
+    downloaded and converted again. Entries validated less than
+    ``fresh_seconds`` ago are served without contacting the server.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, fresh_seconds: float = 300):
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self._entries: "OrderedDict[str, ContentEntry]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "fresh_hits": 0,
+            "revalidated_hits": 0,
+            "unchanged_bodies": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    def get(self, url: str) -> Optional[ContentEntry]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def is_fresh(self, entry: ContentEntry) -> bool:
+        return time.time() - entry.validated_at < self.fresh_seconds
+
+    def set(self, url: str, entry: ContentEntry) -> None:
+        if not self.max_bytes or entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(url, None)
+            if previous is not None:
+                self._size -= previous.size
+            self._entries[url] = entry
+            self._size += entry.size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+                self._counters["evictions"] += 1
+
+    def touch(self, entry: ContentEntry) -> None:
+        """Mark an entry as just validated by the server."""
+        with self._lock:
+            entry.validated_at = time.time()
+
+    def record(self, result: str) -> None:
+        with self._lock:
+            self._counters[result] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._size
+        hits = stats["fresh_hits"] + stats["revalidated_hits"] + stats["unchanged_bodies"]
+        lookups = hits + stats["misses"]
+        stats["hit_ratio"] = round(hits / lookups, 4) if lookups else None
+        return stats
+
+
+content_cache = ContentCache(
+    max_bytes=int(os.getenv("QUIZ_CONTENT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    fresh_seconds=float(os.getenv("QUIZ_CONTENT_CACHE_FRESH_SECONDS", "300")),
+)
+
+# Whether a cache hit reuses the topic stored for it instead of inserting a copy
+REUSE_CACHED_TOPICS = os.getenv("QUIZ_CACHE_REUSE_TOPICS", "true").lower() == "true"
+
+CACHE_ENABLED = os.getenv("QUIZ_CACHE_ENABLED", "true").lower() == "true"
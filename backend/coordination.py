@@ -0,0 +1,370 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from backend import metrics
+from backend.db import SessionLocal, run_write
+from backend.sqlite_dal import CoordinationLease, RateLimitBucket
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# "local" keeps leases and rate limits in process memory, enough for a single
+# process; "sqlite" shares them through the database between worker processes
+COORDINATION_BACKEND = os.getenv("QUIZ_COORDINATION_BACKEND", "local")
+# How long a lease outlives its holder; held leases are renewed at a third of it
+LEASE_SECONDS = float(os.getenv("QUIZ_LEASE_SECONDS", "30"))
+SINGLE_FLIGHT_POLL_SECONDS = float(os.getenv("QUIZ_SINGLE_FLIGHT_POLL_SECONDS", "0.25"))
+# A waiting request generates by itself after this long
+SINGLE_FLIGHT_MAX_WAIT_SECONDS = float(os.getenv("QUIZ_SINGLE_FLIGHT_MAX_WAIT_SECONDS", "180"))
+
+SINGLE_FLIGHT = metrics.Counter(
+    "quiz_single_flight_total",
+    "Generations by whether they ran, reused a concurrent identical one or gave up waiting",
+    ("result",),
+)
+
+# Bucket name -> (amount to take, capacity refilled per minute)
+Buckets = Dict[str, Tuple[float, float]]
+
+_worker_id: Optional[str] = None
+_worker_pid: Optional[int] = None
+
+
+def worker_id() -> str:
+    """Identifies this process as a lease holder, also across hosts and restarts."""
+    global _worker_id, _worker_pid
+    # Recomputed after a fork, so forked workers never share an id
+    if _worker_pid != os.getpid():
+        _worker_pid = os.getpid()
+        _worker_id = f"{socket.gethostname()}:{_worker_pid}:{uuid.uuid4().hex[:8]}"
+    return _worker_id
+
+
+def _refilled(level: float, updated_at: float, now: float, per_minute: float) -> float:
+    return min(level + (now - updated_at) * per_minute / 60, per_minute)
+
+
+def _wait_time(level: float, amount: float, per_minute: float) -> float:
+    return 0.0 if level >= amount else (amount - level) * 60 / per_minute
+
+
+class CoordinationBackend:
+    """
+    State shared by the API processes of a deployment: named leases that
+    expire unless renewed, and token buckets. Implementations must be safe to
+    use from several threads.
+    """
+
+    def acquire(self, name: str, ttl_seconds: float) -> bool:
+        """Take the lease unless it is held and unexpired, by anyone (not re-entrant)."""
+        raise NotImplementedError
+
+    def renew(self, names: List[str], ttl_seconds: float) -> None:
+        """Extend this process's leases among ``names``."""
+        raise NotImplementedError
+
+    def release(self, name: str) -> None:
+        """Drop the lease if this process holds it."""
+        raise NotImplementedError
+
+    def holder(self, name: str) -> Optional[str]:
+        """The worker id holding the unexpired lease, or None."""
+        raise NotImplementedError
+
+    def take(self, buckets: Buckets) -> float:
+        """
+        Take the amount from every bucket, or from none when one of them is
+        short. Buckets start full with one minute of capacity.
+
+        Returns:
+            float: 0 when taken, otherwise the seconds to wait before retrying
+        """
+        raise NotImplementedError
+
+    def give_back(self, buckets: Buckets) -> None:
+        """Return capacity taken but not used, up to each bucket's capacity."""
+        raise NotImplementedError
+
+
+class LocalBackend(CoordinationBackend):
+    """Leases and buckets in process memory, for a single API process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def acquire(self, name: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        with self._lock:
+            lease = self._leases.get(name)
+            if lease is not None and lease[1] >= now:
+                return False
+            self._leases[name] = (worker_id(), now + ttl_seconds)
+            return True
+
+    def renew(self, names: List[str], ttl_seconds: float) -> None:
+        expires_at = time.time() + ttl_seconds
+        with self._lock:
+            for name in names:
+                if self._leases.get(name, ("",))[0] == worker_id():
+                    self._leases[name] = (worker_id(), expires_at)
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            if self._leases.get(name, ("",))[0] == worker_id():
+                del self._leases[name]
+
+    def holder(self, name: str) -> Optional[str]:
+        with self._lock:
+            lease = self._leases.get(name)
+        return lease[0] if lease is not None and lease[1] >= time.time() else None
+
+    def take(self, buckets: Buckets) -> float:
+        now = time.time()
+        with self._lock:
+            levels = {
+                name: _refilled(*self._buckets.get(name, (per_minute, now)), now, per_minute)
+                for name, (_, per_minute) in buckets.items()
+            }
+            wait = max(
+                _wait_time(levels[name], amount, per_minute)
+                for name, (amount, per_minute) in buckets.items()
+            )
+            if wait <= 0:
+                for name, (amount, _) in buckets.items():
+                    self._buckets[name] = (levels[name] - amount, now)
+            return wait
+
+    def give_back(self, buckets: Buckets) -> None:
+        now = time.time()
+        with self._lock:
+            for name, (amount, per_minute) in buckets.items():
+                level = _refilled(*self._buckets.get(name, (per_minute, now)), now, per_minute)
+                self._buckets[name] = (min(level + amount, per_minute), now)
+
+
+class SQLiteBackend(CoordinationBackend):
+    """
+    Leases and buckets in the coordination_leases and rate_limit_buckets
+    tables, shared by every process using the database.
+
+    Each call is one short write transaction that starts with a write
+    statement, so it holds the database lock before reading and concurrent
+    processes can't act on a stale read.
+    """
+
+    def acquire(self, name: str, ttl_seconds: float) -> bool:
+        return run_write(self._acquire, name, ttl_seconds)
+
+    def renew(self, names: List[str], ttl_seconds: float) -> None:
+        run_write(self._renew, names, ttl_seconds)
+
+    def release(self, name: str) -> None:
+        run_write(self._release, name)
+
+    def holder(self, name: str) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            return db.scalar(
+                select(CoordinationLease.owner).where(
+                    CoordinationLease.name == name, CoordinationLease.expires_at >= time.time()
+                )
+            )
+        finally:
+            db.close()
+
+    def take(self, buckets: Buckets) -> float:
+        return run_write(self._take, buckets)
+
+    def give_back(self, buckets: Buckets) -> None:
+        run_write(self._give_back, buckets)
+
+    @staticmethod
+    def _acquire(db: Session, name: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        values = {"owner": worker_id(), "expires_at": now + ttl_seconds}
+        # Inserts a new lease or takes over an expired one; no row comes back otherwise
+        owner = db.scalar(
+            insert(CoordinationLease)
+            .values(name=name, **values)
+            .on_conflict_do_update(
+                index_elements=[CoordinationLease.name],
+                set_=values,
+                where=CoordinationLease.expires_at < now,
+            )
+            .returning(CoordinationLease.owner)
+        )
+        db.commit()
+        return owner is not None
+
+    @staticmethod
+    def _renew(db: Session, names: List[str], ttl_seconds: float) -> None:
+        now = time.time()
+        db.execute(
+            update(CoordinationLease)
+            .where(CoordinationLease.owner == worker_id(), CoordinationLease.name.in_(names))
+            .values(expires_at=now + ttl_seconds)
+        )
+        # Leases of processes that died without releasing them
+        db.execute(
+            delete(CoordinationLease).where(CoordinationLease.expires_at < now - 3600)
+        )
+        db.commit()
+
+    @staticmethod
+    def _release(db: Session, name: str) -> None:
+        db.execute(
+            delete(CoordinationLease).where(
+                CoordinationLease.name == name, CoordinationLease.owner == worker_id()
+            )
+        )
+        db.commit()
+
+    @staticmethod
+    def _locked_buckets(db: Session, buckets: Buckets, now: float) -> Dict[str, RateLimitBucket]:
+        # Creating missing buckets first takes the write lock before the read
+        db.execute(
+            insert(RateLimitBucket)
+            .values(
+                [
+                    {"name": name, "level": per_minute, "updated_at": now}
+                    for name, (_, per_minute) in buckets.items()
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+        return {
+            row.name: row
+            for row in db.scalars(
+                select(RateLimitBucket).where(RateLimitBucket.name.in_(list(buckets)))
+            )
+        }
+
+    def _take(self, db: Session, buckets: Buckets) -> float:
+        now = time.time()
+        rows = self._locked_buckets(db, buckets, now)
+        levels = {
+            name: _refilled(rows[name].level, rows[name].updated_at, now, per_minute)
+            for name, (_, per_minute) in buckets.items()
+        }
+        wait = max(
+            _wait_time(levels[name], amount, per_minute)
+            for name, (amount, per_minute) in buckets.items()
+        )
+        if wait <= 0:
+            for name, (amount, _) in buckets.items():
+                rows[name].level = levels[name] - amount
+                rows[name].updated_at = now
+        db.commit()
+        return wait
+
+    def _give_back(self, db: Session, buckets: Buckets) -> None:
+        now = time.time()
+        rows = self._locked_buckets(db, buckets, now)
+        for name, (amount, per_minute) in buckets.items():
+            level = _refilled(rows[name].level, rows[name].updated_at, now, per_minute)
+            rows[name].level = min(level + amount, per_minute)
+            rows[name].updated_at = now
+        db.commit()
+
+
+class LeaseKeeper:
+    """
+    Holds leases for this process and renews them in a background thread
+    until they are released, so they only expire when the process dies.
+    """
+
+    def __init__(self, backend: CoordinationBackend, ttl_seconds: float = LEASE_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._held: Set[str] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def acquire(self, name: str) -> bool:
+        if not self.backend.acquire(name, self.ttl_seconds):
+            return False
+        with self._lock:
+            self._held.add(name)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="lease-keeper", daemon=True
+                )
+                self._thread.start()
+        return True
+
+    def owns(self, name: str) -> bool:
+        with self._lock:
+            return name in self._held
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            if name not in self._held:
+                return
+            self._held.discard(name)
+        self.backend.release(name)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.ttl_seconds / 3)
+            with self._lock:
+                names = list(self._held)
+            if not names:
+                continue
+            try:
+                self.backend.renew(names, self.ttl_seconds)
+            except Exception as e:
+                logger.warning("Could not renew %d leases: %s", len(names), e)
+
+
+def single_flight(key: str, produce: Callable[[], T], reuse: Callable[[], Optional[T]]) -> T:
+    """
+    Run ``produce`` unless another thread or process is already producing
+    ``key``; then wait for it to finish and return ``reuse()``, which reads
+    what it left behind (e.g. from the generation cache).
+
+    Produces anyway when the other run failed or takes longer than
+    QUIZ_SINGLE_FLIGHT_MAX_WAIT_SECONDS.
+    """
+    name = f"generation:{key}"
+    deadline = time.monotonic() + SINGLE_FLIGHT_MAX_WAIT_SECONDS
+    while True:
+        if leases.acquire(name):
+            SINGLE_FLIGHT.inc(result="produced")
+            try:
+                return produce()
+            finally:
+                leases.release(name)
+
+        while backend.holder(name) is not None and time.monotonic() < deadline:
+            time.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+        result = reuse()
+        if result is not None:
+            SINGLE_FLIGHT.inc(result="reused")
+            return result
+        if time.monotonic() >= deadline:
+            SINGLE_FLIGHT.inc(result="timed_out")
+            return produce()
+
+
+def create_backend(name: str) -> CoordinationBackend:
+    if name == "local":
+        return LocalBackend()
+    if name == "sqlite":
+        return SQLiteBackend()
+    raise ValueError(f"Unknown coordination backend: {name!r} (use 'local' or 'sqlite')")
+
+
+backend = create_backend(COORDINATION_BACKEND)
+leases = LeaseKeeper(backend)
@@ -1,60 +1,532 @@
+import contextvars
+import hashlib
+import io
 import json
+import logging
+import multiprocessing
 import os
-from typing import Dict, List
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
+import httpx
 import json_repair
-from haystack import component
+from haystack import Document, component
+from haystack.components.builders import PromptBuilder
+from haystack.components.converters import HTMLToDocument
+from haystack.dataclasses import ByteStream
 from pypdf import PdfReader
 
+from backend.cache import ContentCache, ContentEntry
+from backend.llm import get_llm_client
+from backend.parsing import (QuizParseError, iter_json_candidates,
+                             parser_metrics, validate_quiz)
+
+logger = logging.getLogger(__name__)
+
 
 @component
 class QuizParser:
+    """
+    Parse and validate the quiz in an LLM reply.
+
+    The reply is decoded with the cheapest method that works: strict
+    ``json.loads`` of the whole reply, then the first bracket-balanced JSON
+    span (models often wrap the JSON in text or markdown), then
+    ``json_repair``. The path taken is recorded in ``parser_metrics``.
+
+    Raises:
+        QuizParseError: If no valid quiz can be decoded
+    """
+
     @component.output_types(quiz=Dict)
     def run(self, replies: List[str]):
+        if not replies:
+            parser_metrics.record("failed")
+            raise QuizParseError("The model returned no reply")
         reply = replies[0]
 
-        # even if prompted to respond with JSON only, sometimes the model returns a mix of JSON and text
-        first_index = min(reply.find("{"), reply.find("["))
-        last_index = max(reply.rfind("}"), reply.rfind("]")) + 1
+        try:
+            quiz, path = self._decode(reply)
+            quiz, dropped = validate_quiz(quiz)
+        except QuizParseError:
+            parser_metrics.record("failed")
+            logger.warning("Could not parse a quiz from the model reply: %.200r", reply)
+            raise
+
+        parser_metrics.record(path, dropped)
+        if dropped:
+            logger.info("Dropped %d malformed questions from the model reply", dropped)
+        return {"quiz": quiz}
+
+    @staticmethod
+    def _decode(reply: str) -> Tuple[Any, str]:
+        stripped = reply.strip()
+        if stripped[:1] in ("{", "["):
+            try:
+                return json.loads(stripped), "strict"
+            except json.JSONDecodeError:
+                pass
+
+        first_candidate = None
+        for candidate in iter_json_candidates(reply):
+            first_candidate = first_candidate or candidate
+            try:
+                data = json.loads(candidate)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(data, (dict, list)):
+                return data, "extracted"
 
-        json_portion = reply[first_index:last_index]
+        # Not well-formed, e.g. truncated or with trailing commas
+        data = json_repair.loads(first_candidate or reply)
+        if not data:
+            raise QuizParseError("The reply does not contain JSON")
+        return data, "repaired"
 
+
+@component
+class QuizVariantsParser:
+    """
+    Parse a multi-difficulty reply into one quiz per difficulty.
+
+    The quizzes share the reply's topic, category and subcategory. Quizzes
+    that fail validation are left out so the caller can generate them
+    separately.
+
+    Raises:
+        QuizParseError: If the reply contains no valid quiz
+    """
+
+    @component.output_types(quizzes=Dict)
+    def run(self, replies: List[str]):
         try:
-            quiz = json.loads(json_portion)
-        except json.JSONDecodeError:
-            # if the JSON is not well-formed, try to repair it
-            quiz = json_repair.loads(json_portion)
+            if not replies:
+                raise QuizParseError("The model returned no reply")
+            data, path = QuizParser._decode(replies[0])
+            if not isinstance(data, dict) or not isinstance(data.get("quizzes"), list):
+                raise QuizParseError("The reply has no quizzes list")
+        except QuizParseError:
+            parser_metrics.record("failed")
+            logger.warning("Could not parse quizzes from the model reply: %.200r", replies)
+            raise
 
-        # sometimes the JSON contains a list instead of a dictionary
-        if isinstance(quiz, list):
-            quiz = quiz[0]
+        header = {field: data.get(field) for field in ("topic", "category", "subcategory")}
+        quizzes = {}
+        dropped = 0
+        for item in data["quizzes"]:
+            if not isinstance(item, dict):
+                continue
+            difficulty = str(item.get("difficulty", "")).strip().lower()
+            try:
+                quiz, item_dropped = validate_quiz({**header, "questions": item.get("questions")})
+            except QuizParseError as e:
+                logger.info("Skipped the invalid %r quiz in the model reply: %s", difficulty, e)
+                continue
+            if difficulty not in quizzes:
+                quizzes[difficulty] = quiz
+                dropped += item_dropped
 
-        print(quiz)
+        if not quizzes:
+            parser_metrics.record("failed")
+            raise QuizParseError("The reply contains no valid quiz")
+        parser_metrics.record(path, dropped)
+        return {"quizzes": quizzes}
+
+
+def iter_pdf_pages(
+    reader: PdfReader, start: int = 0, stop: Optional[int] = None
+) -> Iterator[Tuple[int, str, float]]:
+    """
+    Lazily extract the text of PDF pages.
+
+    Yields:
+        tuple: The page index, its text and the extraction time in seconds
+    """
+    stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+    for index in range(start, stop):
+        started = time.perf_counter()
+        text = reader.pages[index].extract_text() or ""
+        yield index, text, time.perf_counter() - started
+
+
+def _open_pdf(source: Union[str, bytes]) -> PdfReader:
+    return PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _extract_page_range(source: Union[str, bytes], start: int, stop: int) -> List[Tuple[int, str, float]]:
+    # Runs in a worker process, which needs its own reader
+    return list(iter_pdf_pages(_open_pdf(source), start, stop))
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # Spawned, not forked from this multi-threaded process (see GenerationPool)
+            _process_pool = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
 
-        return {"quiz": quiz}
 
 @component
 class PDFTextExtractor:
-    @component.output_types(text=str, filename=str)
-    def run(self, file_path: str):
+    """
+    Extracts PDF text page by page, stopping as soon as ``max_chars`` have been
+    collected since the prompt only uses the beginning of the document.
+
+    Documents with at least ``parallel_min_pages`` pages are extracted in
+    batches spread over a process pool when ``max_workers`` is above 1.
+    """
+
+    def __init__(
+        self,
+        max_chars: Optional[int] = 8000,
+        max_pages: Optional[int] = None,
+        parallel_min_pages: int = 50,
+        max_workers: int = 1,
+        pages_per_task: int = 16,
+    ):
+        self.max_chars = max_chars
+        self.max_pages = max_pages
+        self.parallel_min_pages = parallel_min_pages
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
+
+    @component.output_types(text=str, filename=str, page_timings=List[Dict])
+    def run(
+        self,
+        file_path: Optional[str] = None,
+        data: Optional[bytes] = None,
+        filename: Optional[str] = None,
+    ):
         """
-        Extract text from a PDF file.
+        Extract text from a PDF file or from PDF bytes already in memory.
         
         Args:
             file_path: Path to the PDF file
+            data: The PDF content, used instead of file_path for uploads
+            filename: Name to report for in-memory PDFs
             
         Returns:
-            dict: A dictionary containing the extracted text and the filename
+            dict: A dictionary containing the extracted text, the filename and
+            the extraction time of every page that was read
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"PDF file not found: {file_path}")
-            
-        reader = PdfReader(file_path)
-        text = ""
-        
-        for page in reader.pages:
-            text += page.extract_text() + "\n\n"
+        if data is not None:
+            source = data
+            filename = filename or "document.pdf"
+        elif file_path is not None:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"PDF file not found: {file_path}")
+            source = file_path
+            filename = filename or os.path.basename(file_path)
+        else:
+            raise ValueError("Either file_path or data must be provided")
             
-        filename = os.path.basename(file_path)
-        
-        return {"text": text, "filename": filename}
\ No newline at end of file
+        reader = _open_pdf(source)
+        page_count = len(reader.pages)
+        if self.max_pages is not None:
+            page_count = min(page_count, self.max_pages)
+
+        if self.max_workers > 1 and page_count >= self.parallel_min_pages:
+            pages = self._extract_parallel(source, page_count)
+        else:
+            pages = iter_pdf_pages(reader, 0, page_count)
+
+        parts = []
+        page_timings = []
+        collected = 0
+        for index, text, seconds in pages:
+            parts.append(text)
+            parts.append("\n\n")
+            collected += len(text) + 2
+            page_timings.append({"page": index + 1, "chars": len(text), "seconds": seconds})
+            if self.max_chars is not None and collected >= self.max_chars:
+                break
+
+        return {"text": "".join(parts), "filename": filename, "page_timings": page_timings}
+
+    def _extract_parallel(self, source: Union[str, bytes], page_count: int) -> Iterator[Tuple[int, str, float]]:
+        pool = _get_process_pool(self.max_workers)
+        batch_size = self.max_workers * self.pages_per_task
+        for batch_start in range(0, page_count, batch_size):
+            # Only one batch is in flight so reading stops soon after enough text is collected
+            batch_stop = min(batch_start + batch_size, page_count)
+            futures = [
+                pool.submit(_extract_page_range, source, start, min(start + self.pages_per_task, batch_stop))
+                for start in range(batch_start, batch_stop, self.pages_per_task)
+            ]
+            for future in futures:
+                yield from future.result()
+
+
+def split_text(text: str, chunk_size: int) -> List[str]:
+    """
+    Split text into chunks of at most ``chunk_size`` characters, preferring
+    paragraph boundaries and hard-splitting paragraphs that are too long.
+    """
+    chunks = []
+    current = []
+    current_size = 0
+    for paragraph in text.split("\n\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > chunk_size:
+            chunks.append(paragraph[:chunk_size])
+            paragraph = paragraph[chunk_size:]
+        if current and current_size + len(paragraph) + 2 > chunk_size:
+            chunks.append("\n\n".join(current))
+            current, current_size = [], 0
+        current.append(paragraph)
+        current_size += len(paragraph) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def select_chunks(chunk_count: int, max_chunks: int) -> List[int]:
+    """Pick up to ``max_chunks`` chunk indices spread evenly over the document."""
+    if chunk_count <= max_chunks:
+        return list(range(chunk_count))
+    step = chunk_count / max_chunks
+    return [int(i * step + step / 2) for i in range(max_chunks)]
+
+
+def _question_key(question: Dict) -> str:
+    return "".join(ch for ch in str(question.get("question", "")).lower() if ch.isalnum())
+
+
+def merge_quizzes(quizzes: List[Dict], num_questions: int) -> Dict:
+    """
+    Merge per-chunk quizzes into one quiz of ``num_questions`` questions.
+
+    Questions are taken round-robin from the chunks, in document order, so
+    every part of the document is covered; duplicates are dropped.
+    """
+    categories = Counter((quiz.get("category"), quiz.get("subcategory")) for quiz in quizzes)
+    (category, subcategory), _ = categories.most_common(1)[0]
+
+    questions = []
+    seen = set()
+    pending = [list(quiz.get("questions") or []) for quiz in quizzes]
+    while len(questions) < num_questions and any(pending):
+        for chunk_questions in pending:
+            if not chunk_questions or len(questions) >= num_questions:
+                continue
+            question = chunk_questions.pop(0)
+            key = _question_key(question)
+            if key and key not in seen:
+                seen.add(key)
+                questions.append(question)
+
+    return {
+        "topic": quizzes[0].get("topic"),
+        "category": category,
+        "subcategory": subcategory,
+        "questions": questions,
+    }
+
+
+@component
+class ChunkedQuizGenerator:
+    """
+    Map-reduce quiz generation for documents longer than the prompt window.
+
+    The text is split into chunks, up to ``max_chunks`` of them spread over the
+    document are each sent to the LLM with at most ``max_concurrency`` calls in
+    flight, and the per-chunk quizzes are merged into ``num_questions``
+    deduplicated questions.
+    """
+
+    def __init__(
+        self,
+        prompt_template: str,
+        generator: Any,
+        chunk_size: int = 4000,
+        max_chunks: int = 6,
+        max_concurrency: int = 3,
+    ):
+        self.prompt_builder = PromptBuilder(template=prompt_template)
+        self.generator = generator
+        self.parser = QuizParser()
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.max_concurrency = max_concurrency
+
+    @component.output_types(quiz=Dict)
+    def run(self, text: str, num_questions: int, difficulty: str, filename: str = ""):
+        chunks = split_text(text, self.chunk_size)
+        if not chunks:
+            raise ValueError("The document does not contain any text")
+
+        selected = [chunks[i] for i in select_chunks(len(chunks), min(self.max_chunks, num_questions))]
+        # Ask every chunk for a share of the questions plus one spare to absorb duplicates
+        per_chunk = -(-num_questions // len(selected)) + (1 if len(selected) > 1 else 0)
+
+        def generate(chunk: str) -> Dict:
+            prompt = self.prompt_builder.run(
+                documents=[Document(content=chunk)],
+                text=chunk,
+                filename=filename,
+                num_questions=per_chunk,
+                difficulty=difficulty,
+            )["prompt"]
+            replies = self.generator.run(prompt=prompt)["replies"]
+            return self.parser.run(replies=replies)["quiz"]
+
+        quizzes = []
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, generate, chunk)
+                for chunk in selected
+            ]
+            for future in futures:
+                try:
+                    quizzes.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+
+        if not quizzes:
+            raise errors[0]
+
+        return {"quiz": merge_quizzes(quizzes, num_questions)}
+
+
+@component
+class LLMGenerator:
+    """
+    Haystack generator backed by the shared ``AsyncLLMClient``.
+
+    Every pipeline gets its own instance (Haystack components belong to a
+    single pipeline) but they all share the client's connection pool and
+    rate limits.
+    """
+
+    def __init__(self, generation_kwargs: Optional[Dict[str, Any]] = None):
+        self.generation_kwargs = generation_kwargs or {}
+
+    @component.output_types(replies=List[str], meta=List[Dict[str, Any]])
+    def run(self, prompt: str, generation_kwargs: Optional[Dict[str, Any]] = None):
+        # Per-run kwargs (e.g. a larger max_tokens) override the defaults
+        return get_llm_client().complete(
+            prompt, **{**self.generation_kwargs, **(generation_kwargs or {})}
+        )
+
+
+@component
+class CachedLinkContentFetcher:
+    """
+    Fetch URLs and convert their HTML to documents through a ``ContentCache``.
+
+    Entries validated recently are served without a request. Older ones are
+    revalidated with a conditional GET (If-None-Match / If-Modified-Since);
+    a 304, or a 200 whose body is unchanged, reuses the converted documents
+    instead of parsing the HTML again. If the server can't be reached, a
+    cached copy is served rather than failing.
+    """
+
+    def __init__(
+        self,
+        cache: ContentCache,
+        timeout: float = 10.0,
+        retries: int = 2,
+        user_agent: str = "quiz-maker/1.0",
+    ):
+        self.cache = cache
+        self.converter = HTMLToDocument()
+        self._http = httpx.Client(
+            follow_redirects=True,
+            timeout=timeout,
+            headers={"User-Agent": user_agent, "Accept": "*/*"},
+            transport=httpx.HTTPTransport(retries=retries),
+        )
+
+    @component.output_types(documents=List[Document])
+    def run(self, urls: List[str]):
+        documents = []
+        for url in urls:
+            try:
+                documents.extend(self._fetch(url))
+            except Exception as e:
+                # Like LinkContentFetcher: a single URL fails loudly, a list skips failures
+                if len(urls) == 1:
+                    raise
+                logger.warning("Could not fetch %s: %s", url, e)
+        return {"documents": documents}
+
+    def _fetch(self, url: str) -> List[Document]:
+        entry = self.cache.get(url)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record("fresh_hits")
+            return self._documents(entry)
+
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        try:
+            response = self._http.get(url, headers=headers)
+        except httpx.TransportError as e:
+            if entry is None:
+                raise
+            logger.warning("Could not revalidate %s, serving the cached copy: %s", url, e)
+            return self._documents(entry)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(entry)
+            self.cache.record("revalidated_hits")
+            return self._documents(entry)
+        response.raise_for_status()
+
+        digest = hashlib.sha256(response.content).hexdigest()
+        if entry is not None and entry.body_digest == digest:
+            # Servers without validators still send the same bytes for an unchanged page
+            entry = ContentEntry(
+                entry.documents,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                digest,
+                entry.size,
+                time.time(),
+            )
+            self.cache.set(url, entry)
+            self.cache.record("unchanged_bodies")
+            return self._documents(entry)
+
+        self.cache.record("misses")
+        stream = ByteStream.from_string(
+            response.text,
+            meta={
+                "content_type": response.headers.get("Content-Type", "").split(";")[0],
+                "url": url,
+            },
+        )
+        documents = self.converter.run(sources=[stream])["documents"]
+        self.cache.set(
+            url,
+            ContentEntry(
+                documents=[(doc.content, dict(doc.meta)) for doc in documents],
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                body_digest=digest,
+                size=sum(len((doc.content or "").encode("utf-8")) for doc in documents)
+                + len(url),
+                validated_at=time.time(),
+            ),
+        )
+        return documents
+
+    @staticmethod
+    def _documents(entry: ContentEntry) -> List[Document]:
+        # Fresh Document objects, so callers can't modify the cached ones
+        return [Document(content=content, meta=dict(meta)) for content, meta in entry.documents]
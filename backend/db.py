@@ -1,21 +1,123 @@
+import asyncio
 import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
 
+from backend.metrics import record_commit
+from backend.migrations import run_migrations
 from backend.sqlite_dal import Base
 
+T = TypeVar("T")
+
 # Get the absolute path to the database file
-db_path = os.path.abspath("quiz_database.db")
+db_path = os.path.abspath(os.getenv("QUIZ_DATABASE_PATH", "quiz_database.db"))
+
+
+def create_sqlite_engine(
+    path: str,
+    journal_mode: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    synchronous: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    cache_size_kib: int = int(os.getenv("SQLITE_CACHE_SIZE_KIB", "65536")),
+    mmap_size: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    pool_size: int = int(os.getenv("SQLITE_POOL_SIZE", "10")),
+    max_overflow: int = int(os.getenv("SQLITE_MAX_OVERFLOW", "20")),
+) -> Engine:
+    """
+    Create a SQLite engine tuned for concurrent access.
+
+    WAL lets readers proceed while a write is in progress, synchronous=NORMAL
+    is durable under WAL except for power loss, and busy_timeout makes a
+    connection wait for the write lock instead of failing with
+    "database is locked". Every pooled connection gets the pragmas on connect.
+    """
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False, "timeout": busy_timeout_ms / 1000},
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        # A negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{int(cache_size_kib)}")
+        cursor.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    return engine
+
+
+_engine: Optional[Engine] = None
+_session_factory: Optional[sessionmaker] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """
+    Return the application engine, creating it on first use.
 
-# Create SQLite engine with absolute path
-engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Creating it also creates missing tables and brings databases created by
+    older versions up to date, so importing this module stays cheap.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            engine = create_sqlite_engine(db_path)
+            with engine.connect() as connection:
+                # Worker processes starting together would race to create and
+                # migrate the schema; the write lock makes them take turns
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+                Base.metadata.create_all(connection)
+                run_migrations(connection)
+                connection.commit()
+            _engine = engine
+        return _engine
 
-# Create all tables
-Base.metadata.create_all(engine)
 
-# Create sessionmaker
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _get_session_factory() -> sessionmaker:
+    global _session_factory
+    engine = get_engine()
+    with _engine_lock:
+        if _session_factory is None:
+            factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            event.listen(factory, "before_commit", _start_commit_timer)
+            event.listen(factory, "after_commit", _record_commit_time)
+            _session_factory = factory
+        return _session_factory
+
+
+def SessionLocal() -> Session:
+    """Create a session bound to the application engine."""
+    return _get_session_factory()()
+
+
+def _start_commit_timer(session: Session) -> None:
+    session.info["commit_started"] = time.perf_counter()
+
+
+def _record_commit_time(session: Session) -> None:
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        record_commit(time.perf_counter() - started)
+
+
+def __getattr__(name: str) -> Any:
+    # ``from backend.db import engine`` keeps working without an import-time engine
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_db():
@@ -25,3 +127,65 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+class WriteQueue:
+    """
+    Runs write transactions one at a time on a dedicated thread.
+
+    SQLite allows a single writer; funnelling writes through one thread means
+    they never contend for the lock, while reads keep using the pool.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        self._thread_id: Optional[int] = None
+
+    def submit(self, fn: Callable[..., T], *args: Any) -> "Future[T]":
+        return self._executor.submit(self._run, fn, *args)
+
+    def in_writer_thread(self) -> bool:
+        return threading.get_ident() == self._thread_id
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        self._thread_id = threading.get_ident()
+        return run_in_session(self.session_factory, fn, *args)
+
+
+def run_in_session(session_factory: Callable[[], Session], fn: Callable[..., T], *args: Any) -> T:
+    db = session_factory()
+    try:
+        return fn(db, *args)
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+SERIALIZE_WRITES = os.getenv("SQLITE_SERIALIZE_WRITES", "false").lower() == "true"
+
+write_queue = WriteQueue(SessionLocal)
+
+
+def run_write(fn: Callable[..., T], *args: Any) -> T:
+    """
+    Run ``fn(session, *args)`` as a write transaction; ``fn`` commits.
+
+    With SQLITE_SERIALIZE_WRITES enabled the call goes through the single
+    writer thread, otherwise it runs in the calling thread.
+    """
+    if SERIALIZE_WRITES and not write_queue.in_writer_thread():
+        return write_queue.submit(fn, *args).result()
+    return run_in_session(SessionLocal, fn, *args)
+
+
+async def run_write_async(fn: Callable[..., T], *args: Any) -> T:
+    """``run_write`` for coroutines; the transaction runs on a thread, never on the loop."""
+    if SERIALIZE_WRITES:
+        return await asyncio.wrap_future(write_queue.submit(fn, *args))
+    return await asyncio.to_thread(run_in_session, SessionLocal, fn, *args)
@@ -0,0 +1,203 @@
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from backend.coordination import backend, leases
+from backend.db import run_write
+from backend.persistence import store_generated_quiz
+from backend.sqlite_dal import GenerationJob, utcnow
+from backend.utils import (GenerationResult, generate_quiz_from_pdf_result,
+                           generate_quiz_result)
+from backend.workers import generation_pool
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+def job_lease(job_id: str) -> str:
+    """The lease held by the process running a job, see backend/coordination.py."""
+    return f"job:{job_id}"
+
+
+def create_job(db: Session, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Record a new pending job and commit it so workers and pollers can see it.
+
+    This process holds the job's lease from before the commit until
+    submit_job's run finishes, so other processes can tell it is alive.
+
+    Returns:
+        dict: The new job, as returned by job_to_dict
+    """
+    job = GenerationJob(id=uuid.uuid4().hex, kind=kind, status="pending", params=params)
+    leases.acquire(job_lease(job.id))
+    db.add(job)
+    db.commit()
+    return job_to_dict(job)
+
+
+def delete_job(db: Session, job_id: str) -> None:
+    """Remove a job that could not be queued, and commit."""
+    db.execute(delete(GenerationJob).where(GenerationJob.id == job_id))
+    db.commit()
+
+
+def submit_job(job_id: str, run: Callable[..., None], *args: Any) -> None:
+    """
+    Run ``run(job_id, *args)`` on the generation pool and release the job's
+    lease when it finishes.
+
+    Raises:
+        PoolSaturatedError: The pool is full; the lease is released
+    """
+    try:
+        future = generation_pool.submit(run, job_id, *args)
+    except BaseException:
+        leases.release(job_lease(job_id))
+        raise
+    future.add_done_callback(lambda _: leases.release(job_lease(job_id)))
+
+
+def get_job(db: Session, job_id: str) -> Optional[GenerationJob]:
+    """
+    Load a job, failing it first if it is still active but no process holds
+    its lease any more (its worker died).
+    """
+    job = db.get(GenerationJob, job_id)
+    if job is not None and job.status in ACTIVE_STATUSES and _interrupted(job):
+        _fail_interrupted(db, [job.id])
+        db.refresh(job)
+    return job
+
+
+def run_job(job_id: str, generate: Callable[..., GenerationResult], *args: Any) -> None:
+    """
+    Execute a generation job inside a pool worker.
+
+    The job row is moved to ``running``, then to ``succeeded`` with the stored
+    topic id, or to ``failed`` with the error message.
+    """
+    if not run_write(_start_job, job_id):
+        return
+
+    try:
+        result = generate(*args)
+    except Exception as e:
+        run_write(_finish_job, job_id, None, str(e) or e.__class__.__name__)
+    else:
+        run_write(_finish_job, job_id, result, None)
+
+
+def _start_job(db: Session, job_id: str) -> bool:
+    job = db.get(GenerationJob, job_id)
+    if job is None:
+        return False
+    job.status = "running"
+    job.started_at = utcnow()
+    db.commit()
+    return True
+
+
+def _finish_job(
+    db: Session, job_id: str, result: Optional[GenerationResult], error: Optional[str]
+) -> None:
+    if result is not None:
+        try:
+            topic_id = store_generated_quiz(db, result)
+        except Exception as e:
+            db.rollback()
+            error = str(e) or e.__class__.__name__
+
+    job = db.get(GenerationJob, job_id)
+    if job is None:
+        # Deleted while it ran; a stored quiz stays stored
+        return
+    if error is None:
+        job.status = "succeeded"
+        job.topic_id = topic_id
+    else:
+        job.status = "failed"
+        job.error = error
+    job.finished_at = utcnow()
+    db.commit()
+
+
+def run_url_job(
+    job_id: str, url: str, num_questions: int, difficulty: str, mode: str
+) -> None:
+    run_job(job_id, generate_quiz_result, url, num_questions, difficulty, mode)
+
+
+def run_pdf_job(
+    job_id: str,
+    pdf_data: bytes,
+    filename: str,
+    num_questions: int,
+    difficulty: str,
+    mode: str,
+) -> None:
+    run_job(
+        job_id,
+        generate_quiz_from_pdf_result,
+        pdf_data,
+        filename,
+        num_questions,
+        difficulty,
+        mode,
+    )
+
+
+def fail_interrupted_jobs(db: Session) -> int:
+    """
+    Mark jobs left pending or running by a process that is gone as failed.
+
+    Their worker died with that process, so they would otherwise never finish.
+
+    Returns:
+        int: The number of jobs that were marked as failed
+    """
+    jobs = db.query(GenerationJob).filter(GenerationJob.status.in_(ACTIVE_STATUSES)).all()
+    # Jobs of other worker processes that are still alive keep running
+    return _fail_interrupted(db, [job.id for job in jobs if _interrupted(job)])
+
+
+def _interrupted(job: GenerationJob) -> bool:
+    return backend.holder(job_lease(job.id)) is None
+
+
+def _fail_interrupted(db: Session, job_ids: List[str]) -> int:
+    if not job_ids:
+        return 0
+    # Conditional, so a job that finished meanwhile keeps its result
+    failed = db.execute(
+        update(GenerationJob)
+        .where(GenerationJob.id.in_(job_ids), GenerationJob.status.in_(ACTIVE_STATUSES))
+        .values(status="failed", error="Interrupted by a server restart", finished_at=utcnow())
+    ).rowcount
+    db.commit()
+    return failed
+
+
+def job_to_dict(job: GenerationJob) -> Dict[str, Any]:
+    def seconds(start, end):
+        if start is None or end is None:
+            return None
+        return round((end - start).total_seconds(), 3)
+
+    def iso(value):
+        return value.isoformat() + "Z" if value is not None else None
+
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "params": job.params,
+        "topic_id": job.topic_id,
+        "error": job.error,
+        "created_at": iso(job.created_at),
+        "started_at": iso(job.started_at),
+        "finished_at": iso(job.finished_at),
+        "queue_seconds": seconds(job.created_at, job.started_at),
+        "run_seconds": seconds(job.started_at, job.finished_at),
+    }
@@ -0,0 +1,446 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Callable, Coroutine, Dict, Optional
+
+import httpx
+
+from backend.metrics import record_llm_request
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when the LLM provider fails after all retries."""
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for requests per minute and tokens per minute.
+
+    A limit of ``None`` disables that bucket. Must be used from a single
+    event loop, which the client guarantees by running on its own loop.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = requests_per_minute or 0.0
+        self._tokens = tokens_per_minute or 0.0
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self, tokens: int) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Callers queue on the lock, so capacity is handed out first come, first served
+        async with self._lock:
+            if self.tokens_per_minute is not None:
+                tokens = min(tokens, self.tokens_per_minute)
+            while True:
+                self._refill()
+                wait = max(
+                    self._wait_time(self._requests, 1, self.requests_per_minute),
+                    self._wait_time(self._tokens, tokens, self.tokens_per_minute),
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.requests_per_minute is not None:
+                self._requests -= 1
+            if self.tokens_per_minute is not None:
+                self._tokens -= tokens
+
+    def refund(self, tokens: int) -> None:
+        """Return tokens that were reserved but not used by the request."""
+        if self.tokens_per_minute is not None and tokens > 0:
+            self._tokens = min(self._tokens + tokens, self.tokens_per_minute)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute is not None:
+            self._requests = min(
+                self._requests + elapsed * self.requests_per_minute / 60,
+                self.requests_per_minute,
+            )
+        if self.tokens_per_minute is not None:
+            self._tokens = min(
+                self._tokens + elapsed * self.tokens_per_minute / 60,
+                self.tokens_per_minute,
+            )
+
+    @staticmethod
+    def _wait_time(available: float, needed: float, per_minute: Optional[float]) -> float:
+        if per_minute is None or available >= needed:
+            return 0.0
+        return (needed - available) * 60 / per_minute
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    RateLimiter whose buckets live in a coordination backend (see
+    backend/coordination.py), so the limits hold for all API processes
+    together rather than for each of them.
+    """
+
+    def __init__(
+        self,
+        backend: Any,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ):
+        super().__init__(requests_per_minute, tokens_per_minute)
+        self.backend = backend
+
+    async def acquire(self, tokens: int) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            buckets = self._buckets(tokens)
+            if not buckets:
+                return
+            while True:
+                # The backend may block on the database, keep it off the client's loop
+                wait = await asyncio.to_thread(self.backend.take, buckets)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+
+    def refund(self, tokens: int) -> None:
+        if self.tokens_per_minute is not None and tokens > 0:
+            asyncio.get_running_loop().run_in_executor(
+                None,
+                self.backend.give_back,
+                {"llm_tokens": (min(tokens, self.tokens_per_minute), self.tokens_per_minute)},
+            )
+
+    def _buckets(self, tokens: int) -> Dict[str, Any]:
+        buckets = {}
+        if self.requests_per_minute is not None:
+            buckets["llm_requests"] = (1, self.requests_per_minute)
+        if self.tokens_per_minute is not None:
+            buckets["llm_tokens"] = (min(tokens, self.tokens_per_minute), self.tokens_per_minute)
+        return buckets
+
+
+class AsyncLLMClient:
+    """
+    Shared client for an OpenAI-compatible chat completions API.
+
+    All requests run on one background event loop over a single pooled
+    ``httpx.AsyncClient``, so connections are kept alive across requests and
+    the rate limiter sees every call made by the process. Synchronous callers
+    use ``complete``; coroutines on another loop await ``complete_async``.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str],
+        model: str,
+        timeout: float = 60.0,
+        connect_timeout: float = 10.0,
+        max_connections: int = 20,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = rate_limiter or RateLimiter(requests_per_minute, tokens_per_minute)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "AsyncLLMClient":
+        def optional_float(name: str) -> Optional[float]:
+            value = os.getenv(name)
+            return float(value) if value else None
+
+        requests_per_minute = optional_float("LLM_REQUESTS_PER_MINUTE")
+        tokens_per_minute = optional_float("LLM_TOKENS_PER_MINUTE")
+        from backend.coordination import COORDINATION_BACKEND, backend
+
+        rate_limiter = None
+        if COORDINATION_BACKEND != "local":
+            # Every worker process calls the same provider account
+            rate_limiter = SharedRateLimiter(backend, requests_per_minute, tokens_per_minute)
+
+        return cls(
+            base_url=os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1"),
+            api_key=os.getenv("LLM_API_KEY") or os.getenv("GROQ_API_KEY"),
+            model=os.getenv("LLM_MODEL", "llama-3.3-70b-versatile"),
+            timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "60")),
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            rate_limiter=rate_limiter,
+        )
+
+    def complete(self, prompt: str, **generation_kwargs: Any) -> Dict[str, Any]:
+        """Blocking completion for worker threads and Haystack components."""
+        started = time.perf_counter()
+        try:
+            result = self._submit(self._complete(prompt, generation_kwargs)).result()
+        except Exception:
+            record_llm_request(time.perf_counter() - started, None, status="error")
+            raise
+        record_llm_request(time.perf_counter() - started, _usage(result))
+        return result
+
+    async def complete_async(self, prompt: str, **generation_kwargs: Any) -> Dict[str, Any]:
+        """Completion awaitable from any event loop."""
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wrap_future(
+                self._submit(self._complete(prompt, generation_kwargs))
+            )
+        except Exception:
+            record_llm_request(time.perf_counter() - started, None, status="error")
+            raise
+        record_llm_request(time.perf_counter() - started, _usage(result))
+        return result
+
+    async def stream_async(self, prompt: str, **generation_kwargs: Any) -> AsyncIterator[str]:
+        """
+        Stream the completion's text deltas to a coroutine on any event loop.
+
+        The request runs on the client's loop and forwards deltas through a
+        queue on the caller's loop. Closing the iterator early cancels the
+        request.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        end = object()
+
+        def emit(item: Any) -> None:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        usage: Dict[str, Any] = {}
+
+        async def produce() -> None:
+            try:
+                usage.update(await self._stream(prompt, generation_kwargs, emit) or {})
+            except Exception as e:
+                emit(e)
+            else:
+                emit(end)
+
+        # Usage is recorded here rather than on the client's loop so that it
+        # counts towards the calling request
+        started = time.perf_counter()
+        future = self._submit(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is end:
+                    record_llm_request(time.perf_counter() - started, usage)
+                    return
+                if isinstance(item, Exception):
+                    record_llm_request(time.perf_counter() - started, None, status="error")
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def close(self) -> None:
+        with self._lock:
+            loop, http = self._loop, self._http
+            self._loop, self._http = None, None
+        if loop is None:
+            return
+        if http is not None:
+            asyncio.run_coroutine_threadsafe(http.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    def _submit(self, coroutine: Coroutine) -> Future:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="llm-client", daemon=True
+                ).start()
+            loop = self._loop
+        return asyncio.run_coroutine_threadsafe(coroutine, loop)
+
+    def _client(self) -> httpx.AsyncClient:
+        # Only called on the client's loop, so no locking is needed
+        if self._http is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._http
+
+    async def _complete(self, prompt: str, generation_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            **generation_kwargs,
+        }
+        # Rough token estimate (4 characters per token) reserved up front and
+        # corrected with the reported usage once the response arrives
+        reserved = len(prompt) // 4 + int(generation_kwargs.get("max_tokens", 0))
+        await self.rate_limiter.acquire(reserved)
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = await self._client().post("chat/completions", json=payload)
+            except httpx.TransportError as e:
+                error = f"{e.__class__.__name__}: {e}"
+            else:
+                if response.status_code < 400:
+                    return self._parse(response.json(), reserved)
+                error = f"HTTP {response.status_code}: {response.text[:500]}"
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    raise LLMError(error)
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt == self.max_retries:
+                break
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+        raise LLMError(f"LLM request failed after {self.max_retries + 1} attempts: {error}")
+
+    async def _stream(
+        self, prompt: str, generation_kwargs: Dict[str, Any], emit: Callable[[str], None]
+    ) -> Optional[Dict[str, Any]]:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            **generation_kwargs,
+            "stream": True,
+        }
+        reserved = len(prompt) // 4 + int(generation_kwargs.get("max_tokens", 0))
+        await self.rate_limiter.acquire(reserved)
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            started = False
+            try:
+                request = self._client().stream("POST", "chat/completions", json=payload)
+                async with request as response:
+                    if response.status_code < 400:
+                        usage = None
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                break
+                            chunk = json.loads(data)
+                            # Groq reports usage in x_groq, OpenAI in the last chunk
+                            usage = (
+                                chunk.get("usage")
+                                or (chunk.get("x_groq") or {}).get("usage")
+                                or usage
+                            )
+                            for choice in chunk.get("choices") or []:
+                                delta = (choice.get("delta") or {}).get("content")
+                                if delta:
+                                    started = True
+                                    emit(delta)
+                        if usage and "total_tokens" in usage:
+                            self.rate_limiter.refund(reserved - usage["total_tokens"])
+                        return usage
+                    body = (await response.aread()).decode("utf-8", "replace")
+                    error = f"HTTP {response.status_code}: {body[:500]}"
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        raise LLMError(error)
+                    retry_after = response.headers.get("Retry-After")
+            except httpx.TransportError as e:
+                # Text already sent to the caller can't be taken back
+                if started:
+                    raise LLMError(f"LLM stream interrupted: {e.__class__.__name__}: {e}") from e
+                error = f"{e.__class__.__name__}: {e}"
+
+            if attempt == self.max_retries:
+                break
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+        raise LLMError(f"LLM request failed after {self.max_retries + 1} attempts: {error}")
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        # Full jitter keeps concurrent retries from hitting the provider in lockstep
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def _parse(self, body: Dict[str, Any], reserved: int) -> Dict[str, Any]:
+        usage = body.get("usage") or {}
+        if "total_tokens" in usage:
+            self.rate_limiter.refund(reserved - usage["total_tokens"])
+
+        replies = []
+        meta = []
+        for choice in body.get("choices", []):
+            replies.append((choice.get("message") or {}).get("content") or "")
+            meta.append(
+                {
+                    "model": body.get("model", self.model),
+                    "index": choice.get("index", 0),
+                    "finish_reason": choice.get("finish_reason"),
+                    "usage": usage,
+                }
+            )
+        return {"replies": replies, "meta": meta}
+
+
+def _usage(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # Every choice carries the usage of the whole response
+    return result["meta"][0]["usage"] if result.get("meta") else None
+
+
+_llm_client: Optional[AsyncLLMClient] = None
+_llm_client_lock = threading.Lock()
+
+
+def get_llm_client() -> AsyncLLMClient:
+    """Process-wide LLM client shared by every pipeline."""
+    global _llm_client
+    with _llm_client_lock:
+        if _llm_client is None:
+            _llm_client = AsyncLLMClient.from_env()
+        return _llm_client
+
+
+def close_llm_client() -> None:
+    global _llm_client
+    with _llm_client_lock:
+        client, _llm_client = _llm_client, None
+    if client is not None:
+        client.close()
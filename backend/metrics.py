@@ -0,0 +1,248 @@
+import bisect
+import contextlib
+import contextvars
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    """Monotonic counter, optionally split by labels."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return super().render() + [
+            f"{self.name}{self._labels(key)} {_number(value)}" for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram, optionally split by labels."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: a count per bucket (plus +Inf), the sum and the count
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0, 0])
+            )
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+            total[1] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(
+                (key, (list(counts), list(total))) for key, (counts, total) in self._values.items()
+            )
+        lines = super().render()
+        for key, (counts, (total, count)) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == math.inf else _number(bound)
+                labels = self._labels(key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    Metric whose labelled values are read from a callback at scrape time,
+    for state that is already tracked elsewhere (e.g. pool and cache stats).
+    Pass ``type="counter"`` for values that only grow.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Dict[Tuple[str, ...], float]],
+        type: str = "gauge",
+    ):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+        self.type = type
+
+    def render(self) -> List[str]:
+        return super().render() + [
+            f"{self.name}{self._labels(key)} {_number(value)}"
+            for key, value in sorted(self.collect().items())
+        ]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+registry: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in registry for line in metric.render()) + "\n"
+
+
+STAGE_DURATION = Histogram(
+    "quiz_pipeline_stage_duration_seconds",
+    "Time spent in each pipeline component",
+    ("pipeline", "component"),
+)
+PIPELINE_DURATION = Histogram(
+    "quiz_pipeline_duration_seconds",
+    "Time spent running a whole pipeline",
+    ("pipeline", "status"),
+)
+DB_COMMIT_DURATION = Histogram(
+    "quiz_db_commit_duration_seconds",
+    "Time spent committing database transactions",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+LLM_REQUEST_DURATION = Histogram(
+    "quiz_llm_request_duration_seconds",
+    "Latency of LLM completions, including retries and rate limiting",
+    ("status",),
+)
+LLM_TOKENS = Counter(
+    "quiz_llm_tokens_total",
+    "LLM tokens used, as reported by the provider",
+    ("kind",),
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "quiz_http_request_duration_seconds",
+    "Latency of API requests",
+    ("method", "route", "status"),
+)
+
+
+class RequestMetrics:
+    """Stage timings and token usage accumulated for one API request."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_tokens(self, kind: str, tokens: int) -> None:
+        with self._lock:
+            self.tokens[kind] = self.tokens.get(kind, 0) + tokens
+
+    def fields(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages_ms": {
+                    stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()
+                },
+                "llm_tokens": dict(self.tokens),
+            }
+
+
+# Set by the HTTP middleware; copied into generation pool threads with the context
+current_request: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+def record_stage(pipeline: str, component: str, seconds: float) -> None:
+    STAGE_DURATION.observe(seconds, pipeline=pipeline, component=component)
+    request = current_request.get()
+    if request is not None:
+        request.add_stage(component, seconds)
+
+
+def record_commit(seconds: float) -> None:
+    DB_COMMIT_DURATION.observe(seconds)
+    request = current_request.get()
+    if request is not None:
+        request.add_stage("db_commit", seconds)
+
+
+def record_llm_request(
+    seconds: float, usage: Optional[Dict[str, Any]], status: str = "ok"
+) -> None:
+    LLM_REQUEST_DURATION.observe(seconds, status=status)
+    request = current_request.get()
+    for kind in ("prompt_tokens", "completion_tokens"):
+        tokens = (usage or {}).get(kind)
+        if tokens:
+            LLM_TOKENS.inc(tokens, kind=kind.split("_")[0])
+            if request is not None:
+                request.add_tokens(kind.split("_")[0], tokens)
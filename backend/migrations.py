@@ -0,0 +1,221 @@
+from typing import Callable, List, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from backend.search import backfill_signatures
+from backend.sqlite_dal import OPTION_COLUMNS
+
+
+def add_column(table: str, column: str, definition: str) -> Callable[[Connection], None]:
+    """
+    Migration step adding a column unless it exists, since SQLite has no
+    ADD COLUMN IF NOT EXISTS and create_all already adds it to new databases.
+    """
+
+    def step(connection: Connection) -> None:
+        columns = {row[1] for row in connection.execute(text(f"PRAGMA table_info({table})"))}
+        if column not in columns:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+
+    return step
+
+
+def when_column_exists(
+    table: str, column: str, steps: List[Union[str, Callable[[Connection], None]]]
+) -> Callable[[Connection], None]:
+    """
+    Migration step running ``steps`` only if the column exists, for steps
+    that read a column a later migration removed: new databases are created
+    without it.
+    """
+
+    def step(connection: Connection) -> None:
+        columns = {row[1] for row in connection.execute(text(f"PRAGMA table_info({table})"))}
+        if column in columns:
+            for statement in steps:
+                run_step(connection, statement)
+
+    return step
+
+
+def run_step(connection: Connection, statement: Union[str, Callable[[Connection], None]]) -> None:
+    if callable(statement):
+        statement(connection)
+    else:
+        connection.execute(text(statement))
+
+
+def unpack_options(connection: Connection) -> None:
+    """Copy the options of every question from the JSON array into the option columns."""
+    invalid = connection.execute(
+        text(
+            "SELECT count(*) FROM quiz_questions "
+            "WHERE coalesce(json_array_length(options), 0) != 4"
+        )
+    ).scalar()
+    if invalid:
+        # Not truncated or padded silently: fix or delete those questions, then restart
+        raise RuntimeError(
+            f"{invalid} questions don't have exactly four options and can't be migrated"
+        )
+    connection.execute(
+        text(
+            "UPDATE quiz_questions SET "
+            + ", ".join(
+                f"{column} = json_extract(options, '$[{index}]')"
+                for index, column in enumerate(OPTION_COLUMNS)
+            )
+        )
+    )
+
+
+# Columns of the full-text index since 0006
+_FTS_COLUMNS = ", ".join(("question", *OPTION_COLUMNS))
+
+
+def _fts_values(row: str) -> str:
+    return ", ".join(f"{row}.{column}" for column in ("question", *OPTION_COLUMNS))
+
+
+# Schema changes for databases created before the change was made to the models
+# in backend/sqlite_dal.py; Base.metadata.create_all only creates missing tables.
+# Append new migrations with the next number, never edit applied ones. A step is
+# a SQL statement or a callable taking the connection.
+MIGRATIONS: List[Tuple[str, List[Union[str, Callable[[Connection], None]]]]] = [
+    (
+        "0001_quiz_question_topic_index",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_quiz_questions_topic_id "
+            "ON quiz_questions (topic_id)",
+        ],
+    ),
+    (
+        "0002_quiz_topic_category_index",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_quiz_topics_category_subcategory "
+            "ON quiz_topics (category, subcategory)",
+        ],
+    ),
+    (
+        "0003_quiz_topic_source_and_difficulty",
+        [
+            add_column("quiz_topics", "difficulty", "VARCHAR"),
+            add_column("quiz_topics", "source_id", "INTEGER REFERENCES quiz_sources (id)"),
+            "CREATE INDEX IF NOT EXISTS ix_quiz_topics_source_id ON quiz_topics (source_id)",
+        ],
+    ),
+    (
+        "0004_quiz_question_search_index",
+        [
+            add_column("quiz_questions", "signature", "BLOB"),
+            # The JSON options column is gone from databases created after
+            # 0006, which builds the index over the option columns instead
+            when_column_exists(
+                "quiz_questions",
+                "options",
+                [
+                    # External content table: the text lives in quiz_questions only
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS quiz_questions_fts USING fts5("
+                    "question, options, content='quiz_questions', content_rowid='id', "
+                    "tokenize='porter unicode61')",
+                    "CREATE TRIGGER IF NOT EXISTS quiz_questions_fts_insert "
+                    "AFTER INSERT ON quiz_questions "
+                    "BEGIN INSERT INTO quiz_questions_fts (rowid, question, options) "
+                    "VALUES (new.id, new.question, new.options); END",
+                    "CREATE TRIGGER IF NOT EXISTS quiz_questions_fts_delete "
+                    "AFTER DELETE ON quiz_questions "
+                    "BEGIN INSERT INTO quiz_questions_fts "
+                    "(quiz_questions_fts, rowid, question, options) "
+                    "VALUES ('delete', old.id, old.question, old.options); END",
+                    "CREATE TRIGGER IF NOT EXISTS quiz_questions_fts_update "
+                    "AFTER UPDATE OF question, options ON quiz_questions "
+                    "BEGIN INSERT INTO quiz_questions_fts "
+                    "(quiz_questions_fts, rowid, question, options) "
+                    "VALUES ('delete', old.id, old.question, old.options); "
+                    "INSERT INTO quiz_questions_fts (rowid, question, options) "
+                    "VALUES (new.id, new.question, new.options); END",
+                    "INSERT INTO quiz_questions_fts (quiz_questions_fts) VALUES ('rebuild')",
+                    backfill_signatures,
+                ],
+            ),
+        ],
+    ),
+    (
+        "0005_quiz_topic_warm_pool",
+        [
+            add_column("quiz_topics", "pooled", "BOOLEAN NOT NULL DEFAULT 0"),
+            add_column("quiz_topics", "served_at", "DATETIME"),
+            "CREATE INDEX IF NOT EXISTS ix_quiz_topics_pool_stock "
+            "ON quiz_topics (category, subcategory, difficulty) "
+            "WHERE pooled = 1 AND served_at IS NULL",
+        ],
+    ),
+    (
+        "0006_quiz_question_option_columns",
+        [
+            *(
+                add_column("quiz_questions", column, "VARCHAR NOT NULL DEFAULT ''")
+                for column in OPTION_COLUMNS
+            ),
+            when_column_exists(
+                "quiz_questions",
+                "options",
+                [
+                    unpack_options,
+                    # The old index and its triggers read the column being dropped
+                    "DROP TRIGGER IF EXISTS quiz_questions_fts_insert",
+                    "DROP TRIGGER IF EXISTS quiz_questions_fts_delete",
+                    "DROP TRIGGER IF EXISTS quiz_questions_fts_update",
+                    "DROP TABLE IF EXISTS quiz_questions_fts",
+                    "ALTER TABLE quiz_questions DROP COLUMN options",
+                ],
+            ),
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS quiz_questions_fts USING fts5({_FTS_COLUMNS}, "
+            "content='quiz_questions', content_rowid='id', tokenize='porter unicode61')",
+            "CREATE TRIGGER IF NOT EXISTS quiz_questions_fts_insert AFTER INSERT ON quiz_questions "
+            f"BEGIN INSERT INTO quiz_questions_fts (rowid, {_FTS_COLUMNS}) "
+            f"VALUES (new.id, {_fts_values('new')}); END",
+            "CREATE TRIGGER IF NOT EXISTS quiz_questions_fts_delete AFTER DELETE ON quiz_questions "
+            f"BEGIN INSERT INTO quiz_questions_fts (quiz_questions_fts, rowid, {_FTS_COLUMNS}) "
+            f"VALUES ('delete', old.id, {_fts_values('old')}); END",
+            "CREATE TRIGGER IF NOT EXISTS quiz_questions_fts_update "
+            f"AFTER UPDATE OF {_FTS_COLUMNS} ON quiz_questions "
+            f"BEGIN INSERT INTO quiz_questions_fts (quiz_questions_fts, rowid, {_FTS_COLUMNS}) "
+            f"VALUES ('delete', old.id, {_fts_values('old')}); "
+            f"INSERT INTO quiz_questions_fts (rowid, {_FTS_COLUMNS}) "
+            f"VALUES (new.id, {_fts_values('new')}); END",
+            "INSERT INTO quiz_questions_fts (quiz_questions_fts) VALUES ('rebuild')",
+        ],
+    ),
+]
+
+
+def run_migrations(connection: Connection) -> List[str]:
+    """
+    Apply pending migrations in order, recording them in schema_migrations.
+
+    Runs in the caller's transaction, which should hold the write lock
+    (BEGIN IMMEDIATE) so concurrently starting processes migrate one at a time.
+
+    Returns:
+        list: The names of the migrations that were applied
+    """
+    applied = []
+    connection.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations "
+            "(name VARCHAR PRIMARY KEY, applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        )
+    )
+    done = set(connection.execute(text("SELECT name FROM schema_migrations")).scalars())
+    for name, statements in MIGRATIONS:
+        if name in done:
+            continue
+        for statement in statements:
+            run_step(connection, statement)
+        connection.execute(
+            text("INSERT INTO schema_migrations (name) VALUES (:name)"), {"name": name}
+        )
+        applied.append(name)
+    return applied
@@ -0,0 +1,201 @@
+import json
+import logging
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from backend import metrics
+from backend.quiz_schema import QuizQuestionSchema, QuizSchema
+
+logger = logging.getLogger(__name__)
+
+
+class QuizParseError(ValueError):
+    """Raised when an LLM reply does not contain a valid quiz."""
+
+
+# Characters the JSON extractor has to look at; everything else is skipped
+_JSON_STRUCTURE = re.compile(r'[{}\[\]"\\]')
+
+
+def iter_json_candidates(text: str) -> Iterator[str]:
+    """
+    Yield every top-level bracket-balanced ``{...}`` or ``[...]`` span of
+    ``text`` in a single pass, ignoring brackets inside JSON strings.
+
+    An unterminated span (e.g. a truncated reply) is yielded up to the end of
+    the text.
+    """
+    start = None
+    depth = 0
+    in_string = False
+    escaped_at = -1
+    for match in _JSON_STRUCTURE.finditer(text):
+        char, index = match.group(), match.start()
+        if start is None:
+            if char in "{[":
+                start, depth = index, 1
+            continue
+        if in_string:
+            if index == escaped_at:
+                continue
+            if char == "\\":
+                escaped_at = index + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                yield text[start:index + 1]
+                start = None
+    if start is not None:
+        yield text[start:]
+
+
+class ParserMetrics:
+    """Counters of how QuizParser handled each reply, exported on /metrics."""
+
+    PATHS = ("strict", "extracted", "repaired", "failed")
+
+    def __init__(self):
+        self.replies = metrics.Counter(
+            "quiz_parser_replies_total", "LLM replies by parsing path", ("path",)
+        )
+        self.dropped_questions = metrics.Counter(
+            "quiz_parser_dropped_questions_total", "Malformed questions dropped from replies"
+        )
+
+    def record(self, path: str, dropped_questions: int = 0) -> None:
+        self.replies.inc(path=path)
+        if dropped_questions:
+            self.dropped_questions.inc(dropped_questions)
+
+    def stats(self) -> Dict[str, int]:
+        stats = {path: int(self.replies.value(path=path)) for path in self.PATHS}
+        stats["dropped_questions"] = int(self.dropped_questions.value())
+        return stats
+
+
+parser_metrics = ParserMetrics()
+
+
+def validate_quiz(data: Any) -> Tuple[Dict, int]:
+    """
+    Validate a decoded reply against ``QuizSchema``.
+
+    A list is accepted when one of its items is a valid quiz. Malformed
+    questions are dropped as long as at least one valid question remains.
+
+    Returns:
+        tuple: The normalized quiz and the number of dropped questions
+    """
+    if isinstance(data, list):
+        errors = []
+        for item in data:
+            try:
+                return validate_quiz(item)
+            except QuizParseError as e:
+                errors.append(e)
+        raise errors[0] if errors else QuizParseError("The reply contains an empty list")
+    if not isinstance(data, dict):
+        raise QuizParseError(f"Expected a JSON object, got {type(data).__name__}")
+
+    questions = data.get("questions")
+    if not isinstance(questions, list):
+        raise QuizParseError("The quiz has no questions list")
+    valid = []
+    for question in questions:
+        try:
+            valid.append(QuizQuestionSchema.model_validate(question))
+        except ValidationError:
+            pass
+
+    try:
+        quiz = QuizSchema.model_validate({**data, "questions": valid})
+    except ValidationError as e:
+        raise QuizParseError(f"Invalid quiz: {e.errors()[0]['loc']} {e.errors()[0]['msg']}") from e
+    return quiz.model_dump(), len(questions) - len(valid)
+
+
+class QuizStreamParser:
+    """
+    Incremental parser for a quiz reply that arrives token by token.
+
+    ``feed`` scans only the new text, with the same bracket tracking as
+    ``iter_json_candidates``, and returns every question object that closed
+    in it, validated against ``QuizQuestionSchema``. ``header`` holds the
+    topic, category and subcategory once the questions list starts.
+    """
+
+    HEADER_FIELDS = ("topic", "category", "subcategory")
+
+    def __init__(self):
+        self.text = ""
+        self.header: Optional[Dict[str, Any]] = None
+        self._pos = 0
+        self._stack: List[Tuple[str, int]] = []  # Open brackets and their offsets
+        self._in_string = False
+        self._escaped_at = -1
+        self._done = False
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        self.text += delta
+        questions = []
+        for match in _JSON_STRUCTURE.finditer(self.text, self._pos):
+            if self._done:
+                break
+            char, index = match.group(), match.start()
+            if self._in_string:
+                if index == self._escaped_at:
+                    continue
+                if char == "\\":
+                    self._escaped_at = index + 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = bool(self._stack)
+            elif char in "{[":
+                if char == "[" and self.header is None and self._stack:
+                    self._read_header(index)
+                self._stack.append((char, index))
+            elif char in "}]" and self._stack:
+                _, start = self._stack.pop()
+                if not self._stack:
+                    self._done = True
+                elif char == "}":
+                    question = self._read_question(self.text[start:index + 1])
+                    if question is not None:
+                        questions.append(question)
+        self._pos = len(self.text)
+        return questions
+
+    def _read_header(self, index: int) -> None:
+        # The prompt puts the header fields before the questions list, so the
+        # enclosing object up to here closes into valid JSON
+        bracket, start = self._stack[-1]
+        if bracket != "{":
+            return
+        try:
+            data = json.loads(self.text[start:index] + "null}")
+        except json.JSONDecodeError:
+            return
+        if isinstance(data, dict) and "topic" in data:
+            self.header = {field: data.get(field) for field in self.HEADER_FIELDS}
+
+    @staticmethod
+    def _read_question(span: str) -> Optional[Dict[str, Any]]:
+        try:
+            data = json.loads(span)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(data, dict) or "question" not in data:
+            return None
+        try:
+            return QuizQuestionSchema.model_validate(data).model_dump()
+        except ValidationError:
+            return None
@@ -0,0 +1,296 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from backend.cache import CACHE_ENABLED, REUSE_CACHED_TOPICS, generation_cache
+from backend.queries import categories_cache, load_quiz
+from backend.search import (DEDUP_MERGED_QUIZZES, DEDUP_MODE, DEDUP_QUESTIONS,
+                            DEDUP_THRESHOLD, find_near_duplicate,
+                            question_signature, similarity)
+from backend.sqlite_dal import QuizQuestion, QuizSource, QuizTopic
+from backend.utils import GenerationResult, QuizSourceRef
+
+
+def save_quiz(db: Session, quiz: Dict[str, Any]) -> int:
+    """
+    Insert a generated quiz and its questions.
+
+    The caller owns the transaction and is responsible for committing.
+
+    Returns:
+        int: The id of the new quiz topic
+    """
+    return save_quizzes(db, [quiz])[0]
+
+
+def save_quizzes(
+    db: Session,
+    quizzes: List[Dict[str, Any]],
+    topic_fields: Optional[List[Dict[str, Any]]] = None,
+) -> List[int]:
+    """
+    Insert many generated quizzes with two bulk statements, one for all topics
+    and one for all questions, bypassing the ORM unit of work.
+
+    The caller owns the transaction and is responsible for committing.
+
+    Args:
+        db: The session to insert with
+        quizzes: The generated quizzes
+        topic_fields: Extra QuizTopic columns per quiz: difficulty, source_id and pooled
+
+    Returns:
+        list: The ids of the new quiz topics, in the order of ``quizzes``
+    """
+    if not quizzes:
+        return []
+
+    topic_fields = topic_fields or [{} for _ in quizzes]
+    topic_ids = db.scalars(
+        insert(QuizTopic).returning(QuizTopic.id, sort_by_parameter_order=True),
+        [
+            {
+                "topic": quiz["topic"],
+                "category": quiz["category"],
+                "subcategory": quiz["subcategory"],
+                "difficulty": fields.get("difficulty"),
+                "source_id": fields.get("source_id"),
+                "pooled": fields.get("pooled", False),
+            }
+            for quiz, fields in zip(quizzes, topic_fields)
+        ],
+    ).all()
+
+    questions = [
+        {
+            "question": q["question"],
+            **QuizQuestion.option_values(q["options"]),
+            "right_option": q["right_option"],
+            "topic_id": topic_id,
+            "signature": question_signature(q["question"], q["options"], q["right_option"]),
+        }
+        for quiz, topic_id in zip(quizzes, topic_ids)
+        for q in quiz["questions"]
+    ]
+    if questions:
+        db.execute(insert(QuizQuestion), questions)
+
+    return list(topic_ids)
+
+
+def store_generated_quiz(db: Session, result: GenerationResult) -> int:
+    """
+    Persist a generation result and commit.
+
+    A cache hit whose topic is still stored reuses that topic instead of
+    inserting a duplicate, unless QUIZ_CACHE_REUSE_TOPICS is disabled.
+
+    Returns:
+        int: The id of the topic holding the quiz
+    """
+    return store_generated_quizzes(db, [result])[0]
+
+
+def store_generated_quizzes(db: Session, results: List[GenerationResult]) -> List[int]:
+    """
+    Persist several generation results in a single transaction.
+
+    Each result's quiz is replaced by the quiz as it was stored: without the
+    questions dropped as near-duplicates, or the payload of the existing
+    topic it was merged into or reused. The generation cache gets the same.
+
+    Returns:
+        list: The topic id holding each quiz, in the order of ``results``
+    """
+    reused: Dict[int, int] = {}
+    new_indices = []
+    for index, result in enumerate(results):
+        if (
+            REUSE_CACHED_TOPICS
+            and result.topic_id is not None
+            and db.get(QuizTopic, result.topic_id) is not None
+        ):
+            reused[index] = result.topic_id
+        else:
+            new_indices.append(index)
+
+    # Quizzes no longer matching what the generation cache holds for them
+    changed = set()
+    if DEDUP_MODE == "skip":
+        accepted: List[bytes] = []
+        for index in list(new_indices):
+            generated = len(results[index].quiz["questions"])
+            merged_topic_id = drop_near_duplicates(
+                db, results[index].quiz, results[index].difficulty, accepted
+            )
+            if merged_topic_id is not None:
+                reused[index] = merged_topic_id
+                new_indices.remove(index)
+                changed.add(index)
+            elif len(results[index].quiz["questions"]) != generated:
+                changed.add(index)
+
+    new_topic_ids = save_quizzes(
+        db,
+        [results[index].quiz for index in new_indices],
+        [
+            {
+                "difficulty": results[index].difficulty,
+                "source_id": resolve_source(db, results[index].source),
+            }
+            for index in new_indices
+        ],
+    )
+    db.commit()
+
+    created = dict(zip(new_indices, new_topic_ids))
+    if created:
+        categories_cache.invalidate()
+    for index, topic_id in reused.items():
+        stored = load_quiz(db, topic_id)
+        if stored is not None:
+            results[index].quiz = stored
+
+    # Only after the commit, so the cache never points at a rolled back topic
+    topic_ids = [reused.get(index, created.get(index)) for index in range(len(results))]
+    for index, topic_id in enumerate(topic_ids):
+        result = results[index]
+        if index in changed and CACHE_ENABLED:
+            generation_cache.set(result.cache_key, result.quiz, topic_id)
+        elif result.topic_id != topic_id:
+            generation_cache.link_topic(result.cache_key, topic_id)
+
+    return topic_ids
+
+
+def drop_near_duplicates(
+    db: Session, quiz: Dict[str, Any], difficulty: Optional[str], accepted: List[bytes]
+) -> Optional[int]:
+    """
+    Remove the questions of a new quiz that are near-duplicates of stored
+    questions, or of questions in ``accepted`` (signatures already kept in
+    this transaction), so every question is stored once.
+
+    When every question is a duplicate nothing new would be stored, so the
+    quiz is merged into the stored topic of the same name and difficulty
+    holding most of them. Without such a topic it is stored whole.
+
+    Returns:
+        int: The topic to reuse for a quiz with nothing new, otherwise None
+    """
+    kept = []
+    kept_signatures = []
+    duplicate_topics: Counter = Counter()
+    for question in quiz["questions"]:
+        signature = question_signature(
+            question["question"], question["options"], question["right_option"]
+        )
+        match = find_near_duplicate(db, question["question"], question["options"], signature)
+        if match is not None:
+            duplicate_topics[match.topic_id] += 1
+        elif not any(
+            similarity(signature, other) >= DEDUP_THRESHOLD
+            for other in accepted + kept_signatures
+        ):
+            kept.append(question)
+            kept_signatures.append(signature)
+
+    if not kept and duplicate_topics:
+        same_quiz = set(
+            db.scalars(
+                select(QuizTopic.id).where(
+                    QuizTopic.id.in_(duplicate_topics),
+                    QuizTopic.topic == quiz["topic"],
+                    QuizTopic.difficulty == difficulty,
+                )
+            )
+        )
+        for topic_id, _ in duplicate_topics.most_common():
+            if topic_id in same_quiz:
+                DEDUP_QUESTIONS.inc(len(quiz["questions"]), result="skipped")
+                DEDUP_MERGED_QUIZZES.inc()
+                return topic_id
+    if not kept:
+        # Repeats of this batch's own questions or of other quizzes, nothing to merge with
+        kept = quiz["questions"]
+    else:
+        accepted.extend(kept_signatures)
+
+    DEDUP_QUESTIONS.inc(len(kept), result="unique")
+    DEDUP_QUESTIONS.inc(len(quiz["questions"]) - len(kept), result="skipped")
+    # The response shows what was stored
+    quiz["questions"] = kept
+    return None
+
+
+def resolve_source(db: Session, source: Optional[QuizSourceRef]) -> Optional[int]:
+    """
+    Return the id of the stored source, inserting it if it is new.
+
+    Concurrent stores of the same source both insert; the loser's insert is
+    a no-op on the unique index and it reads the winner's row.
+
+    The caller owns the transaction and is responsible for committing.
+    """
+    if source is None:
+        return None
+    db.execute(
+        sqlite_insert(QuizSource)
+        .values(kind=source.kind, location=source.location, content_hash=source.content_hash)
+        .on_conflict_do_nothing(index_elements=[QuizSource.content_hash, QuizSource.location])
+    )
+    return db.scalar(
+        select(QuizSource.id).where(
+            QuizSource.content_hash == source.content_hash,
+            QuizSource.location == source.location,
+        )
+    )
+
+
+def store_quiz_variants(
+    db: Session, results: List[GenerationResult]
+) -> Tuple[Optional[int], List[int]]:
+    """
+    Persist the difficulty variants of one source in a single transaction.
+
+    Returns:
+        tuple: The source id and the topic id holding each variant
+    """
+    source_id = resolve_source(db, results[0].source) if results else None
+    return source_id, store_generated_quizzes(db, results)
+
+
+def store_pool_quizzes(
+    db: Session, results: List[GenerationResult], category: str, subcategory: str
+) -> List[int]:
+    """
+    Persist warm pool quizzes as unserved pooled topics and commit.
+
+    The quizzes are filed under the category of the pool slot they were
+    generated for, whatever the model chose, so the stock of each slot can be
+    counted. They skip the near-duplicate check: pooled topics are handed
+    out once each, and regenerating a source would otherwise rarely add stock.
+
+    Returns:
+        list: The ids of the new topics
+    """
+    quizzes = [
+        {**result.quiz, "category": category, "subcategory": subcategory} for result in results
+    ]
+    topic_ids = save_quizzes(
+        db,
+        quizzes,
+        [
+            {
+                "difficulty": result.difficulty,
+                "source_id": resolve_source(db, result.source),
+                "pooled": True,
+            }
+            for result in results
+        ],
+    )
+    db.commit()
+    return topic_ids
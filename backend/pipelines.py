@@ -1,55 +1,214 @@
-from haystack import Pipeline
-from haystack.components.builders import PromptBuilder
-from haystack.components.converters import HTMLToDocument
-from haystack.components.fetchers import LinkContentFetcher
-from haystack.components.generators import OpenAIGenerator
-from haystack.utils import Secret
-
-from backend.custom_components import PDFTextExtractor, QuizParser
-from backend.quiz_generation_prompt import (PDF_QUIZ_GENERATION_PROMPT,
-                                            QUIZ_GENERATION_PROMPT)
-
-quiz_generation_pipeline = Pipeline()
-quiz_generation_pipeline.add_component("link_content_fetcher", LinkContentFetcher())
-quiz_generation_pipeline.add_component("html_converter", HTMLToDocument())
-quiz_generation_pipeline.add_component(
-    "prompt_builder", PromptBuilder(template=QUIZ_GENERATION_PROMPT)
-)
-quiz_generation_pipeline.add_component(
-    "generator",
-    OpenAIGenerator(
-        api_key=Secret.from_env_var("GROQ_API_KEY"),
-        api_base_url="https://api.groq.com/openai/v1",
-        model="llama-3.3-70b-versatile",
-        generation_kwargs={"max_tokens": 2000, "temperature": 0.8, "top_p": 1},
-    ),
-)
-quiz_generation_pipeline.add_component("quiz_parser", QuizParser())
-
-quiz_generation_pipeline.connect("link_content_fetcher", "html_converter")
-quiz_generation_pipeline.connect("html_converter", "prompt_builder")
-quiz_generation_pipeline.connect("prompt_builder", "generator")
-quiz_generation_pipeline.connect("generator", "quiz_parser")
-
-# PDF-based quiz generation pipeline
-pdf_quiz_generation_pipeline = Pipeline()
-pdf_quiz_generation_pipeline.add_component("pdf_extractor", PDFTextExtractor())
-pdf_quiz_generation_pipeline.add_component(
-    "prompt_builder", PromptBuilder(template=PDF_QUIZ_GENERATION_PROMPT)
-)
-pdf_quiz_generation_pipeline.add_component(
-    "generator",
-    OpenAIGenerator(
-        api_key=Secret.from_env_var("GROQ_API_KEY"),
-        api_base_url="https://api.groq.com/openai/v1",
-        model="llama-3.3-70b-versatile",
-        generation_kwargs={"max_tokens": 2000, "temperature": 0.8, "top_p": 1},
-    ),
-)
-pdf_quiz_generation_pipeline.add_component("quiz_parser", QuizParser())
-
-# Specify the exact connections between components
-pdf_quiz_generation_pipeline.connect("pdf_extractor.text", "prompt_builder.text")
-pdf_quiz_generation_pipeline.connect("pdf_extractor.filename", "prompt_builder.filename")
-pdf_quiz_generation_pipeline.connect("prompt_builder", "generator")
-pdf_quiz_generation_pipeline.connect("generator", "quiz_parser")
+import os
+import threading
+from typing import TYPE_CHECKING, Callable, Dict
+
+if TYPE_CHECKING:
+    from haystack import Pipeline
+
+    from backend.custom_components import LLMGenerator, PDFTextExtractor
+
+# Haystack is slow to import, so pipelines are built on first use instead of at
+# import time: get_pipeline(name), or the module attribute of the same name
+# (e.g. pipelines.quiz_generation_pipeline), builds and caches the pipeline.
+
+CHUNK_SIZE = int(os.getenv("QUIZ_CHUNK_SIZE", "4000"))
+MAX_CHUNKS = int(os.getenv("QUIZ_MAX_CHUNKS", "6"))
+CHUNK_CONCURRENCY = int(os.getenv("QUIZ_CHUNK_CONCURRENCY", "3"))
+
+GENERATION_KWARGS = {"max_tokens": 2000, "temperature": 0.8, "top_p": 1}
+
+
+def variants_generation_kwargs(variant_count: int) -> Dict[str, int]:
+    """Room in the reply for ``variant_count`` quizzes instead of one."""
+    return {"max_tokens": GENERATION_KWARGS["max_tokens"] * variant_count}
+
+
+def make_generator() -> "LLMGenerator":
+    from backend.custom_components import LLMGenerator
+
+    # All generators share one pooled, rate limited client (see backend/llm.py)
+    return LLMGenerator(generation_kwargs=dict(GENERATION_KWARGS))
+
+
+def make_pdf_extractor(max_chars: int) -> "PDFTextExtractor":
+    from backend.custom_components import PDFTextExtractor
+
+    return PDFTextExtractor(
+        max_chars=max_chars,
+        max_pages=int(os.environ["PDF_MAX_PAGES"]) if os.getenv("PDF_MAX_PAGES") else None,
+        parallel_min_pages=int(os.getenv("PDF_PARALLEL_MIN_PAGES", "50")),
+        max_workers=int(os.getenv("PDF_EXTRACT_WORKERS", "1")),
+    )
+
+
+def make_chunked_generator(prompt_template: str):
+    from backend.custom_components import ChunkedQuizGenerator
+
+    return ChunkedQuizGenerator(
+        prompt_template=prompt_template,
+        generator=make_generator(),
+        chunk_size=CHUNK_SIZE,
+        max_chunks=MAX_CHUNKS,
+        max_concurrency=CHUNK_CONCURRENCY,
+    )
+
+
+def new_pipeline(name: str) -> "Pipeline":
+    from haystack import Pipeline
+
+    from backend.tracing import enable_pipeline_metrics
+
+    # Time every component run for /metrics and the request logs
+    enable_pipeline_metrics()
+    return Pipeline(metadata={"name": name})
+
+
+def build_url_content_pipeline() -> "Pipeline":
+    # Fetches a URL and converts it to documents; kept separate from generation so the
+    # fetched content can be hashed for the generation cache before the LLM is called.
+    # Converted pages are cached and revalidated with conditional GETs (backend/cache.py)
+    from backend.cache import content_cache
+    from backend.custom_components import CachedLinkContentFetcher
+
+    pipeline = new_pipeline("url_content")
+    pipeline.add_component(
+        "content_fetcher",
+        CachedLinkContentFetcher(
+            cache=content_cache,
+            timeout=float(os.getenv("QUIZ_FETCH_TIMEOUT_SECONDS", "10")),
+        ),
+    )
+    return pipeline
+
+
+def build_quiz_generation_pipeline() -> "Pipeline":
+    # Quiz generation from already fetched documents
+    from haystack.components.builders import PromptBuilder
+
+    from backend.custom_components import QuizParser
+    from backend.quiz_generation_prompt import QUIZ_GENERATION_PROMPT
+
+    pipeline = new_pipeline("quiz_generation")
+    pipeline.add_component("prompt_builder", PromptBuilder(template=QUIZ_GENERATION_PROMPT))
+    pipeline.add_component("generator", make_generator())
+    pipeline.add_component("quiz_parser", QuizParser())
+
+    pipeline.connect("prompt_builder", "generator")
+    pipeline.connect("generator", "quiz_parser")
+    return pipeline
+
+
+def build_pdf_quiz_generation_pipeline() -> "Pipeline":
+    # PDF-based quiz generation pipeline
+    from haystack.components.builders import PromptBuilder
+
+    from backend.custom_components import QuizParser
+    from backend.quiz_generation_prompt import PDF_QUIZ_GENERATION_PROMPT
+
+    pipeline = new_pipeline("pdf_quiz_generation")
+    # The prompt truncates the text to 8000 characters, so stop reading there
+    pipeline.add_component(
+        "pdf_extractor", make_pdf_extractor(int(os.getenv("PDF_MAX_CHARS", "8000")))
+    )
+    pipeline.add_component("prompt_builder", PromptBuilder(template=PDF_QUIZ_GENERATION_PROMPT))
+    pipeline.add_component("generator", make_generator())
+    pipeline.add_component("quiz_parser", QuizParser())
+
+    # Specify the exact connections between components
+    pipeline.connect("pdf_extractor.text", "prompt_builder.text")
+    pipeline.connect("pdf_extractor.filename", "prompt_builder.filename")
+    pipeline.connect("prompt_builder", "generator")
+    pipeline.connect("generator", "quiz_parser")
+    return pipeline
+
+
+def build_variants_pipeline(name: str, template: str) -> "Pipeline":
+    # Several difficulties from one prompt; the text is passed in, so a PDF is
+    # extracted once for all of its variants
+    from haystack.components.builders import PromptBuilder
+
+    from backend.custom_components import QuizVariantsParser
+
+    pipeline = new_pipeline(name)
+    pipeline.add_component("prompt_builder", PromptBuilder(template=template))
+    pipeline.add_component("generator", make_generator())
+    pipeline.add_component("quiz_parser", QuizVariantsParser())
+
+    pipeline.connect("prompt_builder", "generator")
+    pipeline.connect("generator", "quiz_parser")
+    return pipeline
+
+
+def build_quiz_variants_generation_pipeline() -> "Pipeline":
+    from backend.quiz_generation_prompt import QUIZ_VARIANTS_GENERATION_PROMPT
+
+    return build_variants_pipeline("quiz_variants_generation", QUIZ_VARIANTS_GENERATION_PROMPT)
+
+
+def build_pdf_quiz_variants_generation_pipeline() -> "Pipeline":
+    from backend.quiz_generation_prompt import PDF_QUIZ_VARIANTS_GENERATION_PROMPT
+
+    return build_variants_pipeline(
+        "pdf_quiz_variants_generation", PDF_QUIZ_VARIANTS_GENERATION_PROMPT
+    )
+
+
+def build_chunked_quiz_generation_pipeline() -> "Pipeline":
+    # Chunked (map-reduce) generation for long documents: the text is split into
+    # chunks, several chunks are turned into quizzes concurrently and the results
+    # are merged, instead of only using the beginning of the document
+    from backend.quiz_generation_prompt import QUIZ_GENERATION_PROMPT
+
+    pipeline = new_pipeline("chunked_quiz_generation")
+    pipeline.add_component("chunked_generator", make_chunked_generator(QUIZ_GENERATION_PROMPT))
+    return pipeline
+
+
+def build_chunked_pdf_quiz_generation_pipeline() -> "Pipeline":
+    from backend.quiz_generation_prompt import PDF_QUIZ_GENERATION_PROMPT
+
+    pipeline = new_pipeline("chunked_pdf_quiz_generation")
+    pipeline.add_component(
+        "pdf_extractor", make_pdf_extractor(int(os.getenv("PDF_CHUNKED_MAX_CHARS", "500000")))
+    )
+    pipeline.add_component(
+        "chunked_generator", make_chunked_generator(PDF_QUIZ_GENERATION_PROMPT)
+    )
+
+    pipeline.connect("pdf_extractor.text", "chunked_generator.text")
+    pipeline.connect("pdf_extractor.filename", "chunked_generator.filename")
+    return pipeline
+
+
+PIPELINE_BUILDERS: Dict[str, Callable[[], "Pipeline"]] = {
+    "url_content_pipeline": build_url_content_pipeline,
+    "quiz_generation_pipeline": build_quiz_generation_pipeline,
+    "pdf_quiz_generation_pipeline": build_pdf_quiz_generation_pipeline,
+    "chunked_quiz_generation_pipeline": build_chunked_quiz_generation_pipeline,
+    "chunked_pdf_quiz_generation_pipeline": build_chunked_pdf_quiz_generation_pipeline,
+    "quiz_variants_generation_pipeline": build_quiz_variants_generation_pipeline,
+    "pdf_quiz_variants_generation_pipeline": build_pdf_quiz_variants_generation_pipeline,
+}
+
+_pipelines: Dict[str, "Pipeline"] = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_pipeline(name: str) -> "Pipeline":
+    """Return the named pipeline, building it on first use."""
+    with _pipelines_lock:
+        if name not in _pipelines:
+            _pipelines[name] = PIPELINE_BUILDERS[name]()
+        return _pipelines[name]
+
+
+def warm_up() -> None:
+    """Build every pipeline so the first requests don't pay for it."""
+    for name in PIPELINE_BUILDERS:
+        get_pipeline(name)
+
+
+def __getattr__(name: str) -> "Pipeline":
+    if name in PIPELINE_BUILDERS:
+        return get_pipeline(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
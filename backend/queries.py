@@ -0,0 +1,189 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Select, and_, not_, select
+from sqlalchemy.orm import Session, joinedload
+
+from backend.responses import dumps
+from backend.sqlite_dal import QuizTopic
+
+TOPIC_COLUMNS = (QuizTopic.id, QuizTopic.topic, QuizTopic.category, QuizTopic.subcategory)
+# Warm pool stock stays hidden until /quiz/random claims it and sets served_at
+LISTED = not_(and_(QuizTopic.pooled == 1, QuizTopic.served_at.is_(None)))
+
+
+def topics_query(
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> Select:
+    """
+    Column-only topic listing in id order, using keyset pagination.
+
+    Args:
+        category: Only topics in this category
+        subcategory: Only topics in this subcategory
+        after_id: Only topics after this id (the cursor of the previous page)
+        limit: Maximum number of topics
+    """
+    query = select(*TOPIC_COLUMNS).where(LISTED).order_by(QuizTopic.id)
+    if category is not None:
+        query = query.where(QuizTopic.category == category)
+    if subcategory is not None:
+        query = query.where(QuizTopic.subcategory == subcategory)
+    if after_id is not None:
+        query = query.where(QuizTopic.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def list_topics(db: Session, **filters: Any) -> List[Dict[str, Any]]:
+    return [dict(row._mapping) for row in db.execute(topics_query(**filters))]
+
+
+def iter_topics(db: Session, batch_size: int = 500, **filters: Any) -> Iterator[Dict[str, Any]]:
+    """Stream topics in batches of ``batch_size`` rows instead of loading them all."""
+    result = db.execute(
+        topics_query(**filters).execution_options(yield_per=batch_size)
+    )
+    for row in result:
+        yield dict(row._mapping)
+
+
+def load_quiz(db: Session, topic_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Load a quiz with its questions in a single joined query. Unclaimed warm
+    pool quizzes are not found.
+    """
+    topic = (
+        db.query(QuizTopic)
+        .options(joinedload(QuizTopic.questions))
+        .filter(QuizTopic.id == topic_id, LISTED)
+        .first()
+    )
+    if topic is None:
+        return None
+    return {
+        "topic": topic.topic,
+        "category": topic.category,
+        "subcategory": topic.subcategory,
+        "questions": [
+            {
+                "question": q.question,
+                "options": q.options,
+                "right_option": q.right_option,
+            }
+            for q in topic.questions
+        ],
+    }
+
+
+class PayloadCache:
+    """
+    Bounded LRU of serialized JSON payloads keyed by topic id.
+
+    Stored quizzes are never modified, so entries don't need invalidating.
+    A ``max_entries`` of 0 disables the cache.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: int) -> Optional[bytes]:
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key: int, payload: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+quiz_payload_cache = PayloadCache(
+    max_entries=int(os.getenv("QUIZ_PAYLOAD_CACHE_MAX_ENTRIES", "1024")),
+)
+
+
+def category_map(db: Session) -> Dict[str, List[str]]:
+    """
+    Map every category to its subcategories, computed with one DISTINCT query.
+
+    Returns:
+        dict: Sorted subcategory lists keyed by category
+    """
+    categories: Dict[str, List[str]] = {}
+    rows = db.execute(
+        select(QuizTopic.category, QuizTopic.subcategory)
+        .where(LISTED)
+        .distinct()
+        .order_by(QuizTopic.category, QuizTopic.subcategory)
+    )
+    for category, subcategory in rows:
+        categories.setdefault(category, []).append(subcategory)
+    return categories
+
+
+class CategoriesCache:
+    """
+    In-process cache of the serialized /categories payload and its ETag.
+
+    ``invalidate`` is called whenever new topics are committed. Topics
+    committed by other worker processes are picked up once ``ttl_seconds``
+    has passed.
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self._payload: Optional[Tuple[bytes, str]] = None
+        self._expires_at = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> Tuple[bytes, str]:
+        """
+        Returns:
+            tuple: The JSON body and its quoted ETag
+        """
+        with self._lock:
+            if self._payload is not None and self._expires_at > time.monotonic():
+                return self._payload
+            version = self._version
+
+        body = dumps(category_map(db))
+        payload = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+        with self._lock:
+            # Don't store a payload computed before a concurrent invalidation
+            if version == self._version:
+                self._payload = payload
+                self._expires_at = time.monotonic() + self.ttl_seconds
+        return payload
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._payload = None
+            self._version += 1
+
+
+categories_cache = CategoriesCache(
+    ttl_seconds=float(os.getenv("QUIZ_CATEGORIES_CACHE_TTL_SECONDS", "60")),
+)
@@ -1,20 +1,23 @@
-QUIZ_GENERATION_PROMPT = """Given the following text, create {{ num_questions }} multiple choice quizzes in JSON format with {{ difficulty }} difficulty level.
+# Prompt templates are assembled from shared parts so the single quiz and the
+# multi-difficulty prompts ask for the same question format and categories.
 
-{% if difficulty == "easy" %}
+DIFFICULTY_GUIDANCE = """{% if difficulty == "easy" %}
 Create straightforward questions that test basic understanding and recall of the main concepts from the text.
 {% elif difficulty == "medium" %}
 Create moderately challenging questions that require understanding relationships between concepts and some analysis.
 {% elif difficulty == "hard" %}
 Create challenging Very hard questions that require deep understanding, critical thinking, knowledge of the subject and the ability to make connections between different parts of the text.
 {% endif %}
+"""
 
-Each question should have 4 different options, and only one of them should be correct.
+QUESTION_RULES = """Each question should have 4 different options, and only one of them should be correct.
 The options should be unambiguous.
 Each option should begin with a letter followed by a period and a space (e.g., "a. option").
 The question should also briefly mention the general topic of the text so that it can be understood in isolation.
 Each question should not give hints to answer the other questions.
+"""
 
-Categorize the quiz content by selecting the most appropriate category and subcategory from this list:
+CATEGORIES = """Categorize the quiz content by selecting the most appropriate category and subcategory from this list:
 
 1. General Knowledge
 • History & Politics
@@ -50,8 +53,16 @@ Categorize the quiz content by selecting the most appropriate category and subca
 • Social Media Trends & Viral Memes
 • Internet Culture & Viral Challenges
 • Celebrity Gossip & Reality TV
+"""
+
+PDF_CATEGORIES = CATEGORIES + """
+8. Education & Learning
+• Academic Subjects
+• Professional Development
+• Research & Studies
+"""
 
-respond with JSON only, no markdown or descriptions.
+JSON_FORMAT = """respond with JSON only, no markdown or descriptions.
 
 example JSON format you should absolutely follow:
 {"topic": "a title fits the topic of the text",
@@ -66,85 +77,101 @@ example JSON format you should absolutely follow:
     }, ...
   ]
 }
+"""
 
+# A single quiz of one difficulty
+QUIZ_GENERATION_PROMPT = (
+    """Given the following text, create {{ num_questions }} multiple choice quizzes in JSON format with {{ difficulty }} difficulty level.
+
+"""
+    + DIFFICULTY_GUIDANCE
+    + "\n"
+    + QUESTION_RULES
+    + "\n"
+    + CATEGORIES
+    + "\n"
+    + JSON_FORMAT
+    + """
 text:
 {% for doc in documents %}{{ doc.content|truncate(4000) }}{% endfor %}
 """
+)
 
-PDF_QUIZ_GENERATION_PROMPT = """Given the following text extracted from a PDF document titled "{{ filename }}", create {{ num_questions }} multiple choice quizzes in JSON format with {{ difficulty }} difficulty level.
-
-{% if difficulty == "easy" %}
-Create straightforward questions that test basic understanding and recall of the main concepts from the text.
-{% elif difficulty == "medium" %}
-Create moderately challenging questions that require understanding relationships between concepts and some analysis.
-{% elif difficulty == "hard" %}
-Create challenging Very hard questions that require deep understanding, critical thinking, knowledge of the subject and the ability to make connections between different parts of the text.
-{% endif %}
-
-Each question should have 4 different options, and only one of them should be correct.
-The options should be unambiguous.
-Each option should begin with a letter followed by a period and a space (e.g., "a. option").
-The question should also briefly mention the general topic of the text so that it can be understood in isolation.
-Each question should not give hints to answer the other questions.
-
-Categorize the quiz content by selecting the most appropriate category and subcategory from this list:
-
-1. General Knowledge
-• History & Politics
-• Science & Technology
-• World Cultures & Traditions
-
-2. Entertainment
-• Movies & TV Shows
-• Music & Concerts
-• Celebrity Trivia
-
-3. Sports
-• Team Sports (e.g. Soccer, Football, Basketball)
-• Individual Sports (e.g. Tennis, Golf, Athletics)
-• Extreme/Adventure Sports
-
-4. History
-• Ancient Civilizations
-• Medieval & Renaissance
-• Modern & Contemporary Events
-
-5. Science & Nature
-• Biology & Ecology
-• Chemistry & Physics
-• Space & Astronomy
-
-6. Geography
-• World Capitals & Countries
-• Physical Geography (mountains, rivers, oceans)
-• Famous Landmarks & Natural Wonders
+PDF_QUIZ_GENERATION_PROMPT = (
+    """Given the following text extracted from a PDF document titled "{{ filename }}", create {{ num_questions }} multiple choice quizzes in JSON format with {{ difficulty }} difficulty level.
 
-7. Pop Culture & Media
-• Social Media Trends & Viral Memes
-• Internet Culture & Viral Challenges
-• Celebrity Gossip & Reality TV
-
-8. Education & Learning
-• Academic Subjects
-• Professional Development
-• Research & Studies
+"""
+    + DIFFICULTY_GUIDANCE
+    + "\n"
+    + QUESTION_RULES
+    + "\n"
+    + PDF_CATEGORIES
+    + "\n"
+    + JSON_FORMAT
+    + """
+text:
+{{ text|truncate(8000) }}
+"""
+)
+
+# Several quizzes of different difficulties from one read of the text. The
+# variants input is a list of {"difficulty": ..., "num_questions": ...} dicts.
+VARIANTS_INSTRUCTIONS = (
+    """create one multiple choice quiz per difficulty level below, in JSON format. All quizzes share the same topic, category and subcategory, and no question may appear in more than one quiz.
+{% for variant in variants %}{% set difficulty = variant.difficulty %}
+{{ difficulty }} difficulty level: {{ variant.num_questions }} questions.
+"""
+    + DIFFICULTY_GUIDANCE
+    + """{% endfor %}
+"""
+    + QUESTION_RULES
+)
 
-respond with JSON only, no markdown or descriptions.
+VARIANTS_JSON_FORMAT = """respond with JSON only, no markdown or descriptions.
 
 example JSON format you should absolutely follow:
 {"topic": "a title fits the topic of the text",
  "category": "one of the main categories from the list",
  "subcategory": "the appropriate subcategory from the list",
- "questions":
+ "quizzes":
   [
     {
-      "question": "text of the question",
-      "options": ["a. 1st option", "b. 2nd option", "c. 3rd option", "d. 4th option"],
-      "right_option": "c"  # letter of the right option ("a" for the first, "b" for the second, etc.)
+      "difficulty": "the difficulty level of this quiz",
+      "questions":
+        [
+          {
+            "question": "text of the question",
+            "options": ["a. 1st option", "b. 2nd option", "c. 3rd option", "d. 4th option"],
+            "right_option": "c"  # letter of the right option ("a" for the first, "b" for the second, etc.)
+          }, ...
+        ]
     }, ...
   ]
 }
+"""
 
+QUIZ_VARIANTS_GENERATION_PROMPT = (
+    "Given the following text, "
+    + VARIANTS_INSTRUCTIONS
+    + "\n"
+    + CATEGORIES
+    + "\n"
+    + VARIANTS_JSON_FORMAT
+    + """
+text:
+{% for doc in documents %}{{ doc.content|truncate(4000) }}{% endfor %}
+"""
+)
+
+PDF_QUIZ_VARIANTS_GENERATION_PROMPT = (
+    'Given the following text extracted from a PDF document titled "{{ filename }}", '
+    + VARIANTS_INSTRUCTIONS
+    + "\n"
+    + PDF_CATEGORIES
+    + "\n"
+    + VARIANTS_JSON_FORMAT
+    + """
 text:
 {{ text|truncate(8000) }}
 """
+)
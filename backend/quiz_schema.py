@@ -0,0 +1,36 @@
+from typing import List
+
+from pydantic import BaseModel, Field, field_validator
+
+OPTION_LETTERS = ("a", "b", "c", "d")
+
+
+class QuizQuestionSchema(BaseModel):
+    question: str = Field(min_length=1)
+    options: List[str] = Field(min_length=4, max_length=4)
+    right_option: str
+
+    @field_validator("options")
+    @classmethod
+    def options_not_blank(cls, options: List[str]) -> List[str]:
+        if any(not option.strip() for option in options):
+            raise ValueError("options must not be blank")
+        return options
+
+    @field_validator("right_option", mode="before")
+    @classmethod
+    def normalize_right_option(cls, value) -> str:
+        # Models sometimes answer "C", "c." or "c. the option text"
+        letter = str(value).strip()[:1].lower()
+        if letter not in OPTION_LETTERS:
+            raise ValueError(f"right_option must be one of {', '.join(OPTION_LETTERS)}")
+        return letter
+
+
+class QuizSchema(BaseModel):
+    """A generated quiz as it is stored and returned by the API."""
+
+    topic: str = Field(min_length=1)
+    category: str = Field(min_length=1)
+    subcategory: str = Field(min_length=1)
+    questions: List[QuizQuestionSchema] = Field(min_length=1)
@@ -0,0 +1,38 @@
+import json
+import os
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# orjson is used when installed unless QUIZ_FAST_JSON=false
+FAST_JSON = orjson is not None and os.getenv("QUIZ_FAST_JSON", "true").lower() == "true"
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize ``content`` to compact UTF-8 JSON.
+
+    Uses orjson when available, otherwise the stdlib encoder with the same
+    settings as Starlette's JSONResponse.
+    """
+    if FAST_JSON:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with ``dumps``; the app's default response class."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import random
+import re
+import struct
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from backend import metrics
+from backend.quiz_schema import OPTION_LETTERS
+
+# "skip" stores a near-duplicate question only once, so quizzes may come back
+# with fewer questions than requested; "off" stores everything
+DEDUP_MODE = os.getenv("QUIZ_DEDUP_MODE", "off")
+# Estimated Jaccard similarity of two questions' shingles to count as duplicates
+DEDUP_THRESHOLD = float(os.getenv("QUIZ_DEDUP_THRESHOLD", "0.7"))
+# Best full-text matches whose signatures are compared with a new question
+DEDUP_CANDIDATES = int(os.getenv("QUIZ_DEDUP_CANDIDATES", "20"))
+
+SIGNATURE_SIZE = 64
+SHINGLE_WORDS = 2
+_PRIME = (1 << 61) - 1
+_SIGNATURE_FORMAT = f"<{SIGNATURE_SIZE}I"
+# Fixed seed: stored signatures must stay comparable across processes and restarts
+_seeds = random.Random(20240917)
+_PERMUTATIONS = [
+    (_seeds.randrange(1, _PRIME), _seeds.randrange(0, _PRIME)) for _ in range(SIGNATURE_SIZE)
+]
+
+_WORD = re.compile(r"\w+")
+# Topics alias t; warm pool stock stays hidden until /quiz/random claims it
+LISTED_TOPICS = "NOT (t.pooled = 1 AND t.served_at IS NULL)"
+_OPTION_LETTER = re.compile(r"^\s*[a-dA-D][.)]\s+")
+
+DEDUP_QUESTIONS = metrics.Counter(
+    "quiz_dedup_questions_total",
+    "Generated questions by near-duplicate check result",
+    ("result",),
+)
+DEDUP_MERGED_QUIZZES = metrics.Counter(
+    "quiz_dedup_merged_quizzes_total",
+    "Generated quizzes stored as an existing topic because every question was a duplicate",
+)
+
+
+def words(value: str) -> List[str]:
+    return _WORD.findall(value.lower())
+
+
+def shingles(question: str, options: Sequence[str], right_option: str) -> Set[str]:
+    """
+    Word pairs of the question, the options as one order-independent
+    shingle and the correct answer, so rewordings of a question match but
+    the same question about a different answer doesn't.
+    """
+    question_words = words(question)
+    result = {
+        " ".join(question_words[i:i + SHINGLE_WORDS])
+        for i in range(max(1, len(question_words) - SHINGLE_WORDS + 1))
+    }
+    option_texts = [" ".join(words(_OPTION_LETTER.sub("", option))) for option in options]
+    result.add("options:" + "|".join(sorted(option_texts)))
+    answer = OPTION_LETTERS.index(right_option) if right_option in OPTION_LETTERS else -1
+    if 0 <= answer < len(option_texts):
+        result.add("answer:" + option_texts[answer])
+    return result
+
+
+def question_signature(question: str, options: Sequence[str], right_option: str) -> bytes:
+    """MinHash signature of a question, stored in QuizQuestion.signature."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        for shingle in shingles(question, options, right_option)
+    ]
+    return struct.pack(
+        _SIGNATURE_FORMAT,
+        *(min((a * h + b) % _PRIME for h in hashes) & 0xFFFFFFFF for a, b in _PERMUTATIONS),
+    )
+
+
+def similarity(signature: bytes, other: bytes) -> float:
+    """Estimated Jaccard similarity of the shingles behind two signatures."""
+    same = sum(
+        x == y
+        for x, y in zip(
+            struct.unpack(_SIGNATURE_FORMAT, signature), struct.unpack(_SIGNATURE_FORMAT, other)
+        )
+    )
+    return same / SIGNATURE_SIZE
+
+
+def match_expression(value: str, require_all: bool = True) -> Optional[str]:
+    """
+    FTS5 MATCH expression for free text, with every term quoted so user input
+    can't inject query syntax.
+    """
+    terms = list(dict.fromkeys(words(value)))
+    if not terms:
+        return None
+    if require_all:
+        return " ".join(f'"{term}"' for term in terms)
+    # Short words rarely help to find candidates and slow the query down
+    return " OR ".join(f'"{term}"' for term in terms if len(term) > 2) or None
+
+
+@dataclass
+class NearDuplicate:
+    question_id: int
+    topic_id: int
+    similarity: float
+
+
+def find_near_duplicate(
+    db: Session,
+    question: str,
+    options: Sequence[str],
+    signature: bytes,
+    threshold: float = DEDUP_THRESHOLD,
+) -> Optional[NearDuplicate]:
+    """
+    The stored question most similar to this one, if it is a near-duplicate.
+
+    Candidates come from the full-text index, ranked by BM25, and are
+    compared by MinHash signature.
+    """
+    match = match_expression(" ".join([question, *options]), require_all=False)
+    if match is None:
+        return None
+    rows = db.execute(
+        text(
+            "SELECT q.id, q.topic_id, q.signature FROM quiz_questions_fts "
+            "JOIN quiz_questions q ON q.id = quiz_questions_fts.rowid "
+            "JOIN quiz_topics t ON t.id = q.topic_id "
+            "WHERE quiz_questions_fts MATCH :match AND q.signature IS NOT NULL "
+            f"AND {LISTED_TOPICS} "
+            "ORDER BY rank LIMIT :limit"
+        ),
+        {"match": match, "limit": DEDUP_CANDIDATES},
+    )
+    best = None
+    for question_id, topic_id, stored in rows:
+        score = similarity(signature, stored)
+        if score >= threshold and (best is None or score > best.similarity):
+            best = NearDuplicate(question_id, topic_id, score)
+    return best
+
+
+def search_questions(
+    db: Session,
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    category: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Full-text search over questions and their options.
+
+    Every word of ``query`` must match (with stemming); results are ranked
+    by BM25 with question matches weighted above option matches.
+
+    Returns:
+        list: Matching questions with their topic, best match first
+    """
+    match = match_expression(query)
+    if match is None:
+        return []
+    sql = (
+        "SELECT q.id, q.topic_id, t.topic, t.category, t.subcategory, q.question, "
+        "q.option_a, q.option_b, q.option_c, q.option_d, "
+        "bm25(quiz_questions_fts, 2.0, 1.0, 1.0, 1.0, 1.0) AS bm25_score "
+        "FROM quiz_questions_fts "
+        "JOIN quiz_questions q ON q.id = quiz_questions_fts.rowid "
+        "JOIN quiz_topics t ON t.id = q.topic_id "
+        f"WHERE quiz_questions_fts MATCH :match AND {LISTED_TOPICS}"
+    )
+    params: Dict[str, Any] = {"match": match, "limit": limit, "offset": offset}
+    if category is not None:
+        sql += " AND t.category = :category"
+        params["category"] = category
+    sql += " ORDER BY bm25_score LIMIT :limit OFFSET :offset"
+    return [
+        {
+            "question_id": row.id,
+            "topic_id": row.topic_id,
+            "topic": row.topic,
+            "category": row.category,
+            "subcategory": row.subcategory,
+            "question": row.question,
+            "options": [row.option_a, row.option_b, row.option_c, row.option_d],
+            # bm25() is lower for better matches
+            "score": round(-row.bm25_score, 4),
+        }
+        for row in db.execute(text(sql), params)
+    ]
+
+
+def backfill_signatures(connection: Connection, batch_size: int = 1000) -> None:
+    """
+    Migration step computing the signature of every stored question.
+
+    Part of migration 0004, which runs before 0006 moved the options out of
+    the JSON column, so it reads that column.
+    """
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            text(
+                "SELECT id, question, options, right_option FROM quiz_questions "
+                "WHERE id > :last_id AND signature IS NULL ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": batch_size},
+        ).all()
+        if not rows:
+            return
+        connection.execute(
+            text("UPDATE quiz_questions SET signature = :signature WHERE id = :id"),
+            [
+                {
+                    "id": row.id,
+                    "signature": question_signature(
+                        row.question, json.loads(row.options), row.right_option
+                    ),
+                }
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
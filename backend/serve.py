@@ -0,0 +1,39 @@
+"""
+Run the API with one or more uvicorn worker processes:
+
+    QUIZ_WEB_WORKERS=4 python -m backend.serve
+
+With several workers, leases, rate limits and in-flight generations are
+shared through the database (QUIZ_COORDINATION_BACKEND=sqlite, the default
+here), so each worker sees the others' state.
+"""
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+
+def main() -> None:
+    # QUIZ_WEB_WORKERS and the coordination backend may come from .env too
+    load_dotenv()
+    workers = int(os.getenv("QUIZ_WEB_WORKERS", "1"))
+    if workers > 1:
+        # Set before the workers start so they inherit it
+        os.environ.setdefault("QUIZ_COORDINATION_BACKEND", "sqlite")
+        if os.environ["QUIZ_COORDINATION_BACKEND"] == "local":
+            raise SystemExit(
+                "QUIZ_COORDINATION_BACKEND=local keeps state per process, "
+                "use sqlite with QUIZ_WEB_WORKERS > 1"
+            )
+
+    uvicorn.run(
+        "backend.api:app",
+        host=os.getenv("QUIZ_HOST", "0.0.0.0"),
+        port=int(os.getenv("QUIZ_PORT", "8000")),
+        workers=workers,
+        timeout_graceful_shutdown=int(os.getenv("QUIZ_GRACEFUL_SHUTDOWN_SECONDS", "30")),
+    )
+
+
+if __name__ == "__main__":
+    main()
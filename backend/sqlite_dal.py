@@ -1,9 +1,18 @@
-from sqlalchemy import JSON, Column, ForeignKey, Integer, String
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence
+
+from sqlalchemy import (JSON, Boolean, Column, DateTime, Float, ForeignKey,
+                        Index, Integer, LargeBinary, String, text)
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
 
 
+def utcnow() -> datetime:
+    """Naive UTC timestamp, which is what SQLite hands back for DateTime columns."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class QuizTopic(Base):
     __tablename__ = "quiz_topics"
 
@@ -11,7 +20,48 @@ class QuizTopic(Base):
     topic = Column(String, nullable=False)
     category = Column(String, nullable=False)
     subcategory = Column(String, nullable=False)
-    questions = relationship("QuizQuestion", back_populates="topic")
+    difficulty = Column(String)  # easy, medium or hard; unknown for older topics
+    # Content the quiz was generated from, shared by the difficulty variants of a source
+    source_id = Column(Integer, ForeignKey("quiz_sources.id"), index=True)
+    # Pre-generated by the warm pool (backend/warm_pool.py) and handed out once by
+    # /quiz/random, which sets served_at
+    pooled = Column(Boolean, nullable=False, default=False, server_default=text("0"))
+    served_at = Column(DateTime)
+    questions = relationship(
+        "QuizQuestion", back_populates="topic", order_by="QuizQuestion.id"
+    )
+    source = relationship("QuizSource", back_populates="topics")
+
+    __table_args__ = (
+        Index("ix_quiz_topics_category_subcategory", "category", "subcategory"),
+        # Only the unserved stock of the warm pool, so the index stays small
+        Index(
+            "ix_quiz_topics_pool_stock",
+            "category",
+            "subcategory",
+            "difficulty",
+            sqlite_where=text("pooled = 1 AND served_at IS NULL"),
+        ),
+    )
+
+
+class QuizSource(Base):
+    __tablename__ = "quiz_sources"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # "url" or "pdf"
+    location = Column(String, nullable=False)  # The URL or the uploaded file name
+    content_hash = Column(String, nullable=False)  # sha256 of the fetched text or PDF bytes
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    topics = relationship("QuizTopic", back_populates="source", order_by="QuizTopic.id")
+
+    __table_args__ = (
+        Index("ix_quiz_sources_content_hash_location", "content_hash", "location", unique=True),
+    )
+
+
+# One column per answer option, in the order of quiz_schema.OPTION_LETTERS
+OPTION_COLUMNS = ("option_a", "option_b", "option_c", "option_d")
 
 
 class QuizQuestion(Base):
@@ -19,8 +69,72 @@ class QuizQuestion(Base):
 
     id = Column(Integer, primary_key=True)
     question = Column(String, nullable=False)
-    options = Column(JSON, nullable=False)  # Store options as JSON
+    # Questions always have four options, stored in fixed columns rather than a
+    # JSON array so reads need no parsing; see the options property
+    option_a = Column(String, nullable=False)
+    option_b = Column(String, nullable=False)
+    option_c = Column(String, nullable=False)
+    option_d = Column(String, nullable=False)
     right_option = Column(String, nullable=False)
-    topic_id = Column(Integer, ForeignKey("quiz_topics.id"))
+    topic_id = Column(Integer, ForeignKey("quiz_topics.id"), index=True)
+    # MinHash of the question's shingles for near-duplicate checks (backend/search.py);
+    # the text is also indexed in the quiz_questions_fts FTS5 table, kept in sync by triggers
+    signature = Column(LargeBinary)
 
     topic = relationship("QuizTopic", back_populates="questions")
+
+    @property
+    def options(self) -> List[str]:
+        return [self.option_a, self.option_b, self.option_c, self.option_d]
+
+    @staticmethod
+    def option_values(options: Sequence[str]) -> Dict[str, str]:
+        """Column values for a list of four options, for inserts."""
+        if len(options) != len(OPTION_COLUMNS):
+            raise ValueError(f"expected {len(OPTION_COLUMNS)} options, got {len(options)}")
+        return dict(zip(OPTION_COLUMNS, options))
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex
+    kind = Column(String, nullable=False)  # "url" or "pdf"
+    status = Column(String, nullable=False, default="pending")  # pending, running, succeeded, failed
+    params = Column(JSON, nullable=False)  # Request parameters, for inspection
+    error = Column(String)
+    topic_id = Column(Integer, ForeignKey("quiz_topics.id"))
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+
+    key = Column(String, primary_key=True)  # sha256 of source content and prompt parameters
+    quiz = Column(JSON, nullable=False)
+    topic_id = Column(Integer, ForeignKey("quiz_topics.id"))
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    last_used_at = Column(DateTime, nullable=False, default=utcnow, index=True)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class CoordinationLease(Base):
+    """A named lease held by one API process (backend/coordination.py)."""
+
+    __tablename__ = "coordination_leases"
+
+    name = Column(String, primary_key=True)  # e.g. "generation:<cache key>", "job:<id>"
+    owner = Column(String, nullable=False)  # Worker id of the holding process
+    expires_at = Column(Float, nullable=False)  # Unix timestamp, renewed while held
+
+
+class RateLimitBucket(Base):
+    """Token bucket shared by the API processes (backend/coordination.py)."""
+
+    __tablename__ = "rate_limit_buckets"
+
+    name = Column(String, primary_key=True)
+    level = Column(Float, nullable=False)  # Capacity left as of updated_at
+    updated_at = Column(Float, nullable=False)  # Unix timestamp
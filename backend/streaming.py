@@ -0,0 +1,74 @@
+import asyncio
+from typing import TYPE_CHECKING, Any, AsyncIterator, List
+
+from backend.cache import CACHE_ENABLED, generation_cache
+from backend.db import run_write_async
+from backend.llm import get_llm_client
+from backend.parsing import QuizStreamParser
+from backend.persistence import store_generated_quiz
+from backend.pipelines import GENERATION_KWARGS, get_pipeline
+from backend.responses import dumps
+from backend.utils import GenerationResult, documents_cache_key
+
+if TYPE_CHECKING:
+    from haystack import Document
+
+
+def format_event(event: str, data: Any) -> bytes:
+    """Encode one Server-Sent Event with a JSON payload."""
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+async def stream_quiz_events(
+    documents: List["Document"], num_questions: int, difficulty: str
+) -> AsyncIterator[bytes]:
+    """
+    Generate a quiz from fetched documents as a stream of Server-Sent Events.
+
+    Events:
+        meta: The topic, category and subcategory, once the model wrote them
+        question: Each question, as soon as its JSON object is complete
+        done: The stored topic id and the complete validated quiz
+        error: A detail message; the stream ends after it
+    """
+    cache_key = documents_cache_key(documents, num_questions, difficulty, "single")
+    try:
+        # The cache and pipeline setup do blocking I/O, keep them off the event loop
+        entry = await asyncio.to_thread(generation_cache.get, cache_key) if CACHE_ENABLED else None
+        if entry is not None:
+            result = GenerationResult(
+                entry.quiz, cache_key, entry.topic_id, cached=True, difficulty=difficulty
+            )
+            header = {field: result.quiz[field] for field in QuizStreamParser.HEADER_FIELDS}
+            yield format_event("meta", header)
+            for index, question in enumerate(result.quiz["questions"]):
+                yield format_event("question", {"index": index, **question})
+        else:
+            # Same prompt and parser as the non-streaming pipeline
+            pipeline = await asyncio.to_thread(get_pipeline, "quiz_generation_pipeline")
+            prompt = pipeline.get_component("prompt_builder").run(
+                documents=documents, num_questions=num_questions, difficulty=difficulty
+            )["prompt"]
+            parser = QuizStreamParser()
+            sent = 0
+            async for delta in get_llm_client().stream_async(prompt, **GENERATION_KWARGS):
+                header_known = parser.header is not None
+                questions = parser.feed(delta)
+                if not header_known and parser.header is not None:
+                    yield format_event("meta", parser.header)
+                for question in questions:
+                    yield format_event("question", {"index": sent, **question})
+                    sent += 1
+
+            # The full reply is authoritative for what gets stored
+            quiz = pipeline.get_component("quiz_parser").run(replies=[parser.text])["quiz"]
+            if CACHE_ENABLED:
+                await asyncio.to_thread(generation_cache.set, cache_key, quiz)
+            result = GenerationResult(quiz, cache_key, difficulty=difficulty)
+
+        topic_id = await run_write_async(store_generated_quiz, result)
+        yield format_event(
+            "done", {"topic_id": topic_id, "cached": result.cached, "quiz": result.quiz}
+        )
+    except Exception as e:
+        yield format_event("error", {"detail": str(e) or e.__class__.__name__})
@@ -1,35 +1,35 @@
-import os
+"""
+Check that the configured database (QUIZ_DATABASE_PATH) can be opened,
+migrated and written to. The test topic is rolled back, so the database is
+left unchanged. Run from the repository root:
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlite_dal import Base, QuizTopic
+    python -m backend.test_db_connection
+"""
+from backend.db import SessionLocal, db_path
+from backend.sqlite_dal import QuizTopic
 
-# Get the absolute path to the database file
-db_path = os.path.abspath("../quiz_database.db")
-print(f"Database path: {db_path}")
 
-# Create SQLite engine with absolute path
-engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+def main() -> None:
+    print(f"Database path: {db_path}")
 
-# Create all tables
-Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        # Test writing to the database
+        test_topic = QuizTopic(
+            topic="Test Topic", category="Test Category", subcategory="Test Subcategory"
+        )
+        db.add(test_topic)
+        db.flush()
+        print(f"Successfully wrote to the database! (test topic id {test_topic.id})")
 
-# Create sessionmaker
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        topic_count = db.query(QuizTopic).count()
+        print(f"Topics in database: {topic_count}")
+    except Exception as e:
+        print(f"Error writing to database: {e}")
+    finally:
+        db.rollback()
+        db.close()
 
-# Test writing to the database
-db = SessionLocal()
-try:
-    # Create a test topic
-    test_topic = QuizTopic(topic="Test Topic")
-    db.add(test_topic)
-    db.commit()
-    print("Successfully wrote to the database!")
-    
-    # Verify it was written
-    topics = db.query(QuizTopic).all()
-    print(f"Topics in database: {[topic.topic for topic in topics]}")
-except Exception as e:
-    print(f"Error writing to database: {e}")
-finally:
-    db.close() 
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()
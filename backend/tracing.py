@@ -0,0 +1,60 @@
+import contextlib
+import contextvars
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from haystack import tracing
+from haystack.tracing.tracer import NullSpan, Span, Tracer
+
+from backend.metrics import PIPELINE_DURATION, record_stage
+
+_current_pipeline: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_pipeline", default="unknown"
+)
+
+
+class PipelineMetricsTracer(Tracer):
+    """
+    Haystack tracer that times pipeline and component runs.
+
+    Pipelines are labelled with the ``name`` in their metadata and components
+    with their name in the pipeline.
+    """
+
+    @contextlib.contextmanager
+    def trace(self, operation_name: str, tags: Optional[Dict[str, Any]] = None) -> Iterator[Span]:
+        tags = tags or {}
+        if operation_name == "haystack.pipeline.run":
+            metadata = tags.get("haystack.pipeline.metadata") or {}
+            token = _current_pipeline.set(metadata.get("name", "unknown"))
+            started = time.perf_counter()
+            status = "error"
+            try:
+                yield NullSpan()
+                status = "ok"
+            finally:
+                PIPELINE_DURATION.observe(
+                    time.perf_counter() - started,
+                    pipeline=_current_pipeline.get(),
+                    status=status,
+                )
+                _current_pipeline.reset(token)
+        elif operation_name == "haystack.component.run":
+            started = time.perf_counter()
+            try:
+                yield NullSpan()
+            finally:
+                record_stage(
+                    _current_pipeline.get(),
+                    tags.get("haystack.component.name", "unknown"),
+                    time.perf_counter() - started,
+                )
+        else:
+            yield NullSpan()
+
+    def current_span(self) -> Optional[Span]:
+        return None
+
+
+def enable_pipeline_metrics() -> None:
+    tracing.enable_tracing(PipelineMetricsTracer())
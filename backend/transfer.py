@@ -0,0 +1,350 @@
+"""
+Bulk export and import of stored quizzes between instances.
+
+Quizzes are streamed in batches in both directions, so memory use doesn't
+grow with the size of the database. Run from the repository root:
+
+    python -m backend.transfer export quizzes.ndjson
+    python -m backend.transfer export --format columnar --category History quizzes.qcol
+    python -m backend.transfer import quizzes.qcol
+
+A path of "-" writes to stdout or reads from stdin. Unclaimed warm pool
+quizzes are not exported, they would be listed like any other topic once
+imported. Two formats:
+
+ndjson
+    One quiz per line, shaped like the API's quizzes with the topic's
+    difficulty and source added. Quizzes saved from the API import as is.
+
+columnar
+    A flat table of questions with their topic's columns, stored column by
+    column in zlib-compressed row groups: the repeated topic, category and
+    option texts compress far better than row by row. Layout: the magic
+    bytes ``QUIZCOL1``, a length-prefixed JSON header listing the columns,
+    then row groups of a row count followed by one length-prefixed
+    compressed JSON array per column, ended by a row count of 0. Lengths
+    and counts are little-endian uint32.
+
+Imported quizzes are validated like generated ones and stored as new
+topics, without the near-duplicate check; batches committed before an
+invalid quiz stay imported. Running servers are not told about the import:
+their /categories cache picks the new topics up once it expires
+(QUIZ_CATEGORIES_CACHE_TTL_SECONDS).
+"""
+import argparse
+import io
+import json
+import struct
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import astuple
+from itertools import groupby
+from typing import (Any, BinaryIO, Dict, Iterable, Iterator, List, Optional,
+                    Sequence, Tuple)
+
+from dotenv import load_dotenv
+
+# Before backend.db, which reads the database settings on import
+load_dotenv()
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.db import SessionLocal
+from backend.persistence import resolve_source, save_quizzes
+from backend.queries import LISTED
+from backend.quiz_schema import QuizSchema
+from backend.responses import dumps
+from backend.sqlite_dal import QuizQuestion, QuizSource, QuizTopic
+from backend.utils import QuizSourceRef
+
+FORMATS = ("ndjson", "columnar")
+COLUMNAR_MAGIC = b"QUIZCOL1"
+# The columns of an exported question row, in export order
+ROW_COLUMNS = (
+    "topic_id",
+    "topic",
+    "category",
+    "subcategory",
+    "difficulty",
+    "source_kind",
+    "source_location",
+    "source_content_hash",
+    "question",
+    "option_a",
+    "option_b",
+    "option_c",
+    "option_d",
+    "right_option",
+)
+_LENGTH = struct.Struct("<I")
+
+Row = Tuple[Any, ...]
+
+
+def question_rows(
+    db: Session, category: Optional[str] = None, batch_size: int = 1000
+) -> Iterator[Row]:
+    """
+    Every listed question with its topic's columns, in ROW_COLUMNS order,
+    grouped by topic. Unclaimed warm pool quizzes are left out, like in the
+    API. Rows are fetched ``batch_size`` at a time.
+    """
+    query = (
+        select(
+            QuizTopic.id,
+            QuizTopic.topic,
+            QuizTopic.category,
+            QuizTopic.subcategory,
+            QuizTopic.difficulty,
+            QuizSource.kind,
+            QuizSource.location,
+            QuizSource.content_hash,
+            QuizQuestion.question,
+            QuizQuestion.option_a,
+            QuizQuestion.option_b,
+            QuizQuestion.option_c,
+            QuizQuestion.option_d,
+            QuizQuestion.right_option,
+        )
+        .join(QuizQuestion, QuizQuestion.topic_id == QuizTopic.id)
+        .outerjoin(QuizSource, QuizSource.id == QuizTopic.source_id)
+        .where(LISTED)
+        .order_by(QuizTopic.id, QuizQuestion.id)
+    )
+    if category is not None:
+        query = query.where(QuizTopic.category == category)
+    for row in db.execute(query.execution_options(yield_per=batch_size)):
+        yield tuple(row)
+
+
+def rows_to_quizzes(rows: Iterable[Row]) -> Iterator[Dict[str, Any]]:
+    """Group consecutive question rows of the same topic into quizzes."""
+    for _, topic_rows in groupby(rows, key=lambda row: row[0]):
+        topic_rows = list(topic_rows)
+        (topic_id, topic, category, subcategory, difficulty, kind, location, content_hash) = (
+            topic_rows[0][:8]
+        )
+        yield {
+            "id": topic_id,
+            "topic": topic,
+            "category": category,
+            "subcategory": subcategory,
+            "difficulty": difficulty,
+            "source": (
+                {"kind": kind, "location": location, "content_hash": content_hash}
+                if kind is not None
+                else None
+            ),
+            "questions": [
+                {"question": row[8], "options": list(row[9:13]), "right_option": row[13]}
+                for row in topic_rows
+            ],
+        }
+
+
+def write_ndjson(quizzes: Iterable[Dict[str, Any]], stream: BinaryIO) -> int:
+    count = 0
+    for quiz in quizzes:
+        stream.write(dumps(quiz) + b"\n")
+        count += 1
+    return count
+
+
+def read_ndjson(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}")
+
+
+def write_columnar(rows: Iterable[Row], stream: BinaryIO, row_group_size: int = 10000) -> int:
+    """
+    Write question rows (in ROW_COLUMNS order) in the columnar format.
+
+    Returns:
+        int: The number of rows written
+    """
+    header = dumps({"columns": list(ROW_COLUMNS)})
+    stream.write(COLUMNAR_MAGIC + _LENGTH.pack(len(header)) + header)
+    count = 0
+    group: List[Row] = []
+    for row in rows:
+        group.append(row)
+        if len(group) >= row_group_size:
+            _write_row_group(stream, group)
+            count += len(group)
+            group = []
+    if group:
+        _write_row_group(stream, group)
+        count += len(group)
+    stream.write(_LENGTH.pack(0))
+    return count
+
+
+def _write_row_group(stream: BinaryIO, rows: List[Row]) -> None:
+    stream.write(_LENGTH.pack(len(rows)))
+    for column in zip(*rows):
+        data = zlib.compress(dumps(list(column)))
+        stream.write(_LENGTH.pack(len(data)) + data)
+
+
+def read_columnar(stream: BinaryIO) -> Iterator[Row]:
+    """Question rows of a columnar file, in ROW_COLUMNS order, one row group at a time."""
+    if _read_exactly(stream, len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("not a columnar quiz export")
+    columns = json.loads(_read_block(stream))["columns"]
+    missing = set(ROW_COLUMNS) - set(columns)
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(sorted(missing))}")
+    # Files may carry columns this version doesn't know, or order them differently
+    positions = [columns.index(name) for name in ROW_COLUMNS]
+
+    while True:
+        (count,) = _LENGTH.unpack(_read_exactly(stream, _LENGTH.size))
+        if count == 0:
+            return
+        try:
+            values = [json.loads(zlib.decompress(_read_block(stream))) for _ in columns]
+        except zlib.error as e:
+            raise ValueError(f"corrupt row group: {e}")
+        if any(len(column) != count for column in values):
+            raise ValueError("row group columns differ in length")
+        yield from zip(*(values[position] for position in positions))
+
+
+def _read_block(stream: BinaryIO) -> bytes:
+    (length,) = _LENGTH.unpack(_read_exactly(stream, _LENGTH.size))
+    return _read_exactly(stream, length)
+
+
+def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError("unexpected end of file, the export is truncated")
+    return data
+
+
+def detect_format(stream: io.BufferedReader) -> str:
+    return "columnar" if stream.peek(len(COLUMNAR_MAGIC)).startswith(COLUMNAR_MAGIC) else "ndjson"
+
+
+def export_quizzes(
+    db: Session, stream: BinaryIO, fmt: str = "ndjson", category: Optional[str] = None
+) -> int:
+    """
+    Write stored quizzes to ``stream``.
+
+    Returns:
+        int: The number of quizzes (ndjson) or questions (columnar) written
+    """
+    rows = question_rows(db, category)
+    if fmt == "columnar":
+        return write_columnar(rows, stream)
+    return write_ndjson(rows_to_quizzes(rows), stream)
+
+
+def import_quizzes(db: Session, quizzes: Iterable[Dict[str, Any]], batch_size: int = 500) -> int:
+    """
+    Validate and store quizzes as new topics, committing every ``batch_size``.
+
+    Returns:
+        int: The number of quizzes imported
+    """
+    imported = 0
+    batch: List[Dict[str, Any]] = []
+    for number, quiz in enumerate(quizzes, start=1):
+        batch.append(_validated(quiz, number))
+        if len(batch) >= batch_size:
+            imported += _store_batch(db, batch)
+            batch = []
+    if batch:
+        imported += _store_batch(db, batch)
+    return imported
+
+
+def _validated(quiz: Dict[str, Any], number: int) -> Dict[str, Any]:
+    try:
+        validated = QuizSchema.model_validate(quiz).model_dump()
+        source = quiz.get("source")
+        validated["source"] = QuizSourceRef(**source) if source else None
+    except (ValidationError, TypeError, AttributeError) as e:
+        raise ValueError(f"quiz {number}: {e}")
+    validated["difficulty"] = quiz.get("difficulty")
+    return validated
+
+
+def _store_batch(db: Session, quizzes: Sequence[Dict[str, Any]]) -> int:
+    # No categories_cache.invalidate(): that would only reach this process
+    # Variants of a source are exported next to each other, look it up once
+    source_ids: Dict[Optional[Tuple[str, str, str]], Optional[int]] = {}
+    fields = []
+    for quiz in quizzes:
+        source = quiz["source"]
+        key = astuple(source) if source is not None else None
+        if key not in source_ids:
+            source_ids[key] = resolve_source(db, source)
+        fields.append({"difficulty": quiz["difficulty"], "source_id": source_ids[key]})
+    save_quizzes(db, list(quizzes), fields)
+    db.commit()
+    return len(quizzes)
+
+
+@contextmanager
+def _open(path: str, mode: str):
+    if path == "-":
+        yield sys.stdin.buffer if mode == "rb" else sys.stdout.buffer
+        return
+    with open(path, mode) as f:
+        yield f
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Write stored quizzes to a file")
+    export.add_argument("path")
+    export.add_argument("--format", choices=FORMATS, default="ndjson")
+    export.add_argument("--category", help="Only quizzes of this category")
+    import_ = commands.add_parser("import", help="Store the quizzes of an export")
+    import_.add_argument("path")
+    import_.add_argument(
+        "--format", choices=FORMATS, help="Format of the file (default: detected)"
+    )
+    import_.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        if args.command == "export":
+            with _open(args.path, "wb") as stream:
+                count = export_quizzes(db, stream, args.format, args.category)
+            unit = "questions" if args.format == "columnar" else "quizzes"
+            message = f"Exported {count} {unit}"
+        else:
+            with _open(args.path, "rb") as stream:
+                fmt = args.format or detect_format(stream)
+                if fmt == "columnar":
+                    quizzes = rows_to_quizzes(read_columnar(stream))
+                else:
+                    quizzes = read_ndjson(stream)
+                try:
+                    count = import_quizzes(db, quizzes, args.batch_size)
+                except ValueError as e:
+                    raise SystemExit(f"{args.path}: {e}")
+            message = f"Imported {count} quizzes"
+    finally:
+        db.close()
+    # stderr, so a summary never ends up in an export written to stdout
+    print(f"{message} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,119 @@
-from typing import Any, Dict
+import contextvars
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
 
-from backend.pipelines import (pdf_quiz_generation_pipeline,
-                               quiz_generation_pipeline)
+from backend import pipelines
+from backend.cache import CACHE_ENABLED, generation_cache, make_cache_key
+from backend.coordination import single_flight
+from backend.parsing import QuizParseError
+from backend.quiz_generation_prompt import (PDF_QUIZ_GENERATION_PROMPT,
+                                            QUIZ_GENERATION_PROMPT)
 
+if TYPE_CHECKING:
+    from haystack import Document
 
-def generate_quiz(
-    url: str, num_questions: int = 5, difficulty: str = "medium"
+logger = logging.getLogger(__name__)
+
+# "single" sends the beginning of the document in one prompt, "chunked" fans
+# out over chunks of the whole document and merges the questions
+GENERATION_MODES = ("single", "chunked")
+DEFAULT_GENERATION_MODE = os.getenv("QUIZ_GENERATION_MODE", "single")
+
+
+@dataclass
+class QuizSourceRef:
+    """The content a quiz was generated from, stored as a QuizSource."""
+
+    kind: str  # "url" or "pdf"
+    location: str  # The URL or the uploaded file name
+    content_hash: str  # sha256 of the fetched text or the PDF bytes
+
+
+def url_source(url: str, documents: List["Document"]) -> QuizSourceRef:
+    content = "\n".join(doc.content or "" for doc in documents)
+    return QuizSourceRef("url", url, hashlib.sha256(content.encode("utf-8")).hexdigest())
+
+
+def pdf_source(filename: str, pdf_data: bytes) -> QuizSourceRef:
+    return QuizSourceRef("pdf", filename, hashlib.sha256(pdf_data).hexdigest())
+
+
+@dataclass
+class GenerationResult:
+    quiz: Dict[str, Any]
+    cache_key: str
+    topic_id: Optional[int] = None  # Stored topic for this quiz, on a cache hit
+    cached: bool = False
+    difficulty: Optional[str] = None
+    source: Optional[QuizSourceRef] = None
+
+
+def fetch_documents(url: str) -> List["Document"]:
+    return pipelines.url_content_pipeline.run({"content_fetcher": {"urls": [url]}})[
+        "content_fetcher"
+    ]["documents"]
+
+
+def documents_cache_key(
+    documents: List["Document"], num_questions: int, difficulty: str, mode: str
+) -> str:
+    content = "\n".join(doc.content or "" for doc in documents)
+    return make_cache_key(
+        content.encode("utf-8"),
+        QUIZ_GENERATION_PROMPT,
+        num_questions=num_questions,
+        difficulty=difficulty,
+        mode=mode,
+    )
+
+
+def _cached_generation(
+    cache_key: str,
+    generate: Callable[[], Dict[str, Any]],
+    difficulty: Optional[str] = None,
+    source: Optional[QuizSourceRef] = None,
+) -> GenerationResult:
+    def cached() -> Optional[GenerationResult]:
+        entry = generation_cache.get(cache_key)
+        if entry is None:
+            return None
+        return GenerationResult(entry.quiz, cache_key, entry.topic_id, True, difficulty, source)
+
+    def produce() -> GenerationResult:
+        quiz = generate()
+        if CACHE_ENABLED:
+            generation_cache.set(cache_key, quiz)
+        return GenerationResult(quiz, cache_key, difficulty=difficulty, source=source)
+
+    if not CACHE_ENABLED:
+        return produce()
+    # An identical generation already running in any worker is awaited, then read from the cache
+    return cached() or single_flight(cache_key, produce, cached)
+
+
+def _generate_from_documents(
+    documents: List["Document"], num_questions: int, difficulty: str, mode: str
 ) -> Dict[str, Any]:
-    return quiz_generation_pipeline.run(
+    if mode == "chunked":
+        return pipelines.chunked_quiz_generation_pipeline.run(
+            {
+                "chunked_generator": {
+                    "text": "\n\n".join(doc.content or "" for doc in documents),
+                    "num_questions": num_questions,
+                    "difficulty": difficulty,
+                },
+            }
+        )["chunked_generator"]["quiz"]
+
+    return pipelines.quiz_generation_pipeline.run(
         {
-            "link_content_fetcher": {"urls": [url]},
             "prompt_builder": {
+                "documents": documents,
                 "num_questions": num_questions,
                 "difficulty": difficulty,
             },
@@ -18,26 +121,363 @@ def generate_quiz(
     )["quiz_parser"]["quiz"]
 
 
+def generate_quiz_from_documents_result(
+    documents: List["Document"],
+    num_questions: int = 5,
+    difficulty: str = "medium",
+    mode: str = DEFAULT_GENERATION_MODE,
+    source: Optional[QuizSourceRef] = None,
+) -> GenerationResult:
+    """
+    Generate a quiz from fetched documents, serving it from the generation
+    cache when the same content and parameters were seen before.
+    """
+    cache_key = documents_cache_key(documents, num_questions, difficulty, mode)
+    return _cached_generation(
+        cache_key,
+        lambda: _generate_from_documents(documents, num_questions, difficulty, mode),
+        difficulty,
+        source,
+    )
+
+
+def generate_quiz_result(
+    url: str,
+    num_questions: int = 5,
+    difficulty: str = "medium",
+    mode: str = DEFAULT_GENERATION_MODE,
+) -> GenerationResult:
+    """Generate a quiz from a URL, see generate_quiz_from_documents_result."""
+    documents = fetch_documents(url)
+    return generate_quiz_from_documents_result(
+        documents, num_questions, difficulty, mode, url_source(url, documents)
+    )
+
+
+def _generate_variants(
+    variants: List[Dict[str, Any]],
+    cache_keys: List[str],
+    source: Optional[QuizSourceRef],
+    generate_together: Optional[Callable[[List[Dict[str, Any]]], Dict[str, Dict[str, Any]]]],
+    generate_one: Callable[[Dict[str, Any]], Dict[str, Any]],
+    use_cache: bool = True,
+) -> List[GenerationResult]:
+    results: Dict[int, GenerationResult] = {}
+    use_cache = use_cache and CACHE_ENABLED
+
+    def add(index: int, quiz: Dict[str, Any]) -> None:
+        if use_cache:
+            generation_cache.set(cache_keys[index], quiz)
+        results[index] = GenerationResult(
+            quiz, cache_keys[index], difficulty=variants[index]["difficulty"], source=source
+        )
+
+    def cached(indices: List[int]) -> Optional[bool]:
+        # True once every variant in ``indices`` was found in the cache
+        for index in indices:
+            entry = generation_cache.get(cache_keys[index])
+            if entry is not None:
+                results[index] = GenerationResult(
+                    entry.quiz,
+                    cache_keys[index],
+                    entry.topic_id,
+                    True,
+                    variants[index]["difficulty"],
+                    source,
+                )
+        return all(index in results for index in indices) or None
+
+    def generate_pending() -> bool:
+        pending = [index for index in range(len(variants)) if index not in results]
+        if generate_together is not None and len(pending) > 1:
+            try:
+                quizzes = generate_together([variants[index] for index in pending])
+            except QuizParseError as e:
+                logger.warning("Could not parse the combined variants reply, generating them one by one: %s", e)
+                quizzes = {}
+            for index in pending:
+                quiz = quizzes.get(variants[index]["difficulty"])
+                if quiz is not None:
+                    add(index, quiz)
+
+        # Variants the combined reply lacked, or every variant in chunked mode
+        pending = [index for index in range(len(variants)) if index not in results]
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="quiz-variant") as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, generate_one, variants[index])
+                    for index in pending
+                ]
+                for index, future in zip(pending, futures):
+                    add(index, future.result())
+        return True
+
+    if use_cache:
+        cached(list(range(len(variants))))
+    pending = [index for index in range(len(variants)) if index not in results]
+    if pending and use_cache:
+        # One flight per set of missing variants; a concurrent request for the
+        # same set waits for it and reads the variants from the cache
+        flight_key = hashlib.sha256(
+            "\n".join(cache_keys[index] for index in pending).encode("utf-8")
+        ).hexdigest()
+        single_flight(flight_key, generate_pending, lambda: cached(pending))
+    elif pending:
+        generate_pending()
+
+    return [results[index] for index in range(len(variants))]
+
+
+def _first_variant(quizzes: Dict[str, Dict[str, Any]], difficulty: str) -> Dict[str, Any]:
+    # A one-variant reply may label the difficulty differently
+    return quizzes.get(difficulty) or next(iter(quizzes.values()))
+
+
+def generate_quiz_variants_from_documents(
+    documents: List["Document"],
+    variants: List[Dict[str, Any]],
+    mode: str = DEFAULT_GENERATION_MODE,
+    source: Optional[QuizSourceRef] = None,
+    use_cache: bool = True,
+) -> List[GenerationResult]:
+    """
+    Generate quizzes of several difficulties from the same fetched documents.
+
+    Variants in the generation cache are reused. In single mode the others
+    are generated with one LLM call; any the reply lacks, and every variant in
+    chunked mode, get one concurrent call each. Each variant is cached under
+    the same key as a single quiz with its parameters.
+
+    Args:
+        documents: The fetched documents
+        variants: Dicts with difficulty and num_questions keys, one per difficulty
+        mode: "single" or "chunked"
+        source: The source the quizzes are linked to when stored
+        use_cache: False always generates new quizzes and leaves the cache untouched
+
+    Returns:
+        list: A GenerationResult per variant, in the order of ``variants``
+    """
+    cache_keys = [
+        documents_cache_key(documents, variant["num_questions"], variant["difficulty"], mode)
+        for variant in variants
+    ]
+
+    def generate_together(pending: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        return pipelines.quiz_variants_generation_pipeline.run(
+            {
+                "prompt_builder": {"documents": documents, "variants": pending},
+                "generator": {
+                    "generation_kwargs": pipelines.variants_generation_kwargs(len(pending))
+                },
+            }
+        )["quiz_parser"]["quizzes"]
+
+    def generate_one(variant: Dict[str, Any]) -> Dict[str, Any]:
+        if mode == "chunked":
+            return _generate_from_documents(
+                documents, variant["num_questions"], variant["difficulty"], mode
+            )
+        return _first_variant(generate_together([variant]), variant["difficulty"])
+
+    return _generate_variants(
+        variants,
+        cache_keys,
+        source,
+        generate_together if mode == "single" else None,
+        generate_one,
+        use_cache,
+    )
+
+
+def generate_quiz_variants(
+    url: str,
+    variants: List[Dict[str, Any]],
+    mode: str = DEFAULT_GENERATION_MODE,
+    use_cache: bool = True,
+) -> List[GenerationResult]:
+    """Generate quizzes of several difficulties from one fetch of a URL."""
+    documents = fetch_documents(url)
+    return generate_quiz_variants_from_documents(
+        documents, variants, mode, url_source(url, documents), use_cache
+    )
+
+
+def generate_quiz_batch(
+    items: List[Dict[str, Any]], max_concurrency: int = 4
+) -> List[Union[GenerationResult, Exception]]:
+    """
+    Generate quizzes for many URLs with bounded parallelism.
+
+    Every distinct URL is fetched once, concurrently, then the quizzes are
+    generated concurrently from the fetched documents.
+
+    Args:
+        items: Dicts with url, num_questions, difficulty and mode keys
+        max_concurrency: Maximum number of fetches or generations in flight
+
+    Returns:
+        list: A GenerationResult, or the exception that stopped it, per item
+    """
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="quiz-batch") as executor:
+        urls = list(dict.fromkeys(item["url"] for item in items))
+        # Each task runs in a copy of the caller's context (e.g. request metrics)
+        def submit(fn: Callable, *args: Any):
+            return executor.submit(contextvars.copy_context().run, fn, *args)
+
+        fetches = dict(zip(urls, [submit(fetch_documents, url) for url in urls]))
+
+        def generate(item: Dict[str, Any]) -> GenerationResult:
+            documents = fetches[item["url"]].result()
+            return generate_quiz_from_documents_result(
+                documents,
+                item["num_questions"],
+                item["difficulty"],
+                item["mode"],
+                url_source(item["url"], documents),
+            )
+
+        results: List[Union[GenerationResult, Exception]] = []
+        for future in [submit(generate, item) for item in items]:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def generate_quiz(
+    url: str, num_questions: int = 5, difficulty: str = "medium"
+) -> Dict[str, Any]:
+    return generate_quiz_result(url, num_questions, difficulty).quiz
+
+
+def generate_quiz_from_pdf_result(
+    pdf_data: bytes,
+    filename: str,
+    num_questions: int = 5,
+    difficulty: str = "medium",
+    mode: str = DEFAULT_GENERATION_MODE,
+) -> GenerationResult:
+    """
+    Generate a quiz from in-memory PDF bytes, serving it from the generation
+    cache when the same PDF and parameters were seen before.
+    """
+    cache_key = pdf_cache_key(pdf_data, num_questions, difficulty, mode)
+
+    def generate() -> Dict[str, Any]:
+        if mode == "chunked":
+            return pipelines.chunked_pdf_quiz_generation_pipeline.run(
+                {
+                    "pdf_extractor": {"data": pdf_data, "filename": filename},
+                    "chunked_generator": {
+                        "num_questions": num_questions,
+                        "difficulty": difficulty,
+                    },
+                }
+            )["chunked_generator"]["quiz"]
+
+        return pipelines.pdf_quiz_generation_pipeline.run(
+            {
+                "pdf_extractor": {"data": pdf_data, "filename": filename},
+                "prompt_builder": {
+                    "num_questions": num_questions,
+                    "difficulty": difficulty,
+                },
+            }
+        )["quiz_parser"]["quiz"]
+
+    return _cached_generation(cache_key, generate, difficulty, pdf_source(filename, pdf_data))
+
+
+def pdf_cache_key(pdf_data: bytes, num_questions: int, difficulty: str, mode: str) -> str:
+    return make_cache_key(
+        pdf_data,
+        PDF_QUIZ_GENERATION_PROMPT,
+        num_questions=num_questions,
+        difficulty=difficulty,
+        mode=mode,
+    )
+
+
+def generate_quiz_variants_from_pdf(
+    pdf_data: bytes,
+    filename: str,
+    variants: List[Dict[str, Any]],
+    mode: str = DEFAULT_GENERATION_MODE,
+) -> List[GenerationResult]:
+    """
+    Generate quizzes of several difficulties from one PDF, extracting its
+    text once. See generate_quiz_variants_from_documents.
+    """
+    cache_keys = [
+        pdf_cache_key(pdf_data, variant["num_questions"], variant["difficulty"], mode)
+        for variant in variants
+    ]
+    extracted: Dict[str, str] = {}
+    extract_lock = threading.Lock()
+
+    def pdf_text() -> str:
+        # Only extracted if some variant is not cached
+        with extract_lock:
+            if "text" not in extracted:
+                pipeline_name = (
+                    "chunked_pdf_quiz_generation_pipeline"
+                    if mode == "chunked"
+                    else "pdf_quiz_generation_pipeline"
+                )
+                extractor = pipelines.get_pipeline(pipeline_name).get_component("pdf_extractor")
+                extracted["text"] = extractor.run(data=pdf_data, filename=filename)["text"]
+            return extracted["text"]
+
+    def generate_together(pending: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        return pipelines.pdf_quiz_variants_generation_pipeline.run(
+            {
+                "prompt_builder": {"text": pdf_text(), "filename": filename, "variants": pending},
+                "generator": {
+                    "generation_kwargs": pipelines.variants_generation_kwargs(len(pending))
+                },
+            }
+        )["quiz_parser"]["quizzes"]
+
+    def generate_one(variant: Dict[str, Any]) -> Dict[str, Any]:
+        if mode == "chunked":
+            generator = pipelines.get_pipeline(
+                "chunked_pdf_quiz_generation_pipeline"
+            ).get_component("chunked_generator")
+            return generator.run(
+                text=pdf_text(),
+                num_questions=variant["num_questions"],
+                difficulty=variant["difficulty"],
+                filename=filename,
+            )["quiz"]
+        return _first_variant(generate_together([variant]), variant["difficulty"])
+
+    return _generate_variants(
+        variants,
+        cache_keys,
+        pdf_source(filename, pdf_data),
+        generate_together if mode == "single" else None,
+        generate_one,
+    )
+
+
 def generate_quiz_from_pdf(
     pdf_path: str, num_questions: int = 5, difficulty: str = "medium"
 ) -> Dict[str, Any]:
     """
     Generate a quiz from a PDF file.
-    
+
     Args:
         pdf_path: Path to the PDF file
         num_questions: Number of questions to generate
         difficulty: Difficulty level of the questions (easy, medium, hard)
-        
+
     Returns:
         dict: A dictionary containing the quiz data
     """
-    return pdf_quiz_generation_pipeline.run(
-        {
-            "pdf_extractor": {"file_path": pdf_path},
-            "prompt_builder": {
-                "num_questions": num_questions,
-                "difficulty": difficulty,
-            },
-        }
-    )["quiz_parser"]["quiz"]
+    with open(pdf_path, "rb") as f:
+        pdf_data = f.read()
+    return generate_quiz_from_pdf_result(
+        pdf_data, os.path.basename(pdf_path), num_questions, difficulty
+    ).quiz
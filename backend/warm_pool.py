@@ -0,0 +1,315 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from backend import metrics
+from backend.coordination import leases
+from backend.db import SessionLocal, run_write
+from backend.persistence import store_pool_quizzes
+from backend.queries import categories_cache
+from backend.sqlite_dal import QuizTopic, utcnow
+from backend.utils import DEFAULT_GENERATION_MODE, generate_quiz_variants
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ("easy", "medium", "hard")
+# Held by the one process that refills the pool when several workers run
+LEADER_LEASE = "warm-pool"
+
+WARM_POOL_REQUESTS = metrics.Counter(
+    "quiz_warm_pool_requests_total",
+    "/quiz/random requests by whether a pre-generated quiz was available",
+    ("result",),
+)
+WARM_POOL_GENERATED = metrics.Counter(
+    "quiz_warm_pool_generated_total",
+    "Quizzes generated to refill the warm pool",
+)
+
+
+@dataclass
+class PoolSource:
+    """A pool slot group: the URLs to generate quizzes of a category from."""
+
+    category: str
+    subcategory: str
+    urls: List[str]
+    difficulties: List[str] = field(default_factory=lambda: list(DIFFICULTIES))
+    num_questions: int = 5
+
+
+def load_sources(path: str) -> List[PoolSource]:
+    """
+    Read the warm pool source list, a JSON array of objects such as
+    ``{"category": "Science & Nature", "subcategory": "Astronomy & Space",
+    "urls": ["https://..."], "difficulties": ["easy", "hard"], "num_questions": 5}``.
+
+    ``difficulties`` defaults to all three and ``num_questions`` to 5.
+    """
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{path}: expected a JSON array of sources")
+
+    sources = []
+    for number, entry in enumerate(entries, start=1):
+        try:
+            source = PoolSource(**entry)
+        except TypeError as e:
+            raise ValueError(f"{path}: source {number}: {e}")
+        if not source.urls:
+            raise ValueError(f"{path}: source {number} has no urls")
+        unknown = set(source.difficulties) - set(DIFFICULTIES)
+        if unknown or not source.difficulties:
+            raise ValueError(
+                f"{path}: source {number}: difficulties must be among {', '.join(DIFFICULTIES)}"
+            )
+        if source.num_questions < 1:
+            raise ValueError(f"{path}: source {number}: num_questions must be at least 1")
+        sources.append(source)
+    return sources
+
+
+def _unserved(query, category=None, subcategory=None, difficulty=None):
+    # Spelled like the partial index's WHERE clause so SQLite can use it
+    query = query.where(QuizTopic.pooled == 1, QuizTopic.served_at.is_(None))
+    if category is not None:
+        query = query.where(QuizTopic.category == category)
+    if subcategory is not None:
+        query = query.where(QuizTopic.subcategory == subcategory)
+    if difficulty is not None:
+        query = query.where(QuizTopic.difficulty == difficulty)
+    return query
+
+
+def pool_stock(
+    db: Session, category: Optional[str] = None, subcategory: Optional[str] = None
+) -> Dict[Tuple[str, str, str], int]:
+    """Unserved pooled topics per (category, subcategory, difficulty)."""
+    columns = (QuizTopic.category, QuizTopic.subcategory, QuizTopic.difficulty)
+    query = _unserved(select(*columns, func.count()), category, subcategory).group_by(*columns)
+    return {(c, s, d): count for c, s, d, count in db.execute(query)}
+
+
+def claim_quiz(
+    db: Session,
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    difficulty: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Mark a random unserved pooled topic as served and commit.
+
+    Picking and flagging the topic is a single UPDATE, so concurrent callers
+    never get the same one. Claimed topics are listed like any other.
+
+    Returns:
+        int: The id of the claimed topic, or None when the pool has none left
+    """
+    candidate = (
+        _unserved(select(QuizTopic.id), category, subcategory, difficulty)
+        .order_by(func.random())
+        .limit(1)
+        .scalar_subquery()
+    )
+    topic_id = db.scalar(
+        update(QuizTopic)
+        .where(QuizTopic.id == candidate)
+        .values(served_at=utcnow())
+        .returning(QuizTopic.id)
+    )
+    db.commit()
+    if topic_id is not None:
+        # Its category is listed from now on
+        categories_cache.invalidate()
+    return topic_id
+
+
+class WarmPool:
+    """
+    Keeps ``target`` unserved quizzes ready per category, subcategory and
+    difficulty of the registered sources.
+
+    A background thread tops the stock up every ``interval_seconds``, and
+    right away when woken after a quiz was served. Each round generates the
+    missing difficulties of a slot together from the source's next URL,
+    bypassing the generation cache so every pooled quiz is new. Generations
+    run one at a time on that thread, leaving the generation pool to
+    interactive requests.
+
+    With several worker processes only the holder of the warm-pool lease
+    refills; the others take over if it dies. Quizzes served by another
+    worker are noticed at the leader's next interval.
+    """
+
+    def __init__(
+        self,
+        sources: List[PoolSource],
+        target: int = 3,
+        interval_seconds: float = 60.0,
+        mode: str = DEFAULT_GENERATION_MODE,
+    ):
+        self.sources = sources
+        self.target = target
+        self.interval_seconds = interval_seconds
+        self.mode = mode
+        self._next_url = [0 for _ in sources]
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._counters = {"generated": 0, "failures": 0, "refills": 0}
+        self._stock: Dict[Tuple[str, str, str], int] = {}
+        self._last_refill_at: Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> "WarmPool":
+        path = os.getenv("QUIZ_WARM_POOL_SOURCES")
+        return cls(
+            sources=load_sources(path) if path else [],
+            target=int(os.getenv("QUIZ_WARM_POOL_TARGET", "3")),
+            interval_seconds=float(os.getenv("QUIZ_WARM_POOL_INTERVAL_SECONDS", "60")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sources) and self.target > 0
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="warm-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        # A generation in progress finishes on the daemon thread, its result is still stored
+        self._stopped.set()
+        self._wake.set()
+        self._thread = None
+        leases.release(LEADER_LEASE)
+
+    def wake(self) -> None:
+        """Refill now instead of at the next interval, e.g. after serving a quiz."""
+        self._wake.set()
+
+    def covers(
+        self,
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None,
+        difficulty: Optional[str] = None,
+    ) -> bool:
+        """Whether some registered source stocks quizzes matching these filters."""
+        return any(
+            category in (None, source.category)
+            and subcategory in (None, source.subcategory)
+            and difficulty in (None, *source.difficulties)
+            for source in self.sources
+        )
+
+    def refill(self) -> int:
+        """
+        Generate quizzes until every slot holds ``target`` of them.
+
+        A source whose generation fails is retried at the next refill.
+
+        Returns:
+            int: The number of quizzes added to the pool
+        """
+        created = 0
+        for index, source in enumerate(self.sources):
+            # Bounded in case the model keeps leaving a difficulty out of its reply
+            for _ in range(self.target * len(source.difficulties)):
+                if self._stopped.is_set():
+                    return created
+                missing = self._missing(source)
+                if not missing:
+                    break
+                url = source.urls[self._next_url[index] % len(source.urls)]
+                self._next_url[index] += 1
+                try:
+                    results = generate_quiz_variants(
+                        url,
+                        [
+                            {"difficulty": difficulty, "num_questions": source.num_questions}
+                            for difficulty in missing
+                        ],
+                        self.mode,
+                        use_cache=False,
+                    )
+                    topic_ids = run_write(
+                        store_pool_quizzes, results, source.category, source.subcategory
+                    )
+                except Exception as e:
+                    logger.warning("Could not refill the warm pool from %s: %s", url, e)
+                    with self._lock:
+                        self._counters["failures"] += 1
+                    break
+                created += len(topic_ids)
+                WARM_POOL_GENERATED.inc(len(topic_ids))
+                with self._lock:
+                    self._counters["generated"] += len(topic_ids)
+
+        db = SessionLocal()
+        try:
+            stock = pool_stock(db)
+        finally:
+            db.close()
+        with self._lock:
+            self._counters["refills"] += 1
+            self._stock = stock
+            self._last_refill_at = time.time()
+        return created
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stock = dict(self._stock)
+            last_refill_at = self._last_refill_at
+        stats.update(
+            enabled=self.enabled,
+            leader=leases.owns(LEADER_LEASE),
+            target=self.target,
+            sources=len(self.sources),
+            last_refill_at=last_refill_at,
+            # As of the last refill
+            stock={" / ".join(slot): count for slot, count in sorted(stock.items())},
+        )
+        return stats
+
+    def stock_snapshot(self) -> Dict[Tuple[str, str, str], int]:
+        with self._lock:
+            return dict(self._stock)
+
+    def _missing(self, source: PoolSource) -> List[str]:
+        db = SessionLocal()
+        try:
+            stock = pool_stock(db, source.category, source.subcategory)
+        finally:
+            db.close()
+        return [
+            difficulty
+            for difficulty in source.difficulties
+            if stock.get((source.category, source.subcategory, difficulty), 0) < self.target
+        ]
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                if leases.owns(LEADER_LEASE) or leases.acquire(LEADER_LEASE):
+                    self.refill()
+            except Exception:
+                logger.exception("Warm pool refill failed")
+            self._wake.wait(self.interval_seconds)
+
+
+# Disabled unless QUIZ_WARM_POOL_SOURCES names a source list
+warm_pool = WarmPool.from_env()
@@ -0,0 +1,133 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+from concurrent.futures import (Executor, Future, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from typing import Any, Callable, Dict, Optional
+
+
+class PoolSaturatedError(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class GenerationPool:
+    """
+    Bounded worker pool for the blocking quiz generation pipelines.
+
+    At most ``max_workers`` generations run at once and at most ``max_queue``
+    more may wait for a worker. Submissions beyond that are rejected with
+    ``PoolSaturatedError`` instead of piling up behind the event loop.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16, mode: str = "thread"):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown worker mode: {mode!r} (use 'thread' or 'process')")
+        if max_workers < 1 or max_queue < 0:
+            raise ValueError("max_workers must be >= 1 and max_queue must be >= 0")
+
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.mode = mode
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    # Not forked: a child of this multi-threaded process could inherit
+                    # a lock held by another thread (e.g. the pipeline warm-up) and hang
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="quiz-gen"
+                    )
+            return self._executor
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Schedule ``fn`` on the pool or raise ``PoolSaturatedError`` if it is full."""
+        executor = self.executor
+        self._acquire()
+
+        if self.mode == "thread":
+            # Carry the caller's context (e.g. request metrics) into the worker
+            fn, args = contextvars.copy_context().run, (fn, *args)
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def reserve(self) -> Callable[[], None]:
+        """
+        Take a place in the pool's capacity without a worker thread, for a
+        generation that runs on the event loop (a streamed completion).
+
+        Raises:
+            PoolSaturatedError: The pool is full
+
+        Returns:
+            callable: Gives the place back; calling it again does nothing
+        """
+        self._acquire()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            with self._lock:
+                if not released:
+                    released = True
+                    self._in_flight -= 1
+
+        return release
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run ``fn`` on the pool and await its result without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = self._in_flight
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": min(in_flight, self.max_workers),
+            "queued": max(in_flight - self.max_workers, 0),
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                raise PoolSaturatedError(
+                    f"Generation pool is saturated ({self._in_flight} requests in flight)"
+                )
+            self._in_flight += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+
+# Shared pool used by the API; sized through the environment so each deployment
+# can match it to its LLM rate limits and CPU count.
+generation_pool = GenerationPool(
+    max_workers=int(os.getenv("QUIZ_MAX_WORKERS", "4")),
+    max_queue=int(os.getenv("QUIZ_MAX_QUEUE", "16")),
+    mode=os.getenv("QUIZ_WORKER_MODE", "thread"),
+)
@@ -0,0 +1,323 @@
+"""
+Local stand-ins for the services the API talks to, shared by the benchmarks:
+an OpenAI-compatible LLM stub, a static HTML site and generated PDFs, plus a
+database seeder for read-path benchmarks.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+WORDS = (
+    "atom cell energy orbit planet river mountain empire treaty engine protein "
+    "galaxy volcano glacier melody theorem circuit enzyme harbor senate comet "
+    "canyon reactor spectrum fossil monsoon dynasty algorithm nebula delta reef"
+).split()
+
+
+def _sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def synthetic_quiz(num_questions: int, rng: random.Random) -> Dict[str, Any]:
+    """A valid quiz with random wording, so stored questions are not near-duplicates."""
+    return {
+        "topic": _sentence(rng, 3).title(),
+        "category": "Science & Nature",
+        "subcategory": "Chemistry & Physics",
+        "questions": [
+            {
+                "question": f"Which {_sentence(rng, 6)} {rng.randrange(10**6)}?",
+                "options": [
+                    f"{letter}. {_sentence(rng, 3)} {rng.randrange(10**6)}" for letter in "abcd"
+                ],
+                "right_option": rng.choice("abcd"),
+            }
+            for _ in range(num_questions)
+        ],
+    }
+
+
+_QUESTION_COUNT = re.compile(r"create (\d+) multiple choice")
+_VARIANT = re.compile(r"^(easy|medium|hard) difficulty level: (\d+) questions\.$", re.MULTILINE)
+
+
+class StubLLMServer:
+    """
+    OpenAI-compatible ``/chat/completions`` endpoint on localhost.
+
+    Replies after ``latency`` seconds with ``quiz`` when given, otherwise with
+    a synthetic quiz sized from the prompt (single quiz or difficulty
+    variants). Streaming requests get the reply in chunks of ``chunk_chars``
+    characters, ``chunk_delay`` seconds apart.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        quiz: Optional[Dict[str, Any]] = None,
+        chunk_chars: int = 40,
+        chunk_delay: float = 0.01,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.quiz = quiz
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def start(self) -> "StubLLMServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+
+    def reply_for(self, prompt: str) -> str:
+        with self._lock:
+            self.requests += 1
+            if self.quiz is not None:
+                return json.dumps(self.quiz)
+            variants = _VARIANT.findall(prompt)
+            if variants:
+                quizzes = [
+                    {"difficulty": difficulty, **synthetic_quiz(int(count), self._rng)}
+                    for difficulty, count in variants
+                ]
+                return json.dumps({**quizzes[0], "quizzes": quizzes})
+            match = _QUESTION_COUNT.search(prompt)
+            return json.dumps(synthetic_quiz(int(match.group(1)) if match else 5, self._rng))
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = body["messages"][-1]["content"]
+                time.sleep(stub.latency)
+                reply = stub.reply_for(prompt)
+                usage = {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": len(reply) // 4,
+                    "total_tokens": (len(prompt) + len(reply)) // 4,
+                }
+                if body.get("stream"):
+                    self._stream(reply, usage, body["model"])
+                    return
+                payload = json.dumps(
+                    {
+                        "model": body["model"],
+                        "choices": [
+                            {
+                                "index": 0,
+                                "finish_reason": "stop",
+                                "message": {"role": "assistant", "content": reply},
+                            }
+                        ],
+                        "usage": usage,
+                    }
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, reply: str, usage: Dict[str, int], model: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def send(data: bytes) -> None:
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+
+                for start in range(0, len(reply), stub.chunk_chars):
+                    delta = {"content": reply[start:start + stub.chunk_chars]}
+                    chunk = {"model": model, "choices": [{"index": 0, "delta": delta}]}
+                    send(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+                    time.sleep(stub.chunk_delay)
+                send(b"data: " + json.dumps({"choices": [], "usage": usage}).encode() + b"\n\n")
+                send(b"data: [DONE]\n\n")
+                send(b"")
+
+        return Handler
+
+
+def article_html(number: int, paragraphs: int = 12) -> bytes:
+    rng = random.Random(number)
+    body = "".join(
+        f"<p>{_sentence(rng, 40).capitalize()}.</p>" for _ in range(paragraphs)
+    )
+    title = _sentence(rng, 3).title()
+    return (
+        f"<html><head><title>{title}</title></head><body><article>"
+        f"<h1>{title}</h1>{body}</article></body></html>"
+    ).encode()
+
+
+class StaticSiteServer:
+    """
+    Serves ``/articles/<n>.html`` pages with ETag and Last-Modified headers,
+    answering conditional requests with 304 like a typical static host.
+    """
+
+    def __init__(self, paragraphs: int = 12):
+        self.paragraphs = paragraphs
+        self.requests = 0
+        self.not_modified = 0
+        self._last_modified = formatdate(time.time(), usegmt=True)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    def url(self, number: int) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/articles/{number}.html"
+
+    def start(self) -> "StaticSiteServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                site.requests += 1
+                match = re.fullmatch(r"/articles/(\d+)\.html", self.path)
+                if match is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                page = article_html(int(match.group(1)), site.paragraphs)
+                etag = '"' + hashlib.sha256(page).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    site.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(page)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", site._last_modified)
+                self.end_headers()
+                self.wfile.write(page)
+
+        return Handler
+
+
+def make_pdf(pages: List[str]) -> bytes:
+    """A minimal PDF with one line of Helvetica text per page."""
+    page_count = len(pages)
+    # Objects: catalog, page tree, font, then a page and its content stream per page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids ["
+        + b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(page_count))
+        + b"] /Count %d >>" % page_count,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for index, page_text in enumerate(pages):
+        escaped = page_text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        content = f"BT /F1 11 Tf 40 760 Td ({escaped}) Tj ET".encode("latin-1", "replace")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * index)
+        )
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream"
+        )
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(output)
+
+
+def sample_pdfs(count: int, pages: int = 5) -> List[bytes]:
+    """Distinct PDFs with ``pages`` pages of random sentences each."""
+    rng = random.Random(1)
+    return [
+        make_pdf([_sentence(rng, 14).capitalize() + "." for _ in range(pages)])
+        for _ in range(count)
+    ]
+
+
+def seed_database(topics: int, questions_per_topic: int, batch_size: int = 1000) -> None:
+    """
+    Insert ``topics`` quizzes into the database at QUIZ_DATABASE_PATH, which
+    must be set before backend.db is first imported.
+    """
+    from backend.db import SessionLocal
+    from backend.persistence import save_quizzes
+
+    db = SessionLocal()
+    try:
+        for start in range(0, topics, batch_size):
+            save_quizzes(
+                db,
+                [
+                    {
+                        "topic": f"Topic {t}",
+                        "category": f"Category {t % 20}",
+                        "subcategory": f"Subcategory {t % 7}",
+                        "questions": [
+                            {
+                                "question": f"Which statement about topic {t}, item {q} "
+                                f"and the {WORDS[(t + q) % len(WORDS)]} is correct?",
+                                "options": [
+                                    "a. The first plausible answer",
+                                    "b. The second plausible answer",
+                                    "c. The third plausible answer",
+                                    "d. The fourth plausible answer",
+                                ],
+                                "right_option": "c",
+                            }
+                            for q in range(questions_per_topic)
+                        ],
+                    }
+                    for t in range(start, min(start + batch_size, topics))
+                ],
+            )
+            db.commit()
+    finally:
+        db.close()
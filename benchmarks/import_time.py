@@ -0,0 +1,105 @@
+"""
+Cold start cost of the API: importing backend.api and answering /health.
+
+Each run is a fresh interpreter against a temporary database. Fails if the
+median import time exceeds --max-import-seconds or if importing the API pulls
+in modules that should only load on first use (Haystack, pypdf, ...). Run from
+the repository root:
+
+    python -m benchmarks.import_time --runs 5 --max-import-seconds 2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Modules that importing backend.api must not load
+DEFERRED_MODULES = ("haystack", "pypdf", "json_repair", "lxml")
+
+MEASURE = """
+import json, sys, time
+started = time.perf_counter()
+import backend.api
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+loaded = sorted(m for m in {deferred!r} if m in sys.modules)
+with TestClient(backend.api.app) as client:
+    status = client.get("/health").status_code
+print(json.dumps({{
+    "import_seconds": imported - started,
+    "health_seconds": time.perf_counter() - started,
+    "health_status": status,
+    "deferred_modules_loaded": loaded,
+}}))
+"""
+
+
+def measure_once(database: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE.format(deferred=DEFERRED_MODULES)],
+        env={**os.environ, "QUIZ_DATABASE_PATH": database},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def top_imports(count: int) -> list:
+    """The slowest modules imported by backend.api, by cumulative time."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.api"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative.strip()) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-seconds", type=float, default=None)
+    parser.add_argument("--top", type=int, default=10, help="Show the N slowest imports")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "import_time.db")
+        runs = [measure_once(database) for _ in range(args.runs)]
+
+    import_seconds = statistics.median(run["import_seconds"] for run in runs)
+    health_seconds = statistics.median(run["health_seconds"] for run in runs)
+    loaded = sorted({module for run in runs for module in run["deferred_modules_loaded"]})
+
+    print(f"import backend.api   median {import_seconds:.3f}s over {args.runs} runs")
+    print(f"first /health        median {health_seconds:.3f}s (including the import)")
+    if args.top:
+        print("\nSlowest imports (cumulative):")
+        for seconds, name in top_imports(args.top):
+            print(f"  {seconds:7.3f}s  {name}")
+
+    failures = []
+    if loaded:
+        failures.append(f"importing backend.api loaded deferred modules: {', '.join(loaded)}")
+    if args.max_import_seconds is not None and import_seconds > args.max_import_seconds:
+        failures.append(
+            f"import took {import_seconds:.3f}s, budget is {args.max_import_seconds:.3f}s"
+        )
+    if any(run["health_status"] != 200 for run in runs):
+        failures.append("/health did not answer 200")
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
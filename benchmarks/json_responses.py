@@ -0,0 +1,106 @@
+"""
+Latency of the hottest read endpoints with and without fast JSON responses.
+
+Seeds a large temporary database, then serves the same request mix from two
+fresh processes: "baseline" uses the stdlib encoder with the quiz payload
+cache disabled, "fast" uses orjson and the payload cache. Prints p50/p99
+latencies per endpoint. Run from the repository root:
+
+    python -m benchmarks.json_responses --topics 5000 --requests 2000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import seed_database
+
+VARIANTS = {
+    "baseline": {"QUIZ_FAST_JSON": "false", "QUIZ_PAYLOAD_CACHE_MAX_ENTRIES": "0"},
+    "fast": {"QUIZ_FAST_JSON": "true", "QUIZ_PAYLOAD_CACHE_MAX_ENTRIES": "1024"},
+}
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(topics: int, requests: int, hot_topics: int) -> dict:
+    """Run inside a variant process and return latencies in milliseconds."""
+    from fastapi.testclient import TestClient
+
+    from backend.api import app
+
+    rng = random.Random(0)
+    paths = {
+        "/quiz/{id}": [f"/quiz/{rng.randint(1, hot_topics)}" for _ in range(requests)],
+        "/topics?limit=100": ["/topics?limit=100"] * requests,
+        "/topics": ["/topics"] * max(1, requests // 20),
+    }
+
+    results = {}
+    with TestClient(app) as client:
+        for name, batch in paths.items():
+            client.get(batch[0])  # Warm up
+            samples = []
+            for path in batch:
+                start = time.perf_counter()
+                response = client.get(path)
+                samples.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, (path, response.status_code)
+            results[name] = {
+                "requests": len(samples),
+                "p50_ms": round(statistics.median(samples), 3),
+                "p99_ms": round(percentile(samples, 0.99), 3),
+            }
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--topics", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--hot-topics", type=int, default=500,
+                        help="/quiz requests pick uniformly among the first N topics")
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.topics, args.requests, args.hot_topics)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["QUIZ_DATABASE_PATH"] = os.path.join(tmp, "json_responses.db")
+        print(f"Seeding {args.topics} topics x {args.questions} questions...")
+        seed_database(args.topics, args.questions)
+
+        report = {}
+        for variant, env in VARIANTS.items():
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.json_responses", "--measure",
+                 "--topics", str(args.topics), "--requests", str(args.requests),
+                 "--hot-topics", str(min(args.hot_topics, args.topics))],
+                env={**os.environ, **env},
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            report[variant] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"\n{'endpoint':<20}{'variant':<10}{'p50 ms':>10}{'p99 ms':>10}")
+    for endpoint in report["baseline"]:
+        for variant in VARIANTS:
+            stats = report[variant][endpoint]
+            print(f"{endpoint:<20}{variant:<10}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
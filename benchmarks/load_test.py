@@ -0,0 +1,530 @@
+"""
+End-to-end load test of the API against local stand-ins for its dependencies.
+
+Seeds a large database, starts the stub LLM server, a static HTML site and
+sample PDFs (see benchmarks/fixtures.py), runs the app under uvicorn in a
+subprocess and drives concurrent requests across the endpoints. Reports
+throughput and p50/p95/p99 latency per scenario plus the mean time per
+pipeline stage, LLM call and commit taken from /metrics, and can write the
+results to JSON and compare them with an earlier run. Run from the
+repository root:
+
+    python -m benchmarks.load_test --profile mixed --duration 30 --output results.json
+    python -m benchmarks.load_test --profile mixed --duration 30 --compare results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.fixtures import (WORDS, StaticSiteServer, StubLLMServer,
+                                 sample_pdfs, seed_database)
+
+PROFILES = {
+    "read": {"quiz": 50, "topics": 20, "categories": 10, "search": 20},
+    "generate": {
+        "generate": 35,
+        "generate_variants": 10,
+        "generate_stream": 15,
+        "generate_batch": 10,
+        "generate_pdf": 20,
+        "job": 10,
+    },
+    "mixed": {
+        "quiz": 30,
+        "topics": 10,
+        "categories": 5,
+        "search": 10,
+        "generate": 15,
+        "generate_variants": 5,
+        "generate_stream": 10,
+        "generate_batch": 5,
+        "generate_pdf": 5,
+        "job": 5,
+    },
+}
+
+# Histograms from /metrics reported as per-stage means
+STAGE_METRICS = {
+    "quiz_pipeline_stage_duration_seconds": ("pipeline", "component"),
+    "quiz_pipeline_duration_seconds": ("pipeline",),
+    "quiz_llm_request_duration_seconds": ("status",),
+    "quiz_db_commit_duration_seconds": (),
+}
+
+_SAMPLE = re.compile(r"^(\w+?)_(sum|count)(?:\{(.*)\})? (\S+)$")
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+@dataclass
+class Context:
+    client: httpx.AsyncClient
+    rng: random.Random
+    site: StaticSiteServer
+    pdfs: List[bytes]
+    articles: int
+    topics: int
+    num_questions: int
+
+
+@dataclass
+class ScenarioStats:
+    latencies: List[float] = field(default_factory=list)
+    rejected: int = 0
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    # First response body per error kind, to tell what went wrong
+    error_details: Dict[str, str] = field(default_factory=dict)
+
+
+class ScenarioError(Exception):
+    def __init__(self, kind: str, detail: str = ""):
+        super().__init__(kind)
+        self.kind = kind
+        self.detail = detail
+
+
+def check(response: httpx.Response, expected: int = 200) -> httpx.Response:
+    if response.status_code != expected:
+        detail = response.content[:300].decode("utf-8", "replace")
+        raise ScenarioError(str(response.status_code), detail)
+    return response
+
+
+def article(ctx: Context) -> str:
+    return ctx.site.url(ctx.rng.randrange(ctx.articles))
+
+
+async def quiz(ctx: Context) -> None:
+    check(await ctx.client.get(f"/quiz/{ctx.rng.randint(1, ctx.topics)}"))
+
+
+async def topics(ctx: Context) -> None:
+    cursor = ctx.rng.randrange(ctx.topics)
+    check(await ctx.client.get("/topics", params={"limit": 50, "cursor": cursor}))
+
+
+async def categories(ctx: Context) -> None:
+    check(await ctx.client.get("/categories"))
+
+
+async def search(ctx: Context) -> None:
+    query = " ".join(ctx.rng.sample(WORDS, 2))
+    check(await ctx.client.get("/search", params={"q": query, "limit": 20}))
+
+
+async def generate(ctx: Context) -> None:
+    body = {"url": article(ctx), "num_questions": ctx.num_questions}
+    check(await ctx.client.post("/generate-quiz", json=body))
+
+
+async def generate_variants(ctx: Context) -> None:
+    body = {
+        "url": article(ctx),
+        "num_questions": ctx.num_questions,
+        "variants": [{"difficulty": d} for d in ("easy", "medium", "hard")],
+    }
+    check(await ctx.client.post("/generate-quiz", json=body))
+
+
+async def generate_stream(ctx: Context) -> None:
+    body = {"url": article(ctx), "num_questions": ctx.num_questions}
+    async with ctx.client.stream("POST", "/generate-quiz/stream", json=body) as response:
+        if response.status_code != 200:
+            await response.aread()
+        check(response)
+        last_event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                last_event = line[len("event: "):]
+    if last_event != "done":
+        raise ScenarioError(f"stream ended with {last_event}")
+
+
+async def generate_batch(ctx: Context) -> None:
+    items = [{"url": article(ctx), "num_questions": ctx.num_questions} for _ in range(3)]
+    check(await ctx.client.post("/generate-quiz/batch", json={"items": items}))
+
+
+async def generate_pdf(ctx: Context) -> None:
+    files = {"pdf_file": ("sample.pdf", ctx.rng.choice(ctx.pdfs), "application/pdf")}
+    data = {"num_questions": str(ctx.num_questions)}
+    check(await ctx.client.post("/generate-quiz-from-pdf", files=files, data=data))
+
+
+async def job(ctx: Context) -> None:
+    body = {"url": article(ctx), "num_questions": ctx.num_questions}
+    job_id = check(await ctx.client.post("/jobs/generate-quiz", json=body), 202).json()["id"]
+    while True:
+        status = check(await ctx.client.get(f"/jobs/{job_id}")).json()["status"]
+        if status == "succeeded":
+            return
+        if status == "failed":
+            raise ScenarioError("job failed")
+        await asyncio.sleep(0.05)
+
+
+SCENARIOS: Dict[str, Callable[[Context], Awaitable[None]]] = {
+    "quiz": quiz,
+    "topics": topics,
+    "categories": categories,
+    "search": search,
+    "generate": generate,
+    "generate_variants": generate_variants,
+    "generate_stream": generate_stream,
+    "generate_batch": generate_batch,
+    "generate_pdf": generate_pdf,
+    "job": job,
+}
+
+
+def parse_histograms(text: str) -> Dict[Tuple[str, Tuple[str, ...]], List[float]]:
+    """``_sum`` and ``_count`` of the STAGE_METRICS histograms, keyed by name and labels."""
+    samples: Dict[Tuple[str, Tuple[str, ...]], List[float]] = defaultdict(lambda: [0.0, 0.0])
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match is None or match.group(1) not in STAGE_METRICS:
+            continue
+        name, kind, labels, value = match.groups()
+        label_values = dict(_LABEL.findall(labels or ""))
+        key = (name, tuple(label_values.get(label, "") for label in STAGE_METRICS[name]))
+        samples[key][0 if kind == "sum" else 1] = float(value)
+    return samples
+
+
+def stage_breakdown(before: str, after: str) -> Dict[str, Dict[str, float]]:
+    start = parse_histograms(before)
+    stages = {}
+    for (name, labels), (total, count) in sorted(parse_histograms(after).items()):
+        initial_total, initial_count = start.get((name, labels), (0.0, 0.0))
+        count -= initial_count
+        if count <= 0:
+            continue
+        label = "/".join(value for value in labels if value)
+        stages[f"{name}{{{label}}}" if label else name] = {
+            "count": int(count),
+            "mean_ms": round((total - initial_total) / count * 1000, 3),
+        }
+    return stages
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(stats: ScenarioStats, elapsed: float) -> Dict[str, Any]:
+    samples = stats.latencies
+    summary: Dict[str, Any] = {
+        "ok": len(samples),
+        "rejected": stats.rejected,
+        "errors": sum(stats.errors.values()),
+        "throughput_rps": round(len(samples) / elapsed, 2),
+    }
+    if samples:
+        summary.update(
+            mean_ms=round(sum(samples) / len(samples), 3),
+            p50_ms=round(percentile(samples, 0.50), 3),
+            p95_ms=round(percentile(samples, 0.95), 3),
+            p99_ms=round(percentile(samples, 0.99), 3),
+        )
+    if stats.errors:
+        summary["error_kinds"] = dict(stats.errors)
+        summary["error_details"] = stats.error_details
+    return summary
+
+
+async def run_load(
+    base_url: str,
+    mix: Dict[str, int],
+    concurrency: int,
+    duration: Optional[float],
+    total_requests: Optional[int],
+    make_context: Callable[[httpx.AsyncClient, random.Random], Context],
+    seed: int,
+) -> Tuple[Dict[str, ScenarioStats], float, str, str]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timeout = httpx.Timeout(120.0)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        # One untimed request per scenario loads the pipelines and warms the caches
+        for name in mix:
+            await SCENARIOS[name](make_context(client, random.Random(seed)))
+        metrics_before = (await client.get("/metrics")).text
+
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        results: Dict[str, ScenarioStats] = {name: ScenarioStats() for name in names}
+        remaining = [total_requests]
+        started = time.perf_counter()
+        deadline = started + duration if duration is not None else None
+
+        async def worker(index: int) -> None:
+            ctx = make_context(client, random.Random(seed * 1000 + index))
+            while True:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                if remaining[0] is not None:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                name = ctx.rng.choices(names, weights)[0]
+                request_started = time.perf_counter()
+                try:
+                    await SCENARIOS[name](ctx)
+                except ScenarioError as e:
+                    if e.kind == "503":
+                        results[name].rejected += 1
+                    else:
+                        results[name].errors[e.kind] += 1
+                        results[name].error_details.setdefault(e.kind, e.detail)
+                except httpx.HTTPError as e:
+                    results[name].errors[e.__class__.__name__] += 1
+                else:
+                    results[name].latencies.append((time.perf_counter() - request_started) * 1000)
+
+        await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        metrics_after = (await client.get("/metrics")).text
+    return results, elapsed, metrics_before, metrics_after
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    log = open(log_path, "wb")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.api:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **env},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The API exited with code {process.returncode}, see {log_path}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"The API did not become healthy in 60s, see {log_path}")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> bool:
+    """Print the change per scenario; False when p95 or throughput regressed too far."""
+    passed = True
+    print(f"\n{'scenario':<20}{'p95 ms':>10}{'baseline':>10}{'rps':>9}{'baseline':>10}  result")
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None or "p95_ms" not in current or "p95_ms" not in previous:
+            continue
+        slower = current["p95_ms"] > previous["p95_ms"] * (1 + max_regression)
+        # Throughput depends on run length only for duration-based runs
+        fewer = (
+            results["config"]["duration"] is not None
+            and current["throughput_rps"] < previous["throughput_rps"] * (1 - max_regression)
+        )
+        verdict = "REGRESSION" if slower or fewer else "ok"
+        passed = passed and not (slower or fewer)
+        print(
+            f"{name:<20}{current['p95_ms']:>10.1f}{previous['p95_ms']:>10.1f}"
+            f"{current['throughput_rps']:>9.1f}{previous['throughput_rps']:>10.1f}  {verdict}"
+        )
+    return passed
+
+
+def parse_mix(args: argparse.Namespace) -> Dict[str, int]:
+    if not args.scenario:
+        return PROFILES[args.profile]
+    mix = {}
+    for item in args.scenario:
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--profile", choices=PROFILES, default="mixed")
+    parser.add_argument("--scenario", action="append", metavar="NAME[=WEIGHT]",
+                        help="Replace the profile's mix, repeatable; "
+                        f"scenarios: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--requests", type=int, help="Stop after N requests instead of --duration")
+    parser.add_argument("--seed-topics", type=int, default=5000)
+    parser.add_argument("--seed-questions", type=int, default=10)
+    parser.add_argument("--database", help="Seeded database to reuse across runs "
+                        "(created when missing; each run works on a copy)")
+    parser.add_argument("--articles", type=int, default=200,
+                        help="Distinct pages on the static site, fewer means more cache hits")
+    parser.add_argument("--pdfs", type=int, default=20)
+    parser.add_argument("--num-questions", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.5,
+                        help="Seconds the stub LLM takes per completion")
+    parser.add_argument("--quiz-file", help="Canned quiz JSON the stub LLM replies with")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the API, repeatable")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--compare", help="Results JSON of an earlier run to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed p95 increase / throughput drop as a fraction")
+    args = parser.parse_args()
+    mix = parse_mix(args)
+    duration = None if args.requests else args.duration
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded = args.database or os.path.join(
+            tempfile.gettempdir(),
+            f"quiz_load_test_{args.seed_topics}x{args.seed_questions}.db",
+        )
+        if not os.path.exists(seeded):
+            print(f"Seeding {args.seed_topics} topics x {args.seed_questions} questions...")
+            os.environ["QUIZ_DATABASE_PATH"] = seeded
+            seed_database(args.seed_topics, args.seed_questions)
+            from backend.db import get_engine
+
+            # Fold the WAL into the file so copying it is enough
+            get_engine().dispose()
+        database = os.path.join(tmp, "load_test.db")
+        shutil.copyfile(seeded, database)
+
+        quiz = None
+        if args.quiz_file:
+            with open(args.quiz_file, encoding="utf-8") as f:
+                quiz = json.load(f)
+        llm = StubLLMServer(latency=args.llm_latency, quiz=quiz, seed=args.seed).start()
+        site = StaticSiteServer().start()
+        pdfs = sample_pdfs(args.pdfs)
+
+        env = {
+            "QUIZ_DATABASE_PATH": database,
+            "LLM_BASE_URL": llm.base_url,
+            "LLM_API_KEY": "load-test",
+            "HAYSTACK_TELEMETRY_ENABLED": "False",
+            "QUIZ_LOG_LEVEL": "WARNING",
+        }
+        env.update(item.split("=", 1) for item in args.env)
+        port = free_port()
+        log_path = os.path.join(tmp, "api.log")
+        server = start_server(port, env, log_path)
+        try:
+            def make_context(client: httpx.AsyncClient, rng: random.Random) -> Context:
+                return Context(
+                    client, rng, site, pdfs, args.articles, args.seed_topics, args.num_questions
+                )
+
+            print(f"Running {args.profile if not args.scenario else 'custom'} load, "
+                  f"concurrency {args.concurrency}...")
+            stats, elapsed, before, after = asyncio.run(
+                run_load(
+                    f"http://127.0.0.1:{port}", mix, args.concurrency, duration,
+                    args.requests, make_context, args.seed,
+                )
+            )
+        finally:
+            server.terminate()
+            server.wait()
+            llm.stop()
+            site.stop()
+
+        scenarios = {name: summarize(stats[name], elapsed) for name in mix}
+        combined = ScenarioStats()
+        for scenario in stats.values():
+            combined.latencies += scenario.latencies
+            combined.rejected += scenario.rejected
+            for kind, count in scenario.errors.items():
+                combined.errors[kind] += count
+        results = {
+            "config": {
+                "commit": git_commit(),
+                "mix": mix,
+                "concurrency": args.concurrency,
+                "duration": duration,
+                "requests": args.requests,
+                "seed_topics": args.seed_topics,
+                "seed_questions": args.seed_questions,
+                "articles": args.articles,
+                "num_questions": args.num_questions,
+                "llm_latency": args.llm_latency,
+                "env": dict(item.split("=", 1) for item in args.env),
+            },
+            "elapsed_seconds": round(elapsed, 3),
+            "total": summarize(combined, elapsed),
+            "scenarios": scenarios,
+            "stages": stage_breakdown(before, after),
+            "upstream": {
+                "llm_requests": llm.requests,
+                "site_requests": site.requests,
+                "site_not_modified": site.not_modified,
+            },
+        }
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            log_tail = "".join(f.readlines()[-20:])
+        if results["total"]["errors"] and log_tail:
+            print("API log tail:\n" + log_tail)
+
+    print(f"\n{'scenario':<20}{'ok':>7}{'503':>6}{'err':>6}{'rps':>9}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, summary in [*scenarios.items(), ("total", results["total"])]:
+        print(
+            f"{name:<20}{summary['ok']:>7}{summary['rejected']:>6}{summary['errors']:>6}"
+            f"{summary['throughput_rps']:>9.1f}{summary.get('p50_ms', 0):>10.1f}"
+            f"{summary.get('p95_ms', 0):>10.1f}{summary.get('p99_ms', 0):>10.1f}"
+        )
+    width = max([len(name) + 2 for name in results["stages"]] + [20])
+    print(f"\n{'stage':<{width}}{'count':>7}{'mean ms':>10}")
+    for name, stage in results["stages"].items():
+        print(f"{name:<{width}}{stage['count']:>7}{stage['mean_ms']:>10.1f}")
+    for name, summary in scenarios.items():
+        for kind, detail in summary.get("error_details", {}).items():
+            print(f"{name} error {kind}: {detail}")
+    print(f"\nUpstream: {results['upstream']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.max_regression):
+            print(f"p95 latency or throughput regressed by more than {args.max_regression:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Regression check for the number of SQL statements each read endpoint issues.
+
+Seeds a temporary database, calls the read endpoints through the FastAPI app
+and fails if any of them issues more statements than its budget, so an
+accidental N+1 query or lost eager load is caught in CI. Run from the
+repository root:
+
+    python -m benchmarks.query_counts
+"""
+import os
+import sys
+import tempfile
+
+# The database location is read when backend.db is imported
+_tmp = tempfile.TemporaryDirectory()
+os.environ["QUIZ_DATABASE_PATH"] = os.path.join(_tmp.name, "query_counts.db")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from backend.api import app  # noqa: E402
+from backend.db import SessionLocal, engine  # noqa: E402
+from backend.persistence import save_quizzes  # noqa: E402
+
+# Maximum number of statements per request
+BUDGETS = {
+    "/quiz/1": 1,
+    "/quiz/50": 1,
+    "/topics": 1,
+    "/categories": 1,
+    "/search?q=question": 1,
+}
+
+
+def seed(topics: int = 50, questions_per_topic: int = 10) -> None:
+    db = SessionLocal()
+    save_quizzes(
+        db,
+        [
+            {
+                "topic": f"Topic {t}",
+                "category": f"Category {t % 5}",
+                "subcategory": f"Subcategory {t % 3}",
+                "questions": [
+                    {
+                        "question": f"Question {t}.{q}?",
+                        "options": ["a. one", "b. two", "c. three", "d. four"],
+                        "right_option": "b",
+                    }
+                    for q in range(questions_per_topic)
+                ],
+            }
+            for t in range(topics)
+        ],
+    )
+    db.commit()
+    db.close()
+
+
+def main() -> int:
+    seed()
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    failures = 0
+    with TestClient(app) as client:
+        for path, budget in BUDGETS.items():
+            statements.clear()
+            response = client.get(path)
+            count = len(statements)
+            ok = response.status_code == 200 and count <= budget
+            failures += not ok
+            print(f"{'ok' if ok else 'FAIL':<6}{path:<22}{count} statements (budget {budget}), HTTP {response.status_code}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
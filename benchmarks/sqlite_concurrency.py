@@ -0,0 +1,139 @@
+"""
+Read/write throughput of the SQLite engine under concurrent load.
+
+Compares the original engine settings (rollback journal, synchronous=FULL)
+with the tuned WAL engine from backend/db.py, with and without the single
+writer queue. Run from the repository root:
+
+    python -m benchmarks.sqlite_concurrency --readers 8 --writers 4 --seconds 5
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import WriteQueue, create_sqlite_engine
+from backend.persistence import save_quiz
+from backend.sqlite_dal import Base, QuizQuestion, QuizTopic
+
+QUIZ = {
+    "topic": "Benchmark topic",
+    "category": "Science & Nature",
+    "subcategory": "Biology & Ecology",
+    "questions": [
+        {
+            "question": f"Benchmark question {i}?",
+            "options": ["a. one", "b. two", "c. three", "d. four"],
+            "right_option": "a",
+        }
+        for i in range(5)
+    ],
+}
+
+
+def make_engine(name: str, path: str):
+    if name == "baseline":
+        # What backend/db.py used to create
+        return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    return create_sqlite_engine(path)
+
+
+def write_quiz(db):
+    save_quiz(db, QUIZ)
+    db.commit()
+
+
+def run(name: str, readers: int, writers: int, seconds: float, seed_topics: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = make_engine(name, path)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        db = Session()
+        for _ in range(seed_topics):
+            save_quiz(db, QUIZ)
+        db.commit()
+        db.close()
+
+        queue = WriteQueue(Session) if name == "tuned+writer" else None
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+
+        def count(key):
+            with lock:
+                counts[key] += 1
+
+        def reader(offset):
+            topic_id = offset % seed_topics + 1
+            while time.monotonic() < deadline:
+                db = Session()
+                try:
+                    db.get(QuizTopic, topic_id)
+                    db.scalars(select(QuizQuestion).where(QuizQuestion.topic_id == topic_id)).all()
+                    count("reads")
+                except (OperationalError, sqlite3.OperationalError):
+                    count("errors")
+                finally:
+                    db.close()
+                topic_id = topic_id % seed_topics + 1
+
+        def writer():
+            while time.monotonic() < deadline:
+                try:
+                    if queue is not None:
+                        queue.submit(write_quiz).result()
+                    else:
+                        db = Session()
+                        try:
+                            write_quiz(db)
+                        finally:
+                            db.close()
+                    count("writes")
+                except (OperationalError, sqlite3.OperationalError):
+                    count("errors")
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        threads += [threading.Thread(target=writer) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if queue is not None:
+            queue.shutdown()
+        engine.dispose()
+
+    return {
+        "engine": name,
+        "reads_per_second": round(counts["reads"] / seconds, 1),
+        "writes_per_second": round(counts["writes"] / seconds, 1),
+        "errors": counts["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--seed-topics", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'engine':<14}{'reads/s':>10}{'writes/s':>10}{'errors':>8}")
+    for name in ("baseline", "tuned", "tuned+writer"):
+        result = run(name, args.readers, args.writers, args.seconds, args.seed_topics)
+        print(
+            f"{result['engine']:<14}{result['reads_per_second']:>10}"
+            f"{result['writes_per_second']:>10}{result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()